@@ -4,6 +4,7 @@ Tests 5-raga model (Kamboji excluded after Harikambhoji cleanup).
 """
 import os, numpy as np
 from collections import defaultdict
+from utils import run_length_encode
 
 FEAT_DIR = r"D:\Swaragam\pcd_results\features_v12"
 N_BINS = 72
@@ -24,23 +25,15 @@ def extract_features(data):
 
     up = np.zeros((N_BINS, N_BINS))
     down = np.zeros((N_BINS, N_BINS))
-    stable_count = 0
-
-    i = 0
-    while i < len(bins):
-        j = i + 1
-        while j < len(bins) and bins[j] == bins[i]:
-            j += 1
-        run_len = j - i
-        if run_len >= MIN_STABLE and i > 0:
-            stable_count += 1
-            prev = bins[i - 1]
-            curr = bins[i]
-            if curr > prev:
-                up[prev, curr] += 1
-            elif curr < prev:
-                down[prev, curr] += 1
-        i = j
+
+    _, starts, lengths = run_length_encode(bins)
+    entries = starts[(lengths >= MIN_STABLE) & (starts > 0)]
+    stable_count = len(entries)
+    for prev, curr in zip(bins[entries - 1], bins[entries]):
+        if curr > prev:
+            up[prev, curr] += 1
+        elif curr < prev:
+            down[prev, curr] += 1
 
     up_flat = (up + ALPHA).flatten()
     up_flat = up_flat / (np.sum(up_flat) + EPS)
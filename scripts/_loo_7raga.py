@@ -4,6 +4,7 @@ Abhogi + Saveri activated. PCD=0.7, Dyad=0.3.
 """
 import os, numpy as np
 from collections import defaultdict
+from utils import run_length_encode
 
 FEAT_DIR = r"D:\Swaragam\pcd_results\features_v12"
 N_BINS = 72
@@ -21,16 +22,11 @@ def extract_features(data):
     bins = np.clip(bins, 0, N_BINS - 1)
     up = np.zeros((N_BINS, N_BINS))
     down = np.zeros((N_BINS, N_BINS))
-    i = 0
-    while i < len(bins):
-        j = i + 1
-        while j < len(bins) and bins[j] == bins[i]:
-            j += 1
-        if (j - i) >= MIN_STABLE and i > 0:
-            prev, curr = bins[i - 1], bins[i]
-            if curr > prev: up[prev, curr] += 1
-            elif curr < prev: down[prev, curr] += 1
-        i = j
+    _, starts, lengths = run_length_encode(bins)
+    entries = starts[(lengths >= MIN_STABLE) & (starts > 0)]
+    for prev, curr in zip(bins[entries - 1], bins[entries]):
+        if curr > prev: up[prev, curr] += 1
+        elif curr < prev: down[prev, curr] += 1
     up_flat = (up + ALPHA).flatten()
     up_flat /= (np.sum(up_flat) + EPS)
     down_flat = (down + ALPHA).flatten()
@@ -7,6 +7,7 @@ D) Combinations
 """
 import os, numpy as np
 from collections import defaultdict
+from utils import run_length_encode
 
 FEAT_DIR = r"D:\Swaragam\pcd_results\features_v12"
 N_BINS = 72
@@ -27,20 +28,13 @@ def extract_features(data):
     up = np.zeros((N_BINS, N_BINS))
     down = np.zeros((N_BINS, N_BINS))
 
-    i = 0
-    while i < len(bins):
-        j = i + 1
-        while j < len(bins) and bins[j] == bins[i]:
-            j += 1
-        run_len = j - i
-        if run_len >= MIN_STABLE and i > 0:
-            prev = bins[i - 1]
-            curr = bins[i]
-            if curr > prev:
-                up[prev, curr] += 1
-            elif curr < prev:
-                down[prev, curr] += 1
-        i = j
+    _, starts, lengths = run_length_encode(bins)
+    entries = starts[(lengths >= MIN_STABLE) & (starts > 0)]
+    for prev, curr in zip(bins[entries - 1], bins[entries]):
+        if curr > prev:
+            up[prev, curr] += 1
+        elif curr < prev:
+            down[prev, curr] += 1
 
     up_flat = (up + ALPHA).flatten()
     up_flat = up_flat / (np.sum(up_flat) + EPS)
@@ -10,10 +10,13 @@ BASE_DIR = r"D:\Swaragam"
 FEATURES_DIR = os.path.join(BASE_DIR, "pcd_results", "features_v12")
 AGG_BASE_DIR = os.path.join(BASE_DIR, "pcd_results", "aggregation")
 
-from feature_constants import FEATURE_VERSION
+from feature_constants import FEATURE_VERSION, profile_frames, profile_for_version
+from utils import stable_regions, directional_dyad_counts
+from feature_cache import feature_files
+from model_pack import MODEL_PACK_NAME, write_model_pack
 
 N_BINS = 72  # Phase 4: was 36
-MIN_STABLE_FRAMES = 5
+MIN_STABLE_FRAMES = profile_frames("default")["min_stable_frames"]  # MIN_STABLE_MS = 5 frames at 22050 / 512
 MIN_CLIPS_PER_RAGA = 5  # Ragas with fewer clips are excluded (unstable models)
 ALPHA = 0.01  # Phase 2 fix: was 0.5 (destroyed dyad signal)
 EPS = 1e-8
@@ -23,12 +26,6 @@ timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 VERSION_DIR = os.path.join(AGG_BASE_DIR, FEATURE_VERSION)
 RUN_DIR = os.path.join(VERSION_DIR, f"run_{timestamp}")
 
-PCD_DIR = os.path.join(RUN_DIR, "pcd_stats")
-DYAD_DIR = os.path.join(RUN_DIR, "dyad_stats")
-
-os.makedirs(PCD_DIR, exist_ok=True)
-os.makedirs(DYAD_DIR, exist_ok=True)
-
 
 # =========================
 # PCD FROM GATED CENTS
@@ -50,9 +47,9 @@ def compute_pcd_from_gated(cents_gated):
 # =========================
 # DIRECTIONAL DYADS FROM GATED CENTS
 # =========================
-def compute_directional_dyads_from_gated(cents_gated):
+def compute_directional_dyads_from_gated(cents_gated, min_stable=MIN_STABLE_FRAMES):
 
-    if len(cents_gated) < MIN_STABLE_FRAMES:
+    if len(cents_gated) < min_stable:
         return (
             np.zeros((N_BINS, N_BINS)),
             np.zeros((N_BINS, N_BINS)),
@@ -63,37 +60,9 @@ def compute_directional_dyads_from_gated(cents_gated):
     pitch_bins = np.digitize(cents_gated, bins) - 1
     pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
 
-    stable_bins = []
-    current = pitch_bins[0]
-    count = 1
-
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count = 1
-
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
+    stable_bins, _ = stable_regions(pitch_bins, min_stable)
 
-    mat_up = np.zeros((N_BINS, N_BINS))
-    mat_down = np.zeros((N_BINS, N_BINS))
-
-    transitions = 0
-
-    for i in range(len(stable_bins) - 1):
-        frm = stable_bins[i]
-        to = stable_bins[i + 1]
-
-        if to > frm:
-            mat_up[frm, to] += 1
-            transitions += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
-            transitions += 1
+    mat_up, mat_down, transitions = directional_dyad_counts(stable_bins, N_BINS)
 
     # Laplace smoothing
     mat_up += ALPHA
@@ -105,6 +74,88 @@ def compute_directional_dyads_from_gated(cents_gated):
     return mat_up, mat_down, transitions
 
 
+# =========================
+# ONE CLIP
+# =========================
+def clip_features(data, feature_version=FEATURE_VERSION):
+    """
+    (raga, pcd, up, down, transitions, gating_ratio) for one loaded feature
+    file, or None if the guardrails reject it (wrong FEATURE_VERSION or
+    gating_ratio < 0.05). feature_version selects another extraction
+    profile's stamp (feature_constants.PYIN_PROFILES); the stable-region
+    length is that profile's MIN_STABLE_MS in its own frames.
+    """
+    # Guardrail: correct feature version only
+    if "feature_version" not in data or str(data["feature_version"]) != feature_version:
+        return None
+
+    raga = str(data["raga"])
+    cents_gated = data["cents_gated"]
+    gating_ratio = float(data["gating_ratio"])
+
+    # Guardrail: skip extremely low gating
+    if gating_ratio < 0.05:
+        return None
+
+    pcd = compute_pcd_from_gated(cents_gated)
+    min_stable = profile_frames(profile_for_version(feature_version))["min_stable_frames"]
+    up, down, transitions = compute_directional_dyads_from_gated(cents_gated, min_stable)
+
+    return raga, pcd, up, down, transitions, gating_ratio
+
+
+# =========================
+# WRITE RUN
+# =========================
+def write_run(run_dir, raga_stats, metadata):
+    """
+    Write one aggregation run: pcd_stats/, dyad_stats/, aggregation_metadata.json
+    and models.swpk. raga_stats: raga -> {field: value} for model_pack.PACK_FIELDS
+    (dyads flattened to N_BINS**2).
+    """
+    pcd_dir = os.path.join(run_dir, "pcd_stats")
+    dyad_dir = os.path.join(run_dir, "dyad_stats")
+
+    os.makedirs(pcd_dir, exist_ok=True)
+    os.makedirs(dyad_dir, exist_ok=True)
+
+    for raga, st in raga_stats.items():
+
+        np.savez(
+            os.path.join(pcd_dir, f"{raga}_pcd_stats.npz"),
+            mean_pcd=st["mean_pcd"],
+            std_pcd=st["std_pcd"],
+            bins=N_BINS,
+            clip_count=st["clip_count"],
+            mean_gating_ratio=st["mean_gating_ratio"],
+            feature_version=FEATURE_VERSION,
+        )
+
+        np.savez(
+            os.path.join(dyad_dir, f"{raga}_dyad_stats.npz"),
+            mean_up=st["mean_up"],
+            mean_down=st["mean_down"],
+            std_up=st["std_up"],
+            std_down=st["std_down"],
+            bins=N_BINS,
+            alpha=ALPHA,
+            mean_transitions=st["mean_transitions"],
+            clip_count=st["clip_count"],
+            feature_version=FEATURE_VERSION,
+        )
+
+        print(f"[v1.2] {raga} | clips={st['clip_count']} | "
+              f"mean_gating={st['mean_gating_ratio']:.3f} | "
+              f"mean_transitions={st['mean_transitions']:.1f}")
+
+    with open(os.path.join(run_dir, "aggregation_metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=4)
+
+    # Single-file artifact: no pickle, dyads memory-mapped (model_pack.py)
+    if raga_stats:
+        write_model_pack(os.path.join(run_dir, MODEL_PACK_NAME), raga_stats, metadata)
+
+
 # =========================
 # MAIN AGGREGATION
 # =========================
@@ -123,31 +174,18 @@ def aggregate_all():
     if not os.path.exists(FEATURES_DIR):
         raise RuntimeError(f"Features directory not found: {FEATURES_DIR}")
 
-    for fname in os.listdir(FEATURES_DIR):
-
-        if not fname.endswith(".npz"):
-            continue
+    # Index-backed listing (feature_cache.py); directory scan for legacy caches
+    for fpath in feature_files(FEATURES_DIR):
 
         total_files_seen += 1
 
-        data = np.load(os.path.join(FEATURES_DIR, fname), allow_pickle=True)
+        clip = clip_features(np.load(fpath, allow_pickle=True))
 
-        # Guardrail: correct feature version only
-        if "feature_version" not in data or str(data["feature_version"]) != FEATURE_VERSION:
+        if clip is None:
             skipped_files += 1
             continue
 
-        raga = str(data["raga"])
-        cents_gated = data["cents_gated"]
-        gating_ratio = float(data["gating_ratio"])
-
-        # Guardrail: skip extremely low gating
-        if gating_ratio < 0.05:
-            skipped_files += 1
-            continue
-
-        pcd = compute_pcd_from_gated(cents_gated)
-        up, down, transitions = compute_directional_dyads_from_gated(cents_gated)
+        raga, pcd, up, down, transitions, gating_ratio = clip
 
         raga_pcds.setdefault(raga, []).append(pcd)
         raga_up.setdefault(raga, []).append(up)
@@ -179,48 +217,23 @@ def aggregate_all():
         print()
 
     # =========================
-    # SAVE PER RAGA
+    # PER RAGA STATS
     # =========================
-    for raga in raga_pcds.keys():
-
-        mean_pcd = np.mean(raga_pcds[raga], axis=0)
-        std_pcd = np.std(raga_pcds[raga], axis=0)
-
-        mean_up = np.mean(raga_up[raga], axis=0)
-        mean_down = np.mean(raga_down[raga], axis=0)
+    raga_stats = {}
 
-        std_up = np.std(raga_up[raga], axis=0)
-        std_down = np.std(raga_down[raga], axis=0)
-
-        mean_gating = float(np.mean(raga_gating[raga]))
-        mean_transitions = float(np.mean(raga_transitions[raga]))
-
-        np.savez(
-            os.path.join(PCD_DIR, f"{raga}_pcd_stats.npz"),
-            mean_pcd=mean_pcd,
-            std_pcd=std_pcd,
-            bins=N_BINS,
-            clip_count=clip_counts[raga],
-            mean_gating_ratio=mean_gating,
-            feature_version=FEATURE_VERSION,
-        )
-
-        np.savez(
-            os.path.join(DYAD_DIR, f"{raga}_dyad_stats.npz"),
-            mean_up=mean_up.flatten(),
-            mean_down=mean_down.flatten(),
-            std_up=std_up.flatten(),
-            std_down=std_down.flatten(),
-            bins=N_BINS,
-            alpha=ALPHA,
-            mean_transitions=mean_transitions,
-            clip_count=clip_counts[raga],
-            feature_version=FEATURE_VERSION,
-        )
+    for raga in raga_pcds.keys():
 
-        print(f"[v1.2] {raga} | clips={clip_counts[raga]} | "
-              f"mean_gating={mean_gating:.3f} | "
-              f"mean_transitions={mean_transitions:.1f}")
+        raga_stats[raga] = {
+            "mean_pcd": np.mean(raga_pcds[raga], axis=0),
+            "std_pcd": np.std(raga_pcds[raga], axis=0),
+            "mean_up": np.mean(raga_up[raga], axis=0).flatten(),
+            "mean_down": np.mean(raga_down[raga], axis=0).flatten(),
+            "std_up": np.std(raga_up[raga], axis=0).flatten(),
+            "std_down": np.std(raga_down[raga], axis=0).flatten(),
+            "clip_count": clip_counts[raga],
+            "mean_gating_ratio": float(np.mean(raga_gating[raga])),
+            "mean_transitions": float(np.mean(raga_transitions[raga])),
+        }
 
     # =========================
     # GLOBAL METADATA
@@ -240,8 +253,7 @@ def aggregate_all():
         "min_clips_per_raga": MIN_CLIPS_PER_RAGA
     }
 
-    with open(os.path.join(RUN_DIR, "aggregation_metadata.json"), "w") as f:
-        json.dump(metadata, f, indent=4)
+    write_run(RUN_DIR, raga_stats, metadata)
 
     print("\n[OK] v1.2 Aggregation complete")
     print("Saved to:", RUN_DIR)
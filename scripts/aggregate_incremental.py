@@ -0,0 +1,303 @@
+"""
+Incremental aggregation: per-raga running accumulators instead of full rebuilds.
+
+aggregate_all_v12.py re-reads every feature file and holds every clip's two
+72x72 dyad matrices in memory before np.mean / np.std. This keeps, per raga,
+a Welford accumulator (count, running mean, running sum of squared deviations)
+for the PCD and both dyad matrices in
+
+    aggregation/<FEATURE_VERSION>/incremental_state/state.npz
+
+together with the set of clips already folded in. Accumulators and members
+live in that one file, written to a temp name and swapped with os.replace,
+so a crash mid-save leaves the previous state intact -- never accumulators
+that already include clips the member list does not. A sync only touches what
+changed since the last one:
+
+  - clips new in features_v12/ are folded in (one clip in memory at a time);
+  - clips no longer listed there (e.g. duplicates moved to excluded/) are
+    subtracted again, reading their file from excluded/.
+
+Each sync writes a normal run folder (pcd_stats/, dyad_stats/, metadata,
+models.swpk) through aggregate_all_v12.write_run, with MIN_CLIPS_PER_RAGA
+applied at write time. Means/stds agree with a full rebuild to float
+rounding (~1e-16).
+
+    python aggregate_incremental.py            # sync
+    python aggregate_incremental.py rebuild    # drop the state, fold in everything
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+
+import numpy as np
+
+from aggregate_all_v12 import (
+    FEATURES_DIR, VERSION_DIR, RUN_DIR, N_BINS, MIN_STABLE_FRAMES, ALPHA,
+    MIN_CLIPS_PER_RAGA, FEATURE_VERSION, timestamp, clip_features, write_run,
+)
+from feature_cache import feature_files
+
+# =========================
+# CONFIG
+# =========================
+STATE_DIR    = os.path.join(VERSION_DIR, "incremental_state")
+STATE_NPZ    = "state.npz"
+LEGACY_FILES = ("members.json",)   # pre-state.npz layout: {raga}_acc.npz + members.json
+
+# Welford-tracked quantities; dyads stored flattened to N_BINS**2
+TRACKED = ("pcd", "up", "down")
+_ACC_ARRAYS = tuple(f"{stat}_{name}" for name in TRACKED for stat in ("mean", "m2"))
+
+
+# =========================
+# ACCUMULATORS
+# =========================
+def new_accumulator():
+    acc = {"n": 0, "sum_gating": 0.0, "sum_transitions": 0.0}
+    for name, size in (("pcd", N_BINS), ("up", N_BINS * N_BINS), ("down", N_BINS * N_BINS)):
+        acc[f"mean_{name}"] = np.zeros(size)
+        acc[f"m2_{name}"] = np.zeros(size)
+    return acc
+
+
+def fold_in(acc, values, gating_ratio, transitions):
+    """Welford update: add one clip."""
+    acc["n"] += 1
+    n = acc["n"]
+
+    for name in TRACKED:
+        x = values[name]
+        delta = x - acc[f"mean_{name}"]
+        acc[f"mean_{name}"] += delta / n
+        acc[f"m2_{name}"] += delta * (x - acc[f"mean_{name}"])
+
+    acc["sum_gating"] += gating_ratio
+    acc["sum_transitions"] += transitions
+
+
+def fold_out(acc, values, gating_ratio, transitions):
+    """Inverse Welford update: remove one clip that was previously folded in."""
+    if acc["n"] <= 1:
+        acc.update(new_accumulator())
+        return
+
+    acc["n"] -= 1
+    n = acc["n"]
+
+    for name in TRACKED:
+        x = values[name]
+        mean_old = acc[f"mean_{name}"]
+        mean_new = mean_old - (x - mean_old) / n
+        acc[f"m2_{name}"] -= (x - mean_new) * (x - mean_old)
+        np.maximum(acc[f"m2_{name}"], 0.0, out=acc[f"m2_{name}"])   # rounding guard
+        acc[f"mean_{name}"] = mean_new
+
+    acc["sum_gating"] -= gating_ratio
+    acc["sum_transitions"] -= transitions
+
+
+def accumulator_stats(acc):
+    """Same fields aggregate_all() computes with np.mean / np.std (ddof=0)."""
+    n = acc["n"]
+    return {
+        "mean_pcd": acc["mean_pcd"].copy(),
+        "std_pcd": np.sqrt(acc["m2_pcd"] / n),
+        "mean_up": acc["mean_up"].copy(),
+        "mean_down": acc["mean_down"].copy(),
+        "std_up": np.sqrt(acc["m2_up"] / n),
+        "std_down": np.sqrt(acc["m2_down"] / n),
+        "clip_count": n,
+        "mean_gating_ratio": acc["sum_gating"] / n,
+        "mean_transitions": acc["sum_transitions"] / n,
+    }
+
+
+# =========================
+# STATE ON DISK
+# =========================
+def load_state(state_dir=STATE_DIR):
+    """-> (accumulators by raga, members {clip_id: {"raga", "file"}})."""
+    state_path = os.path.join(state_dir, STATE_NPZ)
+    if not os.path.exists(state_path):
+        if any(os.path.exists(os.path.join(state_dir, f)) for f in LEGACY_FILES):
+            raise RuntimeError(f"Incremental state in {state_dir} uses the old per-raga "
+                               "layout -- run 'rebuild'")
+        return {}, {}
+
+    with np.load(state_path) as data:
+        state = json.loads(str(data["state_json"]))
+
+        if state.get("feature_version") != FEATURE_VERSION or state.get("bins") != N_BINS:
+            raise RuntimeError(f"Incremental state in {state_dir} was built with "
+                               f"{state.get('feature_version')}/{state.get('bins')} bins -- run 'rebuild'")
+
+        accs = {}
+        for i, raga in enumerate(state["ragas"]):
+            acc = {k: data[f"r{i}_{k}"] for k in _ACC_ARRAYS}
+            acc.update(state["scalars"][raga])
+            accs[raga] = acc
+
+    return accs, state["members"]
+
+
+def save_state(accs, members, state_dir=STATE_DIR):
+    """All accumulators + members in one state.npz, swapped in atomically."""
+    os.makedirs(state_dir, exist_ok=True)
+    ragas = sorted(accs)
+
+    state = {
+        "feature_version": FEATURE_VERSION,
+        "bins": N_BINS,
+        "min_stable_frames": MIN_STABLE_FRAMES,
+        "alpha": ALPHA,
+        "updated": timestamp,
+        "ragas": ragas,
+        "scalars": {r: {"n": int(accs[r]["n"]),
+                        "sum_gating": float(accs[r]["sum_gating"]),
+                        "sum_transitions": float(accs[r]["sum_transitions"])} for r in ragas},
+        "members": members,
+    }
+    arrays = {f"r{i}_{k}": accs[r][k] for i, r in enumerate(ragas) for k in _ACC_ARRAYS}
+
+    state_path = os.path.join(state_dir, STATE_NPZ)
+    tmp = state_path + ".tmp"   # file handle: np.savez would append .npz to a name
+    with open(tmp, "wb") as f:
+        np.savez(f, state_json=json.dumps(state), **arrays)
+    os.replace(tmp, state_path)
+
+
+# =========================
+# SYNC
+# =========================
+def _clip_id(fpath):
+    return os.path.splitext(os.path.basename(fpath))[0]
+
+
+def _load_clip(fpath):
+    clip = clip_features(np.load(fpath, allow_pickle=True))
+    if clip is None:
+        return None
+
+    raga, pcd, up, down, transitions, gating_ratio = clip
+    values = {"pcd": pcd, "up": up.flatten(), "down": down.flatten()}
+    return raga, values, gating_ratio, transitions
+
+
+def sync(features_dir=FEATURES_DIR, run_dir=RUN_DIR, state_dir=STATE_DIR):
+
+    if not os.path.exists(features_dir):
+        raise RuntimeError(f"Features directory not found: {features_dir}")
+
+    accs, members = load_state(state_dir)
+    listed = {_clip_id(p): p for p in feature_files(features_dir)}
+
+    added, removed, skipped = [], [], 0
+
+    # ---- Subtract clips that left the corpus ----
+    for clip_id in sorted(set(members) - set(listed)):
+        entry = members.pop(clip_id)
+
+        if entry["raga"] is None:   # was skipped by the guardrails, nothing to undo
+            continue
+
+        for folder in (features_dir, os.path.join(features_dir, "excluded")):
+            fpath = os.path.join(folder, entry["file"])
+            if os.path.exists(fpath):
+                break
+        else:
+            raise RuntimeError(f"Cannot subtract {entry['file']}: file not found in "
+                               f"{features_dir} or its excluded/ -- run 'rebuild'")
+
+        raga, values, gating_ratio, transitions = _load_clip(fpath)
+        fold_out(accs[raga], values, gating_ratio, transitions)
+        removed.append((raga, entry["file"]))
+
+    # ---- Fold in new clips ----
+    for clip_id in sorted(set(listed) - set(members)):
+        fpath = listed[clip_id]
+        clip = _load_clip(fpath)
+
+        if clip is None:
+            skipped += 1
+            members[clip_id] = {"raga": None, "file": os.path.basename(fpath)}
+            continue
+
+        raga, values, gating_ratio, transitions = clip
+        fold_in(accs.setdefault(raga, new_accumulator()), values, gating_ratio, transitions)
+        members[clip_id] = {"raga": raga, "file": os.path.basename(fpath)}
+        added.append((raga, os.path.basename(fpath)))
+
+    for raga in [r for r, acc in accs.items() if acc["n"] == 0]:
+        del accs[raga]
+
+    save_state(accs, members, state_dir)
+
+    # =========================
+    # FILTER: exclude ragas with too few clips (BUG-011)
+    # =========================
+    clip_counts = {raga: acc["n"] for raga, acc in sorted(accs.items())}
+    excluded_ragas = [(r, c) for r, c in clip_counts.items() if c < MIN_CLIPS_PER_RAGA]
+
+    if excluded_ragas:
+        print("\n[EXCLUDED] Ragas with < {} clips:".format(MIN_CLIPS_PER_RAGA))
+        for raga, count in excluded_ragas:
+            print("  {} ({} clips) -- needs {} more".format(
+                raga, count, MIN_CLIPS_PER_RAGA - count))
+        print()
+
+    raga_stats = {
+        raga: accumulator_stats(accs[raga])
+        for raga, count in clip_counts.items() if count >= MIN_CLIPS_PER_RAGA
+    }
+
+    metadata = {
+        "feature_version": FEATURE_VERSION,
+        "bins": N_BINS,
+        "min_stable_frames": MIN_STABLE_FRAMES,
+        "alpha": ALPHA,
+        "timestamp": timestamp,
+        "feature_source": features_dir,
+        "mode": "incremental",
+        "state_dir": state_dir,
+        "clips_added": len(added),
+        "clips_removed": len(removed),
+        "total_files_seen": len(listed),
+        "skipped_files": sum(1 for e in members.values() if e["raga"] is None),
+        "excluded_ragas": {r: c for r, c in excluded_ragas},
+        "included_ragas": list(raga_stats),
+        "included_clips": sum(st["clip_count"] for st in raga_stats.values()),
+        "min_clips_per_raga": MIN_CLIPS_PER_RAGA
+    }
+
+    write_run(run_dir, raga_stats, metadata)
+
+    for raga, fname in added:
+        print(f"  + {raga:20s} {fname}")
+    for raga, fname in removed:
+        print(f"  - {raga:20s} {fname}")
+
+    print("\n[OK] v1.2 Incremental aggregation complete")
+    print("Saved to:", run_dir)
+    print(f"Added: {len(added)} | Removed: {len(removed)} | Newly skipped: {skipped}")
+    print(f"Ragas included: {len(raga_stats)} | Clips: {metadata['included_clips']}")
+
+    return raga_stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental (running-sum) raga aggregation.")
+    ap.add_argument("cmd", nargs="?", default="sync", choices=["sync", "rebuild"])
+    args = ap.parse_args()
+
+    if args.cmd == "rebuild" and os.path.exists(STATE_DIR):
+        shutil.rmtree(STATE_DIR)
+
+    sync()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Decode front end with a content-addressed decoded-audio cache.
+
+librosa.load(audio_path, sr=SR, duration=MAX_DURATION_SEC) decodes and
+resamples the whole MP3/FLAC stem on every call. load_audio() is a drop-in
+for it that
+
+  - reads only the requested window: soundfile seeks to `offset` and reads
+    `duration` seconds (MP3/FLAC/WAV with libsndfile >= 1.1); files it cannot
+    open fall back to librosa/audioread, which also stops after `duration`;
+  - lets the caller pick the resampler (res_type, librosa.resample names:
+    "soxr_hq" default == librosa.load, "soxr_mq", "soxr_lq", ...);
+  - persists the full capped clip (offset 0, MAX_DURATION_SEC) as mono
+    float32 .npy under DECODE_DIR, named like feature_cache entries:
+
+        {audio_sha256[:24]}_{params_sha256[:12]}.npy
+
+    params = target sr, res_type, cap (max_duration_sec). A later call for
+    the same audio bytes and params -- full clip or any window of it -- is a
+    memory-mapped slice, no decode at all. Window-only misses (progressive
+    recognition) decode just that window and are not stored.
+
+A 6-minute clip is ~30 MB of float32, so the cache is bounded: after every
+store the least recently used buffers (file mtime, refreshed on each hit)
+are deleted until the folder is under MAX_CACHE_MB. `gc` applies the same
+bound (or a smaller one) on demand. Pass cache_dir=None to bypass it --
+recognition_server does unless started with --decode-cache.
+
+With the default res_type the decoded buffer is identical to librosa.load.
+MP3 seeks in libsndfile are not sample-exact, so a window served from the
+cache (a slice of the full decode) can differ slightly from a window read.
+Returned arrays from the cache are read-only memmaps; copy before editing
+in place.
+
+    python audio_cache.py stats
+    python audio_cache.py gc [--max-mb 16384] [--dry-run]
+    python audio_cache.py prefetch <audio or folder> [...] [--sr 22050] [--res-type soxr_hq]
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import librosa
+import soundfile as sf
+
+from feature_cache import AUDIO_EXTS, file_sha256, cache_key
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR         = r"D:\Swaragam"
+DECODE_DIR       = os.path.join(BASE_DIR, "pcd_results", "decoded_audio")
+
+SR               = 22050
+MAX_DURATION_SEC = 360
+RES_TYPE         = "soxr_hq"   # librosa.load default
+MAX_CACHE_MB     = 16384       # ~550 six-minute clips at 22050 Hz
+
+
+# =========================
+# KEYS
+# =========================
+def decode_params(sr=SR, res_type=RES_TYPE, max_duration_sec=MAX_DURATION_SEC):
+    """The parameter set that defines a cached decoded buffer (part of its key)."""
+    return {
+        "sr": int(sr),
+        "res_type": str(res_type),
+        "max_duration_sec": float(max_duration_sec),
+        "dtype": "float32",
+        "mono": True,
+    }
+
+
+def decoded_path(cache_dir, audio_sha, params):
+    return os.path.join(cache_dir, f"{cache_key(audio_sha, params)}.npy")
+
+
+# =========================
+# DECODE
+# =========================
+def decode_window(audio_path, sr=SR, offset=0.0, duration=MAX_DURATION_SEC, res_type=RES_TYPE):
+    """Decode [offset, offset + duration) of one file -> mono float32 at sr."""
+    try:
+        with sf.SoundFile(audio_path) as f:
+            sr_native = f.samplerate
+            if offset:
+                f.seek(int(offset * sr_native))
+            frames = int(duration * sr_native) if duration is not None else -1
+            y = f.read(frames=frames, dtype="float32", always_2d=False).T
+    except RuntimeError:
+        # Not readable by libsndfile: audioread, still streaming + stopping at duration
+        y, sr_native = librosa.load(audio_path, sr=None, mono=False,
+                                    offset=offset, duration=duration)
+
+    y = librosa.to_mono(y)
+    if sr_native != sr:
+        y = librosa.resample(y, orig_sr=sr_native, target_sr=sr, res_type=res_type)
+
+    return y.astype(np.float32, copy=False)
+
+
+def _save_atomic(path, y):
+    tmp = path + ".tmp.npy"
+    np.save(tmp, y)
+    os.replace(tmp, path)
+
+
+# =========================
+# SIZE BOUND
+# =========================
+def _buffers(cache_dir):
+    """[(mtime, size, path)] of cached buffers, least recently used first."""
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for f in os.listdir(cache_dir):
+        if f.endswith(".npy") and ".tmp" not in f:
+            path = os.path.join(cache_dir, f)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue   # evicted by another process meanwhile
+            entries.append((st.st_mtime, st.st_size, path))
+    return sorted(entries)
+
+
+def evict(cache_dir=DECODE_DIR, max_mb=MAX_CACHE_MB, dry_run=False):
+    """Delete least recently used buffers until the cache is <= max_mb. -> [evicted paths]"""
+    entries = _buffers(cache_dir)
+    excess = sum(size for _, size, _ in entries) - max_mb * 2**20
+    evicted = []
+
+    for _, size, path in entries:
+        if excess <= 0:
+            break
+        if not dry_run:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+        evicted.append(path)
+        excess -= size
+
+    return evicted
+
+
+# =========================
+# LOAD
+# =========================
+def load_audio(audio_path, sr=SR, offset=0.0, duration=MAX_DURATION_SEC, res_type=RES_TYPE,
+               cache_dir=DECODE_DIR, audio_sha=None, max_duration_sec=MAX_DURATION_SEC):
+    """
+    Drop-in for librosa.load(audio_path, sr=sr, offset=offset, duration=duration)
+    -> (y, sr). duration is capped at max_duration_sec from the start of the
+    file; the cap is part of the cache key. cache_dir=None disables the
+    decoded-audio cache. Pass audio_sha when the caller already hashed the
+    file (or will load several windows of it) to skip re-hashing.
+    """
+    duration = max_duration_sec - offset if duration is None else min(duration, max_duration_sec - offset)
+    if duration <= 0:
+        return np.zeros(0, dtype=np.float32), sr
+
+    if cache_dir is None:
+        return decode_window(audio_path, sr, offset, duration, res_type), sr
+
+    params = decode_params(sr, res_type, max_duration_sec)
+    path = decoded_path(cache_dir, audio_sha or file_sha256(audio_path), params)
+
+    try:
+        y = np.load(path, mmap_mode="r")
+        os.utime(path)   # LRU order for evict()
+    except FileNotFoundError:
+        y = None
+    if y is not None:
+        start = int(round(offset * sr))
+        return y[start:start + int(round(duration * sr))], sr
+
+    full = offset == 0 and duration >= max_duration_sec
+    y = decode_window(audio_path, sr, offset, duration, res_type)
+
+    if full:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save_atomic(path, y)
+        evict(cache_dir)
+
+    return y, sr
+
+
+# =========================
+# CLI
+# =========================
+def _audio_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for fname in sorted(files):
+                    if fname.lower().endswith(AUDIO_EXTS):
+                        yield os.path.join(root, fname)
+        else:
+            yield path
+
+
+def stats(cache_dir=DECODE_DIR):
+    files = [f for f in os.listdir(cache_dir) if f.endswith(".npy")] if os.path.isdir(cache_dir) else []
+    size = sum(os.path.getsize(os.path.join(cache_dir, f)) for f in files)
+    print(f"Decoded-audio cache: {cache_dir}")
+    print(f"Buffers: {len(files)} | {size / 2**20:.1f} MB "
+          f"(~{size / 4 / SR / 3600:.2f} h of audio at {SR} Hz)")
+
+
+def gc(cache_dir=DECODE_DIR, max_mb=MAX_CACHE_MB, dry_run=False):
+    evicted = evict(cache_dir, max_mb, dry_run)
+    for path in evicted:
+        print(f"  EVICT {os.path.basename(path)}")
+    left = sum(size for _, size, _ in _buffers(cache_dir))
+    print(f"gc: {'would evict' if dry_run else 'evicted'} {len(evicted)} | "
+          f"cache now {left / 2**20:.1f} MB (limit {max_mb} MB)")
+
+
+def prefetch(paths, sr=SR, res_type=RES_TYPE, cache_dir=DECODE_DIR):
+    """Decode every clip once so later runs only memory-map."""
+    params = decode_params(sr, res_type)
+    done = skipped = 0
+
+    for audio_path in _audio_files(paths):
+        if os.path.exists(decoded_path(cache_dir, file_sha256(audio_path), params)):
+            skipped += 1
+            continue
+        load_audio(audio_path, sr=sr, res_type=res_type, cache_dir=cache_dir)
+        done += 1
+        print(f"  decoded: {os.path.basename(audio_path)}")
+
+    print(f"Decoded: {done} | already cached: {skipped}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Decoded-audio cache (mono float32 .npy, content-addressed).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_stats = sub.add_parser("stats", help="cache size")
+    p_stats.add_argument("--cache-dir", default=DECODE_DIR)
+
+    p_gc = sub.add_parser("gc", help="evict least recently used buffers down to a size limit")
+    p_gc.add_argument("--max-mb", type=int, default=MAX_CACHE_MB)
+    p_gc.add_argument("--cache-dir", default=DECODE_DIR)
+    p_gc.add_argument("--dry-run", action="store_true")
+
+    p_pre = sub.add_parser("prefetch", help="decode clips into the cache")
+    p_pre.add_argument("paths", nargs="+", help="audio files or folders")
+    p_pre.add_argument("--sr", type=int, default=SR)
+    p_pre.add_argument("--res-type", default=RES_TYPE)
+    p_pre.add_argument("--cache-dir", default=DECODE_DIR)
+
+    args = ap.parse_args()
+    if args.cmd == "stats":
+        stats(args.cache_dir)
+    elif args.cmd == "gc":
+        gc(args.cache_dir, args.max_mb, args.dry_run)
+    else:
+        prefetch(args.paths, args.sr, args.res_type, args.cache_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
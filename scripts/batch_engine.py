@@ -0,0 +1,151 @@
+"""
+Process-pool engine for batch recognition (batch_evaluate.py,
+batch_evaluate_random.py).
+
+A ThreadPoolExecutor timeout cannot stop a hung pYIN call -- the thread
+keeps running and the `with` block waits for it. Here every file goes to a
+worker process (one per core), each loading the compiled models once. A
+file that exceeds its timeout gets its worker killed and replaced, so one
+stuck clip costs one timeout and nothing else. Results are yielded as they
+complete, for callers to stream into their CSVs.
+
+    for idx, result, status, elapsed in evaluate_files(paths, AGG_FOLDER):
+        ...   # status: "ok" | "timeout" | "error: <message>"
+"""
+
+import os
+import time
+import multiprocessing as mp
+from collections import deque
+from multiprocessing.connection import wait
+
+from recognize_raga_v12 import recognize_raga, recognize_raga_progressive, load_compiled_models
+from stage_diagnostics import StageRecorder
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_WORKERS  = max(1, (os.cpu_count() or 2) - 1)
+PER_FILE_TIMEOUT = 360   # seconds per file, from dispatch to result
+SHUTDOWN_GRACE   = 5     # seconds for idle workers to exit before kill
+
+UNKNOWN_RESULT = {"final": "UNKNOWN / LOW CONFIDENCE", "ranking": [], "margin": 0.0,
+                  "confidence_tier": "UNKNOWN"}
+
+
+# =========================
+# WORKER
+# =========================
+def _worker(conn, aggregation_folder, feature_dir, progressive, diagnostics):
+    """Load models once, then recognise (idx, audio_path) jobs until None."""
+    models = load_compiled_models(aggregation_folder)
+    recognize = recognize_raga_progressive if progressive else recognize_raga
+    conn.send(("ready", None))
+
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        _, audio_path = job
+        try:
+            if diagnostics and not progressive:
+                result = recognize(audio_path, aggregation_folder, models, feature_dir,
+                                   recorder=StageRecorder())
+            else:
+                result = recognize(audio_path, aggregation_folder, models, feature_dir)
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send((f"error: {e}", None))
+
+
+def _spawn(ctx, args):
+    parent_conn, child_conn = ctx.Pipe()
+    proc = ctx.Process(target=_worker, args=(child_conn, *args), daemon=True)
+    proc.start()
+    child_conn.close()
+    return {"proc": proc, "conn": parent_conn, "ready": False, "job": None}
+
+
+def _kill(worker):
+    worker["proc"].kill()
+    worker["proc"].join()
+    worker["conn"].close()
+
+
+# =========================
+# ENGINE
+# =========================
+def evaluate_files(paths, aggregation_folder, feature_dir=None, progressive=False,
+                   workers=DEFAULT_WORKERS, timeout=PER_FILE_TIMEOUT, diagnostics=False):
+    """
+    Recognise every path in a pool of worker processes.
+
+    Yields (idx, result, status, elapsed) in completion order; idx indexes
+    paths. Timed-out and failed files yield a copy of UNKNOWN_RESULT.
+    diagnostics: per-stage "diagnostics" in each full-clip result
+    (stage_diagnostics.py; not recorded in progressive mode).
+    Workers are spawned (the Windows default, and no forked numba / BLAS
+    state on Linux), so the calling script must guard its entry point with
+    `if __name__ == "__main__"` and keep import-time side effects out.
+    """
+    ctx = mp.get_context("spawn")
+    args = (aggregation_folder, feature_dir, progressive, diagnostics)
+    pending = deque(enumerate(paths))
+    pool = [_spawn(ctx, args) for _ in range(min(max(1, workers), len(pending)))]
+
+    try:
+        while pending or any(w["job"] is not None for w in pool):
+
+            for w in pool:
+                if w["ready"] and w["job"] is None and pending:
+                    idx, audio_path = pending.popleft()
+                    w["conn"].send((idx, audio_path))
+                    w["job"] = (idx, time.time())
+
+            now = time.time()
+            deadlines = [w["job"][1] + timeout - now for w in pool if w["job"] is not None]
+            ready = wait([w["conn"] for w in pool], timeout=max(0.0, min(deadlines)) if deadlines else None)
+
+            for i, w in enumerate(pool):
+                job = w["job"]
+
+                if w["conn"] in ready:
+                    try:
+                        status, result = w["conn"].recv()
+                    except EOFError:
+                        # Worker died (crash, OOM kill): fail its file, start a fresh one
+                        if not w["ready"]:
+                            raise RuntimeError("batch worker exited during start-up "
+                                               f"(exit code {w['proc'].exitcode})")
+                        _kill(w)
+                        pool[i] = _spawn(ctx, args)
+                        if job is not None:
+                            yield job[0], dict(UNKNOWN_RESULT), "error: worker exited", time.time() - job[1]
+                        continue
+
+                    if status == "ready":
+                        w["ready"] = True
+                        continue
+
+                    w["job"] = None
+                    yield job[0], result if status == "ok" else dict(UNKNOWN_RESULT), status, time.time() - job[1]
+
+                elif job is not None and time.time() - job[1] >= timeout:
+                    _kill(w)
+                    pool[i] = _spawn(ctx, args)
+                    yield job[0], dict(UNKNOWN_RESULT), "timeout", time.time() - job[1]
+
+    finally:
+        for w in pool:
+            if w["job"] is None and w["proc"].is_alive():
+                try:
+                    w["conn"].send(None)
+                except OSError:
+                    pass
+        deadline = time.time() + SHUTDOWN_GRACE
+        for w in pool:
+            w["proc"].join(max(0.0, deadline - time.time()))
+            if w["proc"].is_alive():
+                w["proc"].kill()
+                w["proc"].join()
+            w["conn"].close()
@@ -1,10 +1,10 @@
 import os
 import csv
-import time
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from datetime import datetime
-from recognize_raga_v12 import recognize_raga, load_aggregated_models
+from recognize_raga_v12 import load_compiled_models
+from batch_engine import evaluate_files, DEFAULT_WORKERS
+from stage_diagnostics import STAGE_REPORT_FIELDS, stage_report, format_stage_report
 
 # =========================
 # CONFIG
@@ -12,20 +12,29 @@ from recognize_raga_v12 import recognize_raga, load_aggregated_models
 BASE_DIR     = r"D:\Swaragam"
 DATASET_DIR  = os.path.join(BASE_DIR, "datasets", "seed_carnatic")
 AGG_FOLDER   = r"D:\Swaragam\pcd_results\aggregation\v1.2\run_20260331_232228"  # v1.3.1: 7 ragas, 70 clips
+FEATURE_DIR  = os.path.join(BASE_DIR, "pcd_results", "features_v12")   # f0 cache (None = always live pYIN)
 
 EVAL_BASE_DIR = os.path.join(BASE_DIR, "pcd_results", "evaluation")
 timestamp     = datetime.now().strftime("%Y%m%d_%H%M%S")
 RUN_DIR       = os.path.join(EVAL_BASE_DIR, f"run_{timestamp}")
 
-os.makedirs(RUN_DIR, exist_ok=True)
-
 PER_FILE_CSV = os.path.join(RUN_DIR, "per_file_results.csv")
 PER_RAGA_CSV = os.path.join(RUN_DIR, "per_raga_results.csv")
 SUMMARY_TXT  = os.path.join(RUN_DIR, "summary.txt")
+STAGE_CSV    = os.path.join(RUN_DIR, "stage_report.csv")
 
 SUPPORTED_EXTS = (".wav", ".mp3", ".flac")
 
-PER_FILE_TIMEOUT = 360  # 6-minute timeout per file
+PER_FILE_TIMEOUT = 360  # 6-minute timeout per file (hung worker is killed + replaced)
+WORKERS          = DEFAULT_WORKERS   # worker processes (batch_engine.py)
+
+# Early-exit mode: stop pitch tracking once Top-1 + HIGH margin is stable
+# across PROGRESSIVE_STABLE_CHUNKS chunks (see recognize_raga_progressive)
+PROGRESSIVE = False
+
+# Per-stage wall time + peak memory for every clip (stage_diagnostics.py),
+# reported as p50 / p95 / max per stage. Full-clip mode only.
+DIAGNOSTICS = False
 
 
 # =========================
@@ -33,56 +42,82 @@ PER_FILE_TIMEOUT = 360  # 6-minute timeout per file
 # =========================
 def evaluate():
 
-    # Pre-load model once -- avoid re-loading for every file
-    models = load_aggregated_models(AGG_FOLDER)
+    # Load + compile once up front: fail fast here, not in every worker
+    models = load_compiled_models(AGG_FOLDER)
     if not models:
         print(f"No models found in: {AGG_FOLDER}")
         return
 
+    os.makedirs(RUN_DIR, exist_ok=True)
+
+    jobs = []
+    for raga_folder in sorted(os.listdir(DATASET_DIR)):
+
+        raga_path = os.path.join(DATASET_DIR, raga_folder)
+        if not os.path.isdir(raga_path):
+            continue
+
+        for file in sorted(os.listdir(raga_path)):
+            if file.lower().endswith(SUPPORTED_EXTS):
+                jobs.append((raga_folder, file, os.path.join(raga_path, file)))
+
     print(f"\nSwarag v1.2.5 -- Seed Dataset Evaluation")
     print(f"AGG folder : {AGG_FOLDER}")
     print(f"Dataset    : {DATASET_DIR}")
-    print(f"Run output : {RUN_DIR}\n")
+    print(f"Run output : {RUN_DIR}")
+    print(f"Mode       : {'progressive (early exit)' if PROGRESSIVE else 'full clip'}")
+    print(f"Workers    : {min(WORKERS, len(jobs))} | timeout {PER_FILE_TIMEOUT}s per file\n")
     print("=" * 60)
 
-    per_file_rows = []
     raga_stats    = {}
 
     total_files = 0
     correct     = 0
     unknown_count = 0
+    cache_hits    = 0
+    audio_consumed = []
+    early_exits    = 0
+    diagnostics    = []
+
+    # Rows are written as files complete (completion order), so a killed run keeps its results
+    with open(PER_FILE_CSV, "w", newline="", encoding="utf-8") as per_file:
+        writer = csv.writer(per_file)
+        writer.writerow([
+            "file", "true_raga", "predicted_raga",
+            "confidence_tier", "margin",
+            "top1_score", "top2_score", "top3_score",
+            "correct", "f0_source", "audio_consumed_sec"
+        ])
+        per_file.flush()
 
-    for raga_folder in sorted(os.listdir(DATASET_DIR)):
-
-        raga_path = os.path.join(DATASET_DIR, raga_folder)
-        if not os.path.isdir(raga_path):
-            continue
-
-        for file in sorted(os.listdir(raga_path)):
-
-            if not file.lower().endswith(SUPPORTED_EXTS):
-                continue
+        for idx, result, status, elapsed in evaluate_files(
+                [path for _, _, path in jobs], AGG_FOLDER, FEATURE_DIR,
+                PROGRESSIVE, WORKERS, PER_FILE_TIMEOUT, DIAGNOSTICS):
 
+            raga_folder, file, _ = jobs[idx]
             total_files += 1
-            audio_path  = os.path.join(raga_path, file)
-            t0 = time.time()
-
-            # Per-file timeout to prevent hangs
-            try:
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(recognize_raga, audio_path, AGG_FOLDER, models)
-                    result = future.result(timeout=PER_FILE_TIMEOUT)
-            except TimeoutError:
-                print(f"T [{total_files:2d}] {file:<35} | TIMEOUT after {time.time()-t0:.0f}s")
-                result = {"final": "UNKNOWN / LOW CONFIDENCE", "ranking": [], "margin": 0.0, "confidence_tier": "UNKNOWN"}
-            except Exception as e:
-                print(f"E [{total_files:2d}] {file:<35} | ERROR: {str(e)[:40]}")
-                result = {"final": "UNKNOWN / LOW CONFIDENCE", "ranking": [], "margin": 0.0, "confidence_tier": "UNKNOWN"}
+
+            if status == "timeout":
+                print(f"T [{total_files:2d}] {file:<35} | TIMEOUT after {elapsed:.0f}s")
+            elif status != "ok":
+                print(f"E [{total_files:2d}] {file:<35} | ERROR: {status[7:47]}")
 
             final           = result["final"]
             ranking         = result["ranking"]
             margin          = result["margin"]
             confidence_tier = result.get("confidence_tier", "UNKNOWN")
+            f0_source       = result.get("f0_source", "")
+
+            if f0_source == "cache":
+                cache_hits += 1
+
+            consumed_sec = result.get("audio_consumed_sec", "")
+            if consumed_sec != "":
+                audio_consumed.append(consumed_sec)
+            if result.get("early_exit"):
+                early_exits += 1
+            if "diagnostics" in result:
+                diagnostics.append(result["diagnostics"])
 
             top1_score = ranking[0][1] if len(ranking) >= 1 else 0.0
             top2_score = ranking[1][1] if len(ranking) >= 2 else 0.0
@@ -95,7 +130,7 @@ def evaluate():
             elif is_correct:
                 correct += 1
 
-            per_file_rows.append([
+            writer.writerow([
                 file,
                 raga_folder,
                 final,
@@ -104,8 +139,11 @@ def evaluate():
                 round(top1_score, 4),
                 round(top2_score, 4),
                 round(top3_score, 4),
-                is_correct
+                is_correct,
+                f0_source,
+                consumed_sec
             ])
+            per_file.flush()
 
             stats = raga_stats.setdefault(raga_folder, {"total": 0, "correct": 0, "unknown": 0})
             stats["total"] += 1
@@ -114,23 +152,9 @@ def evaluate():
             if final == "UNKNOWN / LOW CONFIDENCE":
                 stats["unknown"] += 1
 
-            elapsed = time.time() - t0
             status_sym = "+" if is_correct else ("?" if "UNKNOWN" in final else "X")
             print(f"{status_sym} [{total_files:2d}] {file:<35} | True={raga_folder:<18} | Pred={final:<25} "
-                  f"| Tier={confidence_tier:<8} | M={round(margin, 4)} ({elapsed:.0f}s)")
-
-    # =========================
-    # SAVE PER FILE CSV
-    # =========================
-    with open(PER_FILE_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "file", "true_raga", "predicted_raga",
-            "confidence_tier", "margin",
-            "top1_score", "top2_score", "top3_score",
-            "correct"
-        ])
-        writer.writerows(per_file_rows)
+                  f"| Tier={confidence_tier:<8} | M={round(margin, 4)} ({elapsed:.0f}s, f0={f0_source or '-'})")
 
     # =========================
     # SAVE PER RAGA CSV
@@ -166,11 +190,28 @@ def evaluate():
         f"Correct      : {correct}",
         f"Unknown      : {unknown_count}  ({unknown_rate:.1%})",
         f"Decided      : {decided_total}",
+        f"f0 from cache: {cache_hits} / {total_files}",
         f"",
         f"Accuracy (all)     : {overall_acc_all:.4f}",
         f"Accuracy (decided) : {overall_acc_dec:.4f}",
     ]
 
+    if audio_consumed:
+        summary_lines += [
+            f"",
+            f"Progressive  : early exit on {early_exits} / {total_files}",
+            f"Audio used   : mean {np.mean(audio_consumed):.1f}s | median {np.median(audio_consumed):.1f}s "
+            f"| total {np.sum(audio_consumed) / 60:.1f} min",
+        ]
+
+    if diagnostics:
+        stage_rows = stage_report(diagnostics)
+        with open(STAGE_CSV, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=STAGE_REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(stage_rows)
+        summary_lines += ["", "Per-stage timing (p50 / p95 / max over clips):"] + format_stage_report(stage_rows)
+
     with open(SUMMARY_TXT, "w", encoding="utf-8") as f:
         f.write("\n".join(summary_lines))
 
@@ -180,6 +221,11 @@ def evaluate():
     print(f"Unknown      : {unknown_count}  ({unknown_rate:.1%})")
     print(f"Acc (all)    : {overall_acc_all:.4f}")
     print(f"Acc (decided): {overall_acc_dec:.4f}")
+    print(f"f0 cache hits: {cache_hits} / {total_files}")
+    if audio_consumed:
+        print(f"Early exits  : {early_exits} / {total_files} | mean audio {np.mean(audio_consumed):.1f}s")
+    if diagnostics:
+        print("\n" + "\n".join(format_stage_report(stage_rows)))
     print(f"\nResults saved to: {RUN_DIR}")
     print("=" * 60)
 
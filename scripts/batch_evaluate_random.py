@@ -1,7 +1,8 @@
 import os
 import csv
 from datetime import datetime
-from recognize_raga_v12 import recognize_raga, load_aggregated_models
+from recognize_raga_v12 import load_compiled_models
+from batch_engine import evaluate_files, DEFAULT_WORKERS, PER_FILE_TIMEOUT
 
 # =========================
 # CONFIG
@@ -12,6 +13,7 @@ AGG_FOLDER   = r"D:\Swaragam\pcd_results\aggregation\v1.2\run_20260331_232228"
 OUTPUT_BASE        = r"D:\Swaragam\pcd_results\random_evaluations_v12"
 
 SUPPORTED_EXTS = (".wav", ".mp3", ".flac")
+WORKERS        = DEFAULT_WORKERS   # worker processes (batch_engine.py)
 
 
 # =========================
@@ -36,26 +38,41 @@ def main():
         print("⚠ No audio files found.")
         return
 
-    # Pre-load models once for efficiency
-    models = load_aggregated_models(AGG_FOLDER)
+    # Load once to validate + list ragas; each worker process loads its own copy
+    models = load_compiled_models(AGG_FOLDER)
     if not models:
         print(f"✗ No models found in: {AGG_FOLDER}")
         return
 
-    print(f"Loaded {len(models)} raga model(s): {', '.join(sorted(models.keys()))}")
+    print(f"Loaded {len(models['raga_order'])} raga model(s): {', '.join(sorted(models['raga_order']))}")
     print(f"Run output: {run_folder}\n")
 
-    # C3: collect rows for CSV output
-    csv_rows = []
-
-    for file in files:
+    # C3: CSV rows are streamed as files complete (completion order)
+    csv_path = os.path.join(run_folder, "results.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "file",
+            "predicted_raga", "confidence_tier", "margin",
+            "top1_raga", "top1_score",
+            "top2_raga", "top2_score",
+            "top3_raga", "top3_score",
+        ])
+        f.flush()
 
-        print(f">> Analyzing: {file}\n")
+        paths = [os.path.join(RANDOM_TEST_FOLDER, file) for file in files]
 
-        try:
-            audio_path = os.path.join(RANDOM_TEST_FOLDER, file)
+        for idx, result, status, elapsed in evaluate_files(paths, AGG_FOLDER, workers=WORKERS,
+                                                           timeout=PER_FILE_TIMEOUT):
+            file = files[idx]
+            print(f">> Analyzing: {file} ({elapsed:.0f}s)\n")
 
-            result = recognize_raga(audio_path, AGG_FOLDER, models=models)
+            if status != "ok":
+                label = "TIMEOUT" if status == "timeout" else "ERROR"
+                print(f"✗ {label} processing {file}: {status}\n")
+                writer.writerow([file, label, "UNKNOWN", 0.0, "", 0.0, "", 0.0, "", 0.0])
+                f.flush()
+                continue
 
             final           = result["final"]
             ranking         = result["ranking"]
@@ -77,8 +94,7 @@ def main():
 
             print()
 
-            # C3: accumulate CSV data
-            csv_rows.append([
+            writer.writerow([
                 file,
                 final,
                 confidence_tier,
@@ -90,23 +106,7 @@ def main():
                 top3_name,
                 round(top3_score, 4),
             ])
-
-        except Exception as e:
-            print(f"✗ Error processing {file}: {e}\n")
-            csv_rows.append([file, "ERROR", "UNKNOWN", 0.0, "", 0.0, "", 0.0, "", 0.0])
-
-    # C3: Write CSV
-    csv_path = os.path.join(run_folder, "results.csv")
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "file",
-            "predicted_raga", "confidence_tier", "margin",
-            "top1_raga", "top1_score",
-            "top2_raga", "top2_score",
-            "top3_raga", "top3_score",
-        ])
-        writer.writerows(csv_rows)
+            f.flush()
 
     print("Random batch evaluation completed.")
     print(f"Results saved to: {csv_path}")
@@ -2,6 +2,7 @@
 import numpy as np
 import os, sys
 sys.path.insert(0, ".")
+from utils import stable_regions
 
 N_BINS = 36
 feat_dir = r"D:\Swaragam\pcd_results\features_v12"
@@ -24,19 +25,7 @@ for f in files:
     pitch_bins = np.digitize(cents, bins) - 1
     pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
     
-    stable_bins = []
-    current = pitch_bins[0]
-    count = 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count = 1
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
     
     n_transitions = max(0, len(stable_bins) - 1)
     transition_counts.append(n_transitions)
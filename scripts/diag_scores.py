@@ -3,6 +3,7 @@ import sys, os, numpy as np, librosa
 sys.path.insert(0, '.')
 from recognize_raga_v12 import *
 from utils import estimate_tonic
+from audio_cache import load_audio
 
 AGG = r"D:\Swaragam\pcd_results\aggregation\v1.2\run_20260309_082638"
 TEST_DIR = r"D:\Swaragam\datasets\audio test"
@@ -13,7 +14,7 @@ expected = ["OOD (Hamsadwani)", "OOD (Mohanam)", "Bhairavi", "Kalyani"]
 
 for fname, exp in zip(test_files, expected):
     fpath = os.path.join(TEST_DIR, fname)
-    y, sr = librosa.load(fpath, sr=SR, duration=MAX_DURATION_SEC)
+    y, sr = load_audio(fpath, sr=SR, duration=MAX_DURATION_SEC)
     f0, _, _ = librosa.pyin(y, fmin=librosa.note_to_hz("C1"), fmax=librosa.note_to_hz("C6"), sr=SR)
     valid = f0[~np.isnan(f0)]
     sa_hz = estimate_tonic(valid)
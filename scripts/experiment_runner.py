@@ -0,0 +1,346 @@
+"""
+Declarative experiment runner for sandbox LOO studies.
+
+Instead of another copy of load_clips / compute_features / idf_var_weights /
+LOO loop with its own hardcoded constants, an experiment is a small JSON spec:
+
+    {
+      "base":     {"n_bins": 72, "pcd_weight": 0.8, "dyad_weight": 0.2},
+      "variants": [
+        {"name": "canonical"},
+        {"name": "5-raga", "exclude_ragas": ["Bhairavi", "Abhogi"]},
+        {"name": "alpha 0.1", "alpha": 0.1},
+        {"name": "hubness", "extra_terms": [{"type": "hubness", "weight": 1.0}]},
+        {"name": "absent-swara 0.3",
+         "extra_terms": [{"type": "absent_swara", "penalty": 0.3, "energy_thresh": 0.01}]}
+      ]
+    }
+
+Every variant is base + its own keys over DEFAULT_SPEC (production values
+from recognize_raga_v12.py). Its spec hash is the sha256 of the resolved
+spec without "name". All variants run in a thread pool against one
+in-memory corpus (sweep_engine.load_corpus). Intermediates -- re-binned
+PCDs, transition counts, smoothed dyads, fold similarities -- are memoised
+across variants, so ten variants that differ only in fusion weights or
+margins build their features and folds once. Re-binned PCDs and transition
+counts (the only steps that touch the sweep cache on disk) are built in the
+main thread before any variant is submitted. Scoring is the exact canonical
+LOO (loo_engine.py).
+
+A variant that raises is recorded in the table with its error (and not in
+results.jsonl, so the next run retries it); the other variants still run.
+
+Each result is appended to experiments/results.jsonl, keyed by
+(spec_hash, corpus_hash). A spec already scored on the same corpus is not
+re-run unless --force is given. experiments/results_table.csv is rewritten
+every run with one comparable row per key.
+
+    python experiment_runner.py spec.json [--workers 4] [--force]
+"""
+
+import os
+import csv
+import json
+import hashlib
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from recognize_raga_v12 import (
+    N_BINS, MIN_STABLE_FRAMES, ALPHA, PCD_WEIGHT, DYAD_WEIGHT, PER_RAGA_WEIGHTS,
+    MARGIN_STRICT, MIN_MARGIN_FINAL,
+)
+from loo_engine import (
+    loo_similarities, loo_model_similarities, fuse, hubness_correction, absent_swara_factor,
+)
+from sweep_engine import load_corpus, pcd_matrix, count_matrices, smooth
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR        = r"D:\Swaragam"
+EXPERIMENT_DIR  = os.path.join(BASE_DIR, "pcd_results", "experiments")
+RESULTS_JSONL   = os.path.join(EXPERIMENT_DIR, "results.jsonl")
+RESULTS_TABLE   = os.path.join(EXPERIMENT_DIR, "results_table.csv")
+DEFAULT_WORKERS = 4
+
+DEFAULT_SPEC = {
+    "ragas": None,                 # None = every raga passing MIN_CLIPS
+    "exclude_ragas": [],
+    "n_bins": N_BINS,
+    "min_stable": MIN_STABLE_FRAMES,
+    "alpha": ALPHA,
+    "pcd_weight": PCD_WEIGHT,
+    "dyad_weight": DYAD_WEIGHT,
+    "per_raga_weights": dict(PER_RAGA_WEIGHTS),
+    "margin_strict": MARGIN_STRICT,
+    "min_margin_final": MIN_MARGIN_FINAL,
+    "extra_terms": [],
+}
+
+
+# =========================
+# SPECS
+# =========================
+def resolve_specs(spec_doc):
+    """Spec document -> list of fully resolved variant specs (with "name")."""
+    base = spec_doc.get("base", {})
+    variants = spec_doc.get("variants", [{}])
+
+    resolved = []
+    for k, variant in enumerate(variants):
+        spec = {**DEFAULT_SPEC, **base, **variant}
+
+        unknown = set(spec) - set(DEFAULT_SPEC) - {"name"}
+        if unknown:
+            raise ValueError(f"Unknown spec keys in variant {k}: {sorted(unknown)}")
+
+        spec.setdefault("name", f"variant_{k}")
+        resolved.append(spec)
+
+    return resolved
+
+
+def spec_hash(spec):
+    body = {k: v for k, v in spec.items() if k != "name"}
+    blob = json.dumps(body, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:12]
+
+
+def corpus_hash(clips):
+    blob = "\n".join(c["fname"] for c in clips).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:12]
+
+
+# =========================
+# MEMO (thread-safe, compute-once)
+# =========================
+class Memo:
+    """key -> value; concurrent callers of the same key wait for one computation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def get(self, key, fn):
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+
+        if owner:
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+
+        return future.result()
+
+
+# =========================
+# SCORING
+# =========================
+def _subset(clips, spec):
+    """Row indices of the clips this variant evaluates on."""
+    keep = set(spec["ragas"]) if spec["ragas"] is not None else {c["raga"] for c in clips}
+    keep -= set(spec["exclude_ragas"])
+    return tuple(i for i, c in enumerate(clips) if c["raga"] in keep)
+
+
+def _features(clips, memo, spec):
+    n_bins, min_stable, alpha = spec["n_bins"], spec["min_stable"], spec["alpha"]
+
+    pcd = memo.get(("pcd", n_bins), lambda: pcd_matrix(clips, n_bins))
+    counts = memo.get(("counts", n_bins, min_stable),
+                      lambda: count_matrices(clips, n_bins, min_stable))
+    up, down = memo.get(("smooth", n_bins, min_stable, alpha),
+                        lambda: (smooth(counts[0], alpha), smooth(counts[1], alpha)))
+    return pcd, up, down
+
+
+def prepare_features(clips, memo, specs):
+    """
+    Build every PCD / count matrix the specs need, in the calling thread, so
+    worker threads only read the memo and never write the sweep cache. A
+    failure stays in the memo and is raised again by that variant's run.
+    """
+    for spec in specs:
+        n_bins, min_stable = spec["n_bins"], spec["min_stable"]
+        try:
+            memo.get(("pcd", n_bins), lambda: pcd_matrix(clips, n_bins))
+            memo.get(("counts", n_bins, min_stable),
+                     lambda: count_matrices(clips, n_bins, min_stable))
+        except Exception:
+            continue
+
+
+def run_variant(clips, memo, spec):
+    """Canonical LOO for one resolved spec -> result row (dict)."""
+    subset = _subset(clips, spec)
+    sub_clips = [clips[i] for i in subset]
+
+    raga_order = list(dict.fromkeys(c["raga"] for c in sub_clips))
+    index  = {raga: r for r, raga in enumerate(raga_order)}
+    labels = np.array([index[c["raga"]] for c in sub_clips])
+
+    pcd, up, down = _features(clips, memo, spec)
+    rows = np.array(subset)
+    pcd, up, down = pcd[rows], up[rows], down[rows]
+
+    feat_key = (subset, spec["n_bins"], spec["min_stable"], spec["alpha"])
+    pcd_sim, dyad_sim = memo.get(("loo",) + feat_key,
+                                 lambda: loo_similarities(labels, pcd, up, down))
+
+    per_raga = {r: tuple(w) for r, w in spec["per_raga_weights"].items()}
+    scores = fuse(raga_order, pcd_sim, dyad_sim, per_raga,
+                  spec["pcd_weight"], spec["dyad_weight"])
+
+    # ---- Extra scoring terms, in spec order ----
+    for term in spec["extra_terms"]:
+        if term["type"] == "hubness":
+            gram = memo.get(("gram", spec["pcd_weight"], spec["dyad_weight"]) + feat_key,
+                            lambda: loo_model_similarities(labels, pcd, up, down,
+                                                           spec["pcd_weight"], spec["dyad_weight"]))
+            scores = scores - term.get("weight", 1.0) * hubness_correction(gram)
+        elif term["type"] == "absent_swara":
+            scores = scores * absent_swara_factor(pcd, raga_order, term.get("penalty", 0.0),
+                                                  term.get("energy_thresh", 0.01))
+        else:
+            raise ValueError(f"Unknown extra term: {term['type']}")
+
+    # ---- Tiering with this variant's margins ----
+    top2 = np.sort(scores, axis=1)[:, -2:]
+    margin = top2[:, 1] - top2[:, 0]
+    decided = margin >= spec["min_margin_final"]
+    pred = np.argmax(scores, axis=1)     # ties: first raga, as sorted() on insertion order
+
+    correct = decided & (pred == labels)
+    wrong = decided & (pred != labels)
+
+    per_raga_acc = {}
+    for r, raga in enumerate(raga_order):
+        mask = labels == r
+        c, w = int(correct[mask].sum()), int(wrong[mask].sum())
+        per_raga_acc[raga] = round(c / (c + w), 4) if c + w else 0.0
+
+    c, w, n = int(correct.sum()), int(wrong.sum()), len(labels)
+    return {
+        "clips": n,
+        "ragas": len(raga_order),
+        "correct": c,
+        "wrong": w,
+        "unknown": n - c - w,
+        "high": int((margin >= spec["margin_strict"]).sum()),
+        "acc_decided": round(c / (c + w), 4) if c + w else 0.0,
+        "per_raga_acc": per_raga_acc,
+    }
+
+
+# =========================
+# RESULTS
+# =========================
+def load_results(path=RESULTS_JSONL):
+    """(spec_hash, corpus_hash) -> latest result record."""
+    results = {}
+    if not os.path.exists(path):
+        return results
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[(rec["spec_hash"], rec["corpus_hash"])] = rec
+
+    return results
+
+
+def write_table(results, path=RESULTS_TABLE):
+    fields = ["spec_hash", "corpus_hash", "name", "clips", "ragas", "correct", "wrong",
+              "unknown", "high", "acc_decided", "timestamp", "per_raga_acc", "spec", "error"]
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for rec in sorted(results.values(), key=lambda r: r["timestamp"]):
+            writer.writerow({**{k: rec.get(k) for k in fields},
+                             "per_raga_acc": json.dumps(rec.get("per_raga_acc")),
+                             "spec": json.dumps(rec["spec"], sort_keys=True)})
+
+
+def run_experiments(spec_doc, workers=DEFAULT_WORKERS, force=False):
+
+    specs = resolve_specs(spec_doc)
+    clips = load_corpus()
+    if not clips:
+        print("No clips pass the corpus guardrails -- nothing to run.")
+        return []
+
+    c_hash = corpus_hash(clips)
+
+    os.makedirs(EXPERIMENT_DIR, exist_ok=True)
+    previous = load_results()
+
+    todo = [s for s in specs if force or (spec_hash(s), c_hash) not in previous]
+    print(f"Corpus: {len(clips)} clips ({c_hash}) | variants: {len(specs)} "
+          f"| cached: {len(specs) - len(todo)} | to run: {len(todo)} | workers: {workers}")
+
+    memo = Memo()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    prepare_features(clips, memo, todo)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [(s, pool.submit(run_variant, clips, memo, s)) for s in todo]
+
+        with open(RESULTS_JSONL, "a", encoding="utf-8") as f:
+            for spec, future in futures:
+                rec = {"spec_hash": spec_hash(spec), "corpus_hash": c_hash,
+                       "name": spec["name"], "timestamp": timestamp,
+                       "spec": {k: v for k, v in spec.items() if k != "name"}}
+                try:
+                    rec.update(future.result())
+                    f.write(json.dumps(rec) + "\n")
+                except Exception as e:
+                    rec["error"] = f"{type(e).__name__}: {e}"
+                    print(f"  FAILED {spec['name']}: {rec['error']}")
+                previous[(rec["spec_hash"], c_hash)] = rec
+
+    write_table(previous)
+
+    print()
+    print("  {:<12} {:<28} {:>7} {:>6} {:>6} {:>8}".format(
+        "spec_hash", "name", "correct", "wrong", "unk", "acc_dec"))
+    print("  " + "-" * 72)
+    for spec in specs:
+        rec = previous[(spec_hash(spec), c_hash)]
+        if rec.get("error"):
+            print("  {:<12} {:<28} ERROR {}".format(rec["spec_hash"], spec["name"][:28], rec["error"]))
+            continue
+        print("  {:<12} {:<28} {:>7} {:>6} {:>6} {:>7.1f}%".format(
+            rec["spec_hash"], spec["name"][:28], rec["correct"], rec["wrong"],
+            rec["unknown"], rec["acc_decided"] * 100))
+
+    print(f"\nTable: {RESULTS_TABLE}")
+    return [previous[(spec_hash(s), c_hash)] for s in specs]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run declarative LOO experiment specs.")
+    ap.add_argument("spec", help="JSON spec file with 'base' and 'variants'")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--force", action="store_true", help="re-run specs already in results.jsonl")
+    args = ap.parse_args()
+
+    with open(args.spec, "r", encoding="utf-8") as f:
+        spec_doc = json.load(f)
+
+    run_experiments(spec_doc, workers=args.workers, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
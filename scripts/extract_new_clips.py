@@ -3,16 +3,17 @@ Extract features for NEW clips only (skip files that already have features).
 Targets: new Kamboji, Mohanam, Saveri, Abhogi, Madhyamavati, Hamsadhvani clips.
 """
 import os, librosa, numpy as np
-from datetime import datetime
 import sys
 sys.path.insert(0, r"D:\Swaragam\scripts")
-from utils import estimate_tonic
+from utils import estimate_tonic, pitch_stability_gate
 
 SR = 22050
 MAX_DURATION_SEC = 360
 FMIN = librosa.note_to_hz("C1")
 FMAX = librosa.note_to_hz("C6")
 from feature_constants import FEATURE_VERSION
+from feature_cache import extraction_params, lookup, store
+CACHE_PARAMS = extraction_params(SR, FMIN, FMAX, MAX_DURATION_SEC)
 WINDOW_SIZE = 10
 DRIFT_THRESHOLD = 25
 VOICED_RATIO_THRESHOLD = 0.6
@@ -22,7 +23,7 @@ DATASET_DIR = r"D:\Swaragam\datasets\seed_carnatic"
 FEATURE_DIR = r"D:\Swaragam\pcd_results\features_v12"
 os.makedirs(FEATURE_DIR, exist_ok=True)
 
-# Get list of already-extracted base names
+# Legacy timestamped names (pre content-addressed cache) -- still honoured
 existing_features = set()
 for f in os.listdir(FEATURE_DIR):
     if f.endswith('.npz'):
@@ -33,24 +34,8 @@ for f in os.listdir(FEATURE_DIR):
             existing_features.add(base.lower())
 
 def apply_pitch_stability_gate(f0, sa_hz, voiced_flag):
-    cents = np.zeros_like(f0)
-    valid_idx = np.where(~np.isnan(f0))[0]
-    cents[valid_idx] = 1200 * np.log2(f0[valid_idx] / sa_hz)
-    cents = np.mod(cents, 1200)
-    gated_mask = np.zeros_like(f0, dtype=bool)
-    for i in range(0, len(f0) - WINDOW_SIZE):
-        window = cents[i:i+WINDOW_SIZE]
-        voiced_window = voiced_flag[i:i+WINDOW_SIZE]
-        if np.mean(voiced_window) < VOICED_RATIO_THRESHOLD:
-            continue
-        c1 = np.mean(window[:WINDOW_SIZE//2])
-        c2 = np.mean(window[WINDOW_SIZE//2:])
-        drift = abs(c2 - c1)
-        if drift < DRIFT_THRESHOLD:
-            gated_mask[i:i+WINDOW_SIZE] = True
-    gated_cents = cents[gated_mask]
-    gating_ratio = np.sum(gated_mask) / (np.sum(voiced_flag) + EPS)
-    return gated_cents, gating_ratio
+    return pitch_stability_gate(f0, sa_hz, voiced_flag,
+                                WINDOW_SIZE, DRIFT_THRESHOLD, VOICED_RATIO_THRESHOLD)
 
 def process_file(audio_path, raga_label):
     y, sr = librosa.load(audio_path, sr=SR, duration=MAX_DURATION_SEC)
@@ -65,11 +50,8 @@ def process_file(audio_path, raga_label):
     
     cents_gated, gating_ratio = apply_pitch_stability_gate(f0, sa_hz, voiced_flag)
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     base_name = os.path.splitext(os.path.basename(audio_path))[0]
-    out_path = os.path.join(FEATURE_DIR, "{}_{}.npz".format(base_name, timestamp))
-    
-    np.savez(out_path,
+    store(FEATURE_DIR, audio_path, CACHE_PARAMS,
         feature_version=FEATURE_VERSION, raga=raga_label,
         sa_hz=sa_hz, f0=f0, voiced_flag=voiced_flag,
         cents_gated=cents_gated, gating_ratio=gating_ratio,
@@ -107,6 +89,9 @@ for raga_folder in sorted(os.listdir(DATASET_DIR)):
         if any(base[:20] in existing for existing in existing_features):
             skipped += 1
             continue
+        if lookup(FEATURE_DIR, os.path.join(raga_path, f), CACHE_PARAMS) is not None:
+            skipped += 1
+            continue
         new_files.append(f)
     
     if new_files:
@@ -1,7 +1,6 @@
 import os
 import librosa
 import numpy as np
-from datetime import datetime
 
 # =========================
 # CONFIG
@@ -12,9 +11,13 @@ FMIN = librosa.note_to_hz("C1")
 FMAX = librosa.note_to_hz("C6")
 PCD_BINS = 36
 
-from feature_constants import FEATURE_VERSION
+from feature_constants import PYIN_PROFILES, profile_frames
+from utils import pitch_stability_gate, _choose_best_tonic
+from feature_cache import extraction_params, store, file_sha256
+from audio_cache import load_audio
+from stage_diagnostics import NULL_RECORDER
 
-WINDOW_SIZE = 10
+WINDOW_SIZE = profile_frames("default")["window_size"]   # GATE_WINDOW_MS at SR / hop 512 = 10
 DRIFT_THRESHOLD = 25
 VOICED_RATIO_THRESHOLD = 0.6
 EPS = 1e-8
@@ -23,110 +26,135 @@ BASE_DIR = r"D:\Swaragam"
 DATASET_DIR = os.path.join(BASE_DIR, "datasets", "seed_carnatic")
 FEATURE_DIR = os.path.join(BASE_DIR, "pcd_results", "features_v12")
 
+# Content-addressed cache key parameters (feature_cache.py)
+CACHE_PARAMS = extraction_params(SR, FMIN, FMAX, MAX_DURATION_SEC)
+
+# Non-default pYIN profiles (feature_constants.PYIN_PROFILES) get their own
+# feature folder; "default" is exactly FMIN/FMAX/FEATURE_DIR above.
+PROFILE_FEATURE_DIRS = {
+    "default": FEATURE_DIR,
+    "fast": os.path.join(BASE_DIR, "pcd_results", "features_v12_fast"),
+    "lowsr": os.path.join(BASE_DIR, "pcd_results", "features_v12_sr11k"),
+}
+
 os.makedirs(FEATURE_DIR, exist_ok=True)
 
 
 # =========================
-# TONIC SELECTION
+# PYIN PROFILES
 # =========================
-def choose_best_tonic(peaks_hz, pitch_values):
-    candidates = []
+def pyin_kwargs(profile="default"):
+    """librosa.pyin keyword arguments (incl. sr / frame / hop) for an extraction profile."""
+    prof = PYIN_PROFILES[profile]
+    return {
+        "sr": prof["sr"],
+        "frame_length": prof["frame_length"],
+        "hop_length": prof["hop_length"],
+        "fmin": librosa.note_to_hz(prof["fmin_note"]),
+        "fmax": librosa.note_to_hz(prof["fmax_note"]),
+        "resolution": prof["resolution"],
+        "n_thresholds": prof["n_thresholds"],
+    }
+
+
+def profile_cache_params(profile="default"):
+    """feature_cache key parameters for a profile (default == CACHE_PARAMS)."""
+    kw = pyin_kwargs(profile)
+    return extraction_params(kw["sr"], kw["fmin"], kw["fmax"], MAX_DURATION_SEC,
+                             PYIN_PROFILES[profile]["feature_version"])
 
-    for hz in peaks_hz:
-        for mult in (0.5, 1.0, 2.0):
-            cand = hz * mult
-            if 80 <= cand <= 400:
-                candidates.append(cand)
 
-    scores = []
-    for cand in candidates:
-        cents = 1200 * np.log2(pitch_values / cand)
-        cents = cents[(cents > -1200) & (cents < 1200)]
-        score = np.sum(np.abs(cents) < 50)
-        scores.append(score)
-
-    return candidates[np.argmax(scores)]
+# =========================
+# TONIC SELECTION
+# =========================
+def choose_best_tonic(peaks_hz, pitch_values):
+    """Octave-aware candidate scoring -- the shared vectorised scorer in utils.py."""
+    return _choose_best_tonic(peaks_hz, pitch_values)
 
 
 # =========================
 # PITCH STABILITY GATE
 # =========================
-def apply_pitch_stability_gate(f0, sa_hz, voiced_flag):
-    cents = np.zeros_like(f0)
-    valid_idx = np.where(~np.isnan(f0))[0]
-
-    cents[valid_idx] = 1200 * np.log2(f0[valid_idx] / sa_hz)
-    cents = np.mod(cents, 1200)
-
-    gated_mask = np.zeros_like(f0, dtype=bool)
+def apply_pitch_stability_gate(f0, sa_hz, voiced_flag, window_size=WINDOW_SIZE):
+    return pitch_stability_gate(
+        f0, sa_hz, voiced_flag,
+        window_size, DRIFT_THRESHOLD, VOICED_RATIO_THRESHOLD
+    )
 
-    for i in range(0, len(f0) - WINDOW_SIZE):
-        window = cents[i:i+WINDOW_SIZE]
-        voiced_window = voiced_flag[i:i+WINDOW_SIZE]
 
-        if np.mean(voiced_window) < VOICED_RATIO_THRESHOLD:
-            continue
+# =========================
+# PROCESS ONE FILE
+# =========================
+def gated_features(f0, voiced_flag, window_size=WINDOW_SIZE, recorder=NULL_RECORDER):
+    """Tonic + stability-gated cents for one f0 track -> (sa_hz, cents_gated, gating_ratio) or None."""
+    valid_f0 = f0[~np.isnan(f0)]
+    if len(valid_f0) == 0:
+        return None
 
-        c1 = np.mean(window[:WINDOW_SIZE//2])
-        c2 = np.mean(window[WINDOW_SIZE//2:])
-        drift = abs(c2 - c1)
+    with recorder.stage("tonic"):
+        hist, bin_edges = np.histogram(valid_f0, bins=200)
+        top_idx = np.argsort(hist)[-5:]
+        top_peaks = [(bin_edges[i] + bin_edges[i+1]) / 2 for i in top_idx]
 
-        if drift < DRIFT_THRESHOLD:
-            gated_mask[i:i+WINDOW_SIZE] = True
+        sa_hz = choose_best_tonic(top_peaks, valid_f0)
 
-    gated_cents = cents[gated_mask]
-    gating_ratio = np.sum(gated_mask) / (np.sum(voiced_flag) + EPS)
+    with recorder.stage("gate"):
+        cents_gated, gating_ratio = apply_pitch_stability_gate(
+            f0, sa_hz, voiced_flag, window_size
+        )
 
-    return gated_cents, gating_ratio
+    return sa_hz, cents_gated, gating_ratio
 
 
-# =========================
-# PROCESS ONE FILE
-# =========================
-def process_file(audio_path, raga_label):
+def process_file(audio_path, raga_label, profile="default", recorder=NULL_RECORDER):
+    """
+    Extract + store one clip's features -> gating_ratio, or None if unvoiced.
+    recorder: stage_diagnostics.StageRecorder for decode / pyin / tonic /
+    gate / store timings (read them with recorder.report()).
+    """
+    kw = pyin_kwargs(profile)
+    window_size = profile_frames(profile)["window_size"]
 
-    y, sr = librosa.load(audio_path, sr=SR, duration=MAX_DURATION_SEC)
+    with recorder.stage("decode"):
+        audio_sha = file_sha256(audio_path)   # one hash for the decode cache and the feature store
+        y, sr = load_audio(audio_path, sr=kw["sr"], duration=MAX_DURATION_SEC,
+                           audio_sha=audio_sha, max_duration_sec=MAX_DURATION_SEC)
 
-    f0, voiced_flag, _ = librosa.pyin(
-        y, fmin=FMIN, fmax=FMAX, sr=sr
-    )
+    with recorder.stage("pyin"):
+        f0, voiced_flag, _ = librosa.pyin(y, **kw)
 
-    valid_f0 = f0[~np.isnan(f0)]
-    if len(valid_f0) == 0:
+    gated = gated_features(f0, voiced_flag, window_size, recorder)
+    if gated is None:
         print(f"Skipped (no voiced): {audio_path}")
         return None
 
-    hist, bin_edges = np.histogram(valid_f0, bins=200)
-    top_idx = np.argsort(hist)[-5:]
-    top_peaks = [(bin_edges[i] + bin_edges[i+1]) / 2 for i in top_idx]
-
-    sa_hz = choose_best_tonic(top_peaks, valid_f0)
-
-    cents_gated, gating_ratio = apply_pitch_stability_gate(
-        f0, sa_hz, voiced_flag
-    )
+    sa_hz, cents_gated, gating_ratio = gated
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     base_name = os.path.splitext(os.path.basename(audio_path))[0]
 
-    out_path = os.path.join(
-        FEATURE_DIR,
-        f"{base_name}_{timestamp}.npz"
-    )
-
-    np.savez(
-        out_path,
-        feature_version=FEATURE_VERSION,
-        raga=raga_label,
-        sa_hz=sa_hz,
-        f0=f0,
-        voiced_flag=voiced_flag,
-        cents_gated=cents_gated,
-        gating_ratio=gating_ratio,
-        window_size=WINDOW_SIZE,
-        drift_threshold=DRIFT_THRESHOLD,
-        voiced_ratio_threshold=VOICED_RATIO_THRESHOLD,
-    )
+    feature_dir = PROFILE_FEATURE_DIRS[profile]
+    os.makedirs(feature_dir, exist_ok=True)
+
+    # Keyed by audio content + profile params: re-extraction overwrites, never duplicates
+    with recorder.stage("store"):
+        store(
+            feature_dir,
+            audio_path,
+            profile_cache_params(profile),
+            audio_sha=audio_sha,
+            feature_version=PYIN_PROFILES[profile]["feature_version"],
+            raga=raga_label,
+            sa_hz=sa_hz,
+            f0=f0,
+            voiced_flag=voiced_flag,
+            cents_gated=cents_gated,
+            gating_ratio=gating_ratio,
+            window_size=window_size,
+            sr=kw["sr"],
+            hop_length=kw["hop_length"],
+            drift_threshold=DRIFT_THRESHOLD,
+            voiced_ratio_threshold=VOICED_RATIO_THRESHOLD,
+        )
 
     print(f"{raga_label} | {base_name} | gating={gating_ratio:.3f}")
 
@@ -0,0 +1,311 @@
+"""
+Parallel, resumable feature extraction driver.
+
+Runs process_file() from extract_pitch_batch_v12.py over seed_carnatic/ in a
+process pool -- one clip per worker process, so librosa.load + pYIN use every
+core instead of one.
+
+Every finished clip is appended to a JSONL manifest in FEATURE_DIR, keyed by
+(audio path, size, mtime, FEATURE_VERSION). A crashed or interrupted run
+resumes by skipping clips already in the manifest; failed clips are NOT
+recorded there, so the next run retries them. Per-file wall time and failures
+are written to a summary CSV at the end.
+
+A worker that dies outright (OOM kill, segfault in numba / libsndfile)
+breaks the pool: it is rebuilt, and the clips that were in flight are
+retried one at a time in a single-worker pool. A clip that kills its worker
+again is recorded as "crashed" -- in the summary, and in the manifest for
+the record (crashed entries do not count as done, so a later run retries).
+
+    python extract_pitch_parallel.py                # workers = cores - 1
+    python extract_pitch_parallel.py --workers 8
+    python extract_pitch_parallel.py --profile fast   # features_v12_fast/, FEATURE_VERSION_FAST
+    python extract_pitch_parallel.py --diagnostics    # + per-stage p50/p95/max report
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import numpy as np
+
+from extract_pitch_batch_v12 import (
+    DATASET_DIR, FEATURE_DIR, PROFILE_FEATURE_DIRS, process_file,
+)
+from feature_constants import FEATURE_VERSION, PYIN_PROFILES
+from stage_diagnostics import (
+    StageRecorder, NULL_RECORDER, STAGE_REPORT_FIELDS, stage_report, format_stage_report,
+)
+
+# =========================
+# CONFIG
+# =========================
+SUPPORTED_EXTS   = (".wav", ".mp3", ".flac")
+DEFAULT_WORKERS  = max(1, (os.cpu_count() or 2) - 1)
+RETRY_STATUSES   = ("failed", "crashed")   # manifest entries that do not count as done
+MANIFEST_NAME    = "extraction_manifest.jsonl"
+MANIFEST_PATH    = os.path.join(FEATURE_DIR, MANIFEST_NAME)
+
+
+# =========================
+# MANIFEST
+# =========================
+def manifest_key(audio_path, feature_version=FEATURE_VERSION):
+    """(path, size, mtime, FEATURE_VERSION) -- changes if the clip is replaced."""
+    st = os.stat(audio_path)
+    return (os.path.abspath(audio_path), st.st_size, st.st_mtime_ns, feature_version)
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Set of completed job keys. A torn last line from a crash is ignored."""
+    done = set()
+
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("status") in RETRY_STATUSES:
+                continue
+            done.add((entry["audio_path"], entry["size"],
+                      entry["mtime_ns"], entry["feature_version"]))
+
+    return done
+
+
+def append_manifest(entry, path=MANIFEST_PATH):
+    """One line per completed clip, flushed to disk before the next one."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# =========================
+# JOBS
+# =========================
+def collect_jobs(dataset_dir=DATASET_DIR):
+    """(audio_path, raga) for every supported clip, same walk as batch_extract()."""
+    jobs = []
+
+    for raga_folder in sorted(os.listdir(dataset_dir)):
+        raga_path = os.path.join(dataset_dir, raga_folder)
+
+        if not os.path.isdir(raga_path):
+            continue
+
+        for file in sorted(os.listdir(raga_path)):
+            if file.lower().endswith(SUPPORTED_EXTS):
+                jobs.append((os.path.join(raga_path, file), raga_folder))
+
+    return jobs
+
+
+def _run_job(audio_path, raga_label, profile="default", diagnostics=False):
+    """Worker entry point. Never raises -- failures come back as data."""
+    t0 = time.time()
+    recorder = StageRecorder() if diagnostics else NULL_RECORDER
+
+    try:
+        ratio = process_file(audio_path, raga_label, profile, recorder)
+        status = "ok" if ratio is not None else "no_voiced"
+        error = ""
+    except Exception as e:
+        ratio = None
+        status = "failed"
+        error = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+
+    return {
+        "audio_path": audio_path,
+        "raga": raga_label,
+        "status": status,
+        "gating_ratio": None if ratio is None else float(ratio),
+        "seconds": round(time.time() - t0, 2),
+        "error": error,
+        "diagnostics": recorder.report() if diagnostics else None,
+    }
+
+
+# =========================
+# PARALLEL DRIVER
+# =========================
+def _crashed_result(job):
+    audio_path, raga, _ = job
+    return {"audio_path": audio_path, "raga": raga, "status": "crashed", "gating_ratio": None,
+            "seconds": 0.0, "error": "worker process died (BrokenProcessPool)", "diagnostics": None}
+
+
+def _run_pool(jobs, workers, profile, diagnostics, record):
+    """
+    Run jobs with at most `workers` in flight, calling record(job, result) as
+    each finishes. If a worker dies the pool is rebuilt and the queue carries
+    on. -> jobs that were in flight in a broken pool (not recorded).
+    """
+    queue = list(jobs)
+    suspects = []
+
+    while queue:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            inflight = {}
+            broken = False
+
+            while (queue or inflight) and not broken:
+                while queue and len(inflight) < workers:
+                    job = queue.pop(0)
+                    inflight[pool.submit(_run_job, job[0], job[1], profile, diagnostics)] = job
+
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = inflight.pop(future)
+                    try:
+                        record(job, future.result())
+                    except BrokenProcessPool:
+                        broken = True
+                        suspects.append(job)
+
+            # The other in-flight futures of a broken pool fail the same way
+            suspects.extend(inflight.values())
+
+    return suspects
+
+
+def batch_extract_parallel(workers=DEFAULT_WORKERS, dataset_dir=DATASET_DIR, profile="default",
+                           diagnostics=False):
+
+    feature_dir   = PROFILE_FEATURE_DIRS[profile]
+    manifest_path = os.path.join(feature_dir, MANIFEST_NAME)
+    os.makedirs(feature_dir, exist_ok=True)
+
+    jobs = collect_jobs(dataset_dir)
+    done = load_manifest(manifest_path)
+
+    pending = []
+    for audio_path, raga in jobs:
+        key = manifest_key(audio_path, PYIN_PROFILES[profile]["feature_version"])
+        if key not in done:
+            pending.append((audio_path, raga, key))
+
+    print(f"Clips found: {len(jobs)} | already extracted: {len(jobs) - len(pending)} "
+          f"| to run: {len(pending)} | workers: {workers} | profile: {profile}")
+
+    if not pending:
+        return []
+
+    results = []
+    t_start = time.time()
+
+    def record(job, result):
+        key = job[2]
+        results.append(result)
+
+        if result["status"] != "failed":
+            append_manifest({
+                "audio_path": key[0],
+                "size": key[1],
+                "mtime_ns": key[2],
+                "feature_version": key[3],
+                "raga": result["raga"],
+                "status": result["status"],
+                "gating_ratio": result["gating_ratio"],
+                "seconds": result["seconds"],
+            }, manifest_path)
+
+        print(f"[{len(results)}/{len(pending)}] {result['status']:<9} "
+              f"{os.path.basename(result['audio_path'])} ({result['seconds']:.0f}s)")
+
+    suspects = _run_pool(pending, workers, profile, diagnostics, record)
+
+    if suspects:
+        # Which in-flight clip killed the pool is unknown: retry each on its own
+        print(f"Worker died with {len(suspects)} clip(s) in flight -- retrying them one at a time")
+        for job in _run_pool(suspects, 1, profile, diagnostics, record):
+            record(job, _crashed_result(job))
+
+    wall = time.time() - t_start
+    write_summary(results, wall, workers, feature_dir)
+
+    return results
+
+
+# =========================
+# SUMMARY
+# =========================
+def write_summary(results, wall, workers, feature_dir=FEATURE_DIR):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_path = os.path.join(feature_dir, f"extraction_summary_{timestamp}.csv")
+
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["raga", "file", "status", "seconds", "gating_ratio", "error"])
+        for r in sorted(results, key=lambda r: (r["raga"], r["audio_path"])):
+            writer.writerow([
+                r["raga"],
+                os.path.basename(r["audio_path"]),
+                r["status"],
+                r["seconds"],
+                "" if r["gating_ratio"] is None else round(r["gating_ratio"], 4),
+                r["error"],
+            ])
+
+    failed = [r for r in results if r["status"] in RETRY_STATUSES]
+    cpu_seconds = sum(r["seconds"] for r in results)
+
+    print("\nExtraction Complete")
+    print(f"Clips run    : {len(results)} | failed: {len(failed)}")
+    print(f"Wall time    : {wall:.0f}s | summed per-file: {cpu_seconds:.0f}s "
+          f"| speedup: {cpu_seconds / max(wall, 1e-9):.1f}x on {workers} workers")
+
+    gating_stats = {}
+    for r in results:
+        if r["status"] == "ok":
+            gating_stats.setdefault(r["raga"], []).append(r["gating_ratio"])
+    for raga, ratios in sorted(gating_stats.items()):
+        print(f"{raga} | mean_gating={np.mean(ratios):.3f}")
+
+    for r in failed:
+        print(f"FAILED {os.path.basename(r['audio_path'])}: {r['error']}")
+
+    # Per-stage p50 / p95 / max (--diagnostics)
+    diag = [r["diagnostics"] for r in results if r["diagnostics"] and r["status"] == "ok"]
+    if diag:
+        rows = stage_report(diag)
+        stage_csv = os.path.join(feature_dir, f"extraction_stages_{timestamp}.csv")
+        with open(stage_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=STAGE_REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print("\n" + "\n".join(format_stage_report(rows)))
+        print(f"Stages : {stage_csv}")
+
+    print(f"Summary: {csv_path}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel, resumable pitch/feature extraction.")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                    help=f"worker processes (default: {DEFAULT_WORKERS})")
+    ap.add_argument("--dataset-dir", default=DATASET_DIR,
+                    help="folder with one subfolder per raga of audio clips")
+    ap.add_argument("--profile", default="default", choices=sorted(PYIN_PROFILES),
+                    help="pYIN extraction profile (feature_constants.PYIN_PROFILES)")
+    ap.add_argument("--diagnostics", action="store_true",
+                    help="record per-stage wall time + peak memory and report p50/p95/max")
+    args = ap.parse_args()
+
+    batch_extract_parallel(workers=max(1, args.workers), dataset_dir=args.dataset_dir,
+                           profile=args.profile, diagnostics=args.diagnostics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Content-addressed feature cache for features_v12/.
+
+A cached .npz is named by WHAT it was computed from, not WHEN:
+
+    {audio_sha256[:24]}_{params_sha256[:12]}.npz
+
+audio_sha256 is the hash of the audio file bytes; params_sha256 hashes the
+extraction parameters (SR, FMIN, FMAX, MAX_DURATION_SEC, FEATURE_VERSION).
+Re-extracting a clip overwrites its own entry instead of adding a timestamped
+duplicate, and a lookup is one os.path.exists -- never a glob + load-every-
+candidate scan. Changing any parameter or bumping FEATURE_VERSION changes the
+key, so stale entries can never be served.
+
+feature_index.jsonl (append-only, one line per store, last line wins) lets
+consumers enumerate the cache -- raga, version, source name -- without
+opening every .npz.
+
+    python feature_cache.py [--profile fast] stats
+    python feature_cache.py [--profile fast] gc [--dry-run]   # evict stale versions/params
+    python feature_cache.py migrate <dataset_dir>             # adopt legacy {base}_{ts}.npz
+
+--profile (feature_constants.PYIN_PROFILES) picks the params gc / migrate
+keep and the feature folder (extract_pitch_batch_v12.PROFILE_FEATURE_DIRS).
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from feature_constants import FEATURE_VERSION
+
+INDEX_NAME  = "feature_index.jsonl"
+HASH_CHUNK  = 1 << 20
+AUDIO_EXTS  = (".wav", ".mp3", ".flac")
+
+_LEGACY_RE  = re.compile(r"^(?P<base>.+)_\d{8}_\d{6}\.npz$")   # {base}_{YYYYMMDD}_{HHMMSS}.npz
+
+
+# =========================
+# KEYS
+# =========================
+def extraction_params(sr, fmin, fmax, max_duration_sec, feature_version=FEATURE_VERSION):
+    """The parameter set that defines a cached feature file (part of its key)."""
+    return {
+        "sr": int(sr),
+        "fmin": round(float(fmin), 4),
+        "fmax": round(float(fmax), 4),
+        "max_duration_sec": float(max_duration_sec),
+        "feature_version": str(feature_version),
+    }
+
+
+def params_digest(params):
+    blob = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def file_sha256(path):
+    """SHA-256 of the file bytes, streamed in 1 MB chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(audio_sha, params):
+    return f"{audio_sha[:24]}_{params_digest(params)[:12]}"
+
+
+def cache_path(feature_dir, key):
+    return os.path.join(feature_dir, f"{key}.npz")
+
+
+# =========================
+# LOOKUP / STORE
+# =========================
+def lookup(feature_dir, audio_path, params, audio_sha=None):
+    """Cached .npz path for this clip + params, or None. O(1): hash + exists."""
+    if audio_sha is None:
+        audio_sha = file_sha256(audio_path)
+    path = cache_path(feature_dir, cache_key(audio_sha, params))
+    return path if os.path.exists(path) else None
+
+
+def store(feature_dir, audio_path, params, audio_sha=None, **arrays):
+    """
+    Write arrays to the clip's content-addressed .npz and record it in the
+    index. The file is written to a temp name and renamed, so a crash never
+    leaves a half-written entry under a valid key. Returns the path.
+    """
+    if audio_sha is None:
+        audio_sha = file_sha256(audio_path)
+
+    key  = cache_key(audio_sha, params)
+    path = cache_path(feature_dir, key)
+    tmp  = path + f".tmp{os.getpid()}"     # not *.npz: invisible to directory scans
+
+    with open(tmp, "wb") as fh:
+        np.savez(
+            fh,
+            audio_sha256=audio_sha,
+            params_json=json.dumps(params, sort_keys=True),
+            source_name=os.path.basename(audio_path),
+            **arrays,
+        )
+    os.replace(tmp, path)
+
+    _append_index(feature_dir, {
+        "key": key,
+        "file": os.path.basename(path),
+        "audio_sha256": audio_sha,
+        "params_sha256": params_digest(params),
+        "feature_version": params["feature_version"],
+        "raga": str(arrays.get("raga", "")),
+        "source_name": os.path.basename(audio_path),
+        "stored": datetime.now().strftime("%Y%m%d_%H%M%S"),
+    })
+
+    return path
+
+
+# =========================
+# INDEX
+# =========================
+def _append_index(feature_dir, entry):
+    # One short line per write: appends from parallel extraction workers
+    # do not interleave.
+    with open(os.path.join(feature_dir, INDEX_NAME), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def load_index(feature_dir):
+    """key -> latest index entry whose .npz still exists. Torn lines are skipped."""
+    index_path = os.path.join(feature_dir, INDEX_NAME)
+    entries = {}
+
+    if not os.path.exists(index_path):
+        return entries
+
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["key"]] = entry
+
+    return {k: e for k, e in entries.items()
+            if os.path.exists(os.path.join(feature_dir, e["file"]))}
+
+
+def _rewrite_index(feature_dir, entries):
+    index_path = os.path.join(feature_dir, INDEX_NAME)
+    tmp = index_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for entry in entries.values():
+            f.write(json.dumps(entry) + "\n")
+    os.replace(tmp, index_path)
+
+
+def _stored_version(path):
+    """feature_version saved inside an .npz ("" if absent or unreadable)."""
+    try:
+        with np.load(path, allow_pickle=True) as data:
+            return str(data["feature_version"]) if "feature_version" in data.files else ""
+    except (OSError, ValueError):
+        return ""
+
+
+def feature_files(feature_dir, feature_version=FEATURE_VERSION):
+    """
+    Sorted .npz paths for one feature version: indexed entries (version read
+    from the index) plus any unindexed .npz in the directory -- legacy
+    timestamped files not yet migrated -- whose stored feature_version
+    matches. A partly migrated cache is therefore listed in full.
+    """
+    index = load_index(feature_dir)
+    indexed = {e["file"] for e in index.values()}
+
+    files = [e["file"] for e in index.values() if e["feature_version"] == feature_version]
+    files += [f for f in os.listdir(feature_dir)
+              if f.endswith(".npz") and f not in indexed
+              and _stored_version(os.path.join(feature_dir, f)) == feature_version]
+
+    return sorted(os.path.join(feature_dir, f) for f in files)
+
+
+# =========================
+# MAINTENANCE
+# =========================
+def gc(feature_dir, params, dry_run=False):
+    """
+    Evict indexed entries built with any other params / FEATURE_VERSION than
+    `params`, delete their files and compact the index. Files that are not
+    in the index (legacy or hand-placed) are never touched.
+    """
+    current = params_digest(params)
+    index = load_index(feature_dir)
+
+    keep, evict = {}, []
+    for key, entry in index.items():
+        if entry["params_sha256"] == current:
+            keep[key] = entry
+        else:
+            evict.append(entry)
+
+    for entry in evict:
+        print(f"  EVICT {entry['file']}  ({entry['feature_version']}, {entry['source_name']})")
+        if not dry_run:
+            os.remove(os.path.join(feature_dir, entry["file"]))
+
+    if not dry_run:
+        _rewrite_index(feature_dir, keep)
+
+    print(f"gc: kept {len(keep)} | evicted {len(evict)}" + (" (dry run)" if dry_run else ""))
+    return evict
+
+
+def migrate(feature_dir, dataset_dir, params):
+    """
+    Adopt legacy timestamped files: for each clip in dataset_dir/<raga>/, the
+    newest {base}_{YYYYMMDD_HHMMSS}.npz of the current FEATURE_VERSION is
+    renamed to the clip's content key and indexed. Older duplicates are left
+    in place for review.
+    """
+    legacy = {}
+    for fname in os.listdir(feature_dir):
+        m = _LEGACY_RE.match(fname)
+        if m:
+            legacy.setdefault(m.group("base"), []).append(fname)
+
+    adopted = 0
+    for raga in sorted(os.listdir(dataset_dir)):
+        raga_path = os.path.join(dataset_dir, raga)
+        if not os.path.isdir(raga_path):
+            continue
+
+        for fn in sorted(os.listdir(raga_path)):
+            if not fn.lower().endswith(AUDIO_EXTS):
+                continue
+
+            base = os.path.splitext(fn)[0]
+            match = None
+            for cand in sorted(legacy.get(base, []), reverse=True):   # newest first
+                data = np.load(os.path.join(feature_dir, cand), allow_pickle=True)
+                if str(data.get("feature_version", "")) == params["feature_version"]:
+                    match = cand
+                    break
+
+            if match is None:
+                continue
+
+            arrays = {k: data[k] for k in data.files}
+            store(feature_dir, os.path.join(raga_path, fn), params, **arrays)
+            os.remove(os.path.join(feature_dir, match))
+            adopted += 1
+            print(f"  ADOPT {match} -> {raga}/{fn}")
+
+    print(f"migrate: adopted {adopted} legacy file(s)")
+    return adopted
+
+
+def main():
+    # Production params / folders come from the extraction script (single source).
+    from feature_constants import PYIN_PROFILES
+    from extract_pitch_batch_v12 import PROFILE_FEATURE_DIRS, profile_cache_params
+
+    ap = argparse.ArgumentParser(description="Content-addressed feature cache maintenance.")
+    ap.add_argument("--profile", default="default", choices=sorted(PYIN_PROFILES),
+                    help="extraction profile whose params / feature folder to use")
+    ap.add_argument("--feature-dir", default=None, help="default: the profile's feature folder")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="entries per feature version / raga")
+    p_gc = sub.add_parser("gc", help="evict entries built with stale params or FEATURE_VERSION")
+    p_gc.add_argument("--dry-run", action="store_true")
+    p_mig = sub.add_parser("migrate", help="adopt legacy timestamped .npz files")
+    p_mig.add_argument("dataset_dir")
+    args = ap.parse_args()
+
+    args.feature_dir = args.feature_dir or PROFILE_FEATURE_DIRS[args.profile]
+    params = profile_cache_params(args.profile)
+
+    if args.cmd == "gc":
+        gc(args.feature_dir, params, dry_run=args.dry_run)
+    elif args.cmd == "migrate":
+        migrate(args.feature_dir, args.dataset_dir, params)
+    else:
+        index = load_index(args.feature_dir)
+        counts = {}
+        for e in index.values():
+            counts[(e["feature_version"], e["raga"])] = counts.get((e["feature_version"], e["raga"]), 0) + 1
+        for (fv, raga), n in sorted(counts.items()):
+            print(f"  {fv:8s} {raga:20s} {n:3d}")
+        print(f"  {len(index)} indexed entries")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
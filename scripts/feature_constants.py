@@ -4,6 +4,88 @@ FEATURE_VERSION is stamped into every .npz by extract_pitch_batch_v12.py and
 checked by every consumer (aggregate_all_v12.py, sandbox_q001a_*). Bump it ONCE
 here when the extracted feature format changes; all readers follow automatically.
 Prevents the three-copy drift that silently breaks cache lookup (ADR-015).
+
+PYIN_PROFILES holds the pYIN settings per extraction profile; a profile with
+different settings gets its own feature version string. Stability / gating
+windows are defined in milliseconds and converted to frames per profile
+(profile_frames), so a different SR or hop length keeps their duration:
+5 / 10 frames for default and fast, 3 / 5 frames (139 / 232 ms) for lowsr.
 """
 
 FEATURE_VERSION = "v1.2"
+
+# Pitch-extraction profiles. Each profile stamps its own feature version, so
+# features from different profiles never mix in one cache / aggregation.
+#   default : librosa.pyin defaults over C1-C6 (what v1.2 was built with)
+#   fast    : A1-A5 (55-880 Hz: a fifth below the lowest 80 Hz Sa up to
+#             tara-sthayi phrases), 1/6-semitone pitch states = one 72-bin
+#             PCD bin (16.7 cents), 50 thresholds
+FEATURE_VERSION_FAST = "v1.2-fast"
+
+#   lowsr   : default pYIN settings at 11025 Hz, frame 1024 (the v1.2 92.9 ms
+#             window) and hop kept at 512 samples, so frames are 46.4 ms and
+#             a clip has half as many. pYIN cost follows the frame count:
+#             6-min synthetic clip, 7752 vs 15504 frames, 81 s vs 157 s of
+#             pYIN (1.95x) on the benchmark box. C6 (1047 Hz) is far below
+#             the 5.5 kHz Nyquist.
+FEATURE_VERSION_LOWSR = "v1.2-sr11k-h512"
+
+# Time-based thresholds. v1.2 values were 5 and 10 frames of 512 samples at
+# 22050 Hz; written that way so the default profile converts back exactly.
+MIN_STABLE_MS  = 1000 * 5 * 512 / 22050    # ~116.1 ms: minimum stable-region length
+GATE_WINDOW_MS = 1000 * 10 * 512 / 22050   # ~232.2 ms: pitch-stability gate window
+
+PYIN_PROFILES = {
+    "default": {
+        "feature_version": FEATURE_VERSION,
+        "sr": 22050,
+        "frame_length": 2048,
+        "hop_length": 512,
+        "fmin_note": "C1",
+        "fmax_note": "C6",
+        "resolution": 0.1,
+        "n_thresholds": 100,
+    },
+    "fast": {
+        "feature_version": FEATURE_VERSION_FAST,
+        "sr": 22050,
+        "frame_length": 2048,
+        "hop_length": 512,
+        "fmin_note": "A1",
+        "fmax_note": "A5",
+        "resolution": 1 / 6,
+        "n_thresholds": 50,
+    },
+    "lowsr": {
+        "feature_version": FEATURE_VERSION_LOWSR,
+        "sr": 11025,
+        "frame_length": 1024,
+        "hop_length": 512,
+        "fmin_note": "C1",
+        "fmax_note": "C6",
+        "resolution": 0.1,
+        "n_thresholds": 100,
+    },
+}
+
+
+def ms_to_frames(ms, sr, hop_length):
+    """Duration in ms -> whole pYIN frames at (sr, hop_length), halves rounded up, at least 1."""
+    return max(1, int(ms * sr / (1000 * hop_length) + 0.5))
+
+
+def profile_frames(profile="default"):
+    """MIN_STABLE_MS / GATE_WINDOW_MS in frames of the given extraction profile."""
+    prof = PYIN_PROFILES[profile]
+    return {
+        "min_stable_frames": ms_to_frames(MIN_STABLE_MS, prof["sr"], prof["hop_length"]),
+        "window_size": ms_to_frames(GATE_WINDOW_MS, prof["sr"], prof["hop_length"]),
+    }
+
+
+def profile_for_version(feature_version):
+    """Profile name that stamps feature_version (KeyError if none does)."""
+    for name, prof in PYIN_PROFILES.items():
+        if prof["feature_version"] == feature_version:
+            return name
+    raise KeyError(f"No extraction profile stamps feature version {feature_version!r}")
@@ -0,0 +1,295 @@
+"""
+Exact leave-one-out engine shared by the LOO scripts.
+
+The reference loop (sandbox_loo_v131_canonical.py) rebuilds every raga mean
+from a fresh list for each held-out clip and recomputes the IDF x variance
+weights the same way: O(N^2) copies and np.mean calls. Here per-raga feature
+sums are computed once and each fold is derived from them:
+
+  - fold model of the held-out clip's raga = (S_r - x_i) / (n_r - 1); every
+    other raga keeps its full mean S_r / n_r;
+  - fold IDF x variance weights are recomputed from the fold's (R x 72) PCD
+    stack -- for all folds at once, as an (N, R, 72) tensor;
+  - dyad similarities for all folds come from two (N x R) matrix products,
+    with the held-out raga's term downdated as (x.S_r - x.x) / (n_r - 1).
+
+Scores agree with the reference loop to float rounding (~1e-16), so
+per-fold decisions are identical unless a margin sits within that distance
+of MARGIN_STRICT / MIN_MARGIN_FINAL.
+
+processed: list of {"fname", "raga", "pcd", "up", "down"} as built by the
+LOO scripts' compute_features(). The bin count is taken from the PCD length,
+so any N_BINS works (sweep_engine.py feeds stacked arrays directly).
+"""
+
+import numpy as np
+
+from recognize_raga_v12 import (
+    EPS, PCD_WEIGHT, DYAD_WEIGHT, MARGIN_STRICT, MIN_MARGIN_FINAL,
+)
+
+
+# =========================
+# STACKING
+# =========================
+def stack_processed(processed):
+    """
+    -> (raga_order, labels (N,) int, pcd (N, n_bins), up/down (N, n_bins**2)).
+    raga_order is first-appearance order, as in the reference loop's raga_data.
+    """
+    raga_order = list(dict.fromkeys(c["raga"] for c in processed))
+    index = {raga: r for r, raga in enumerate(raga_order)}
+
+    labels = np.array([index[c["raga"]] for c in processed])
+    pcd  = np.stack([c["pcd"]  for c in processed])
+    up   = np.stack([c["up"]   for c in processed])
+    down = np.stack([c["down"] for c in processed])
+
+    return raga_order, labels, pcd, up, down
+
+
+def fold_idf_var_weights(fold_pcds):
+    """idf_var_weights() for a batch of folds: (F, R, n_bins) -> (F, n_bins)."""
+    n_ragas, n_bins = fold_pcds.shape[1:]
+    threshold = 1.0 / n_bins
+    doc_freq  = np.sum(fold_pcds > threshold, axis=1)
+    idf       = np.log(n_ragas / (doc_freq + 1)) + 1
+    bin_std   = np.std(fold_pcds, axis=1)
+    w         = idf / (bin_std + EPS)
+    return w / (np.sum(w, axis=1, keepdims=True) + EPS) * n_bins
+
+
+# =========================
+# LOO SCORES
+# =========================
+def _fold_state(labels, pcd, up, down):
+    """
+    Per-raga sums + every fold's weighted PCD models, shared by the LOO kernels.
+    A clip that is its raga's only one ("absent") gets a fold without that
+    raga, as in the reference loop; its weights come from the other R - 1.
+    """
+    n_clips, n_bins = pcd.shape
+    n_ragas = int(labels.max()) + 1
+    rows = np.arange(n_clips)
+
+    counts = np.bincount(labels, minlength=n_ragas)
+    if n_ragas < 3 and np.any(counts < 2):
+        raise ValueError("LOO with a single-clip raga needs >= 3 ragas (its fold keeps < 2)")
+
+    # ---- Per-raga sums, computed once ----
+    sum_pcd  = np.zeros((n_ragas, n_bins))
+    sum_up   = np.zeros((n_ragas, up.shape[1]))
+    sum_down = np.zeros((n_ragas, down.shape[1]))
+    np.add.at(sum_pcd,  labels, pcd)
+    np.add.at(sum_up,   labels, up)
+    np.add.at(sum_down, labels, down)
+
+    absent = counts[labels] == 1                      # (N,) fold drops the clip's raga
+    n_held = np.maximum(counts[labels] - 1, 1)        # (N,) clips left in own raga (>= 1 for division)
+
+    # ---- Fold PCD models: full means, own raga downdated (zero when absent) ----
+    fold_pcds = np.broadcast_to(sum_pcd / counts[:, None], (n_clips, n_ragas, n_bins)).copy()
+    fold_pcds[rows, labels] = (sum_pcd[labels] - pcd) / n_held[:, None]
+
+    weights = fold_idf_var_weights(fold_pcds)        # (N, n_bins)
+    for i in rows[absent]:
+        keep = np.arange(n_ragas) != labels[i]
+        weights[i] = fold_idf_var_weights(fold_pcds[i:i + 1, keep])[0]
+
+    model_w = fold_pcds * weights[:, None, :]
+    model_w = model_w / (np.sum(model_w, axis=2, keepdims=True) + EPS)
+
+    # ---- Dyads: x.S_r for every (clip, raga) ----
+    up_dot   = up   @ sum_up.T                        # (N, R)
+    down_dot = down @ sum_down.T
+
+    return {
+        "rows": rows, "counts": counts, "n_held": n_held, "absent": absent, "weights": weights,
+        "model_w": model_w, "sum_up": sum_up, "sum_down": sum_down,
+        "up_dot": up_dot, "down_dot": down_dot,
+    }
+
+
+def loo_similarities(labels, pcd, up, down):
+    """
+    Fold similarities for stacked clips, before fusion.
+    labels (N,) raga indices 0..R-1; pcd (N, n_bins); up/down (N, n_bins**2).
+    -> (pcd_sim, dyad_sim), each (N, R); row i = clip i against its own fold.
+    A raga missing from a fold (single-clip raga, own clip held out) is -inf.
+    """
+    st = _fold_state(labels, pcd, up, down)
+    rows, counts, n_held = st["rows"], st["counts"], st["n_held"]
+
+    test_w = pcd * st["weights"]
+    test_w = test_w / (np.sum(test_w, axis=1, keepdims=True) + EPS)
+
+    pcd_sim = np.einsum("nk,nrk->nr", test_w, st["model_w"])
+
+    # ---- Dyads: full means, then downdate own raga ----
+    up_sim   = st["up_dot"]   / counts
+    down_sim = st["down_dot"] / counts
+    up_sim[rows, labels]   = (st["up_dot"][rows, labels]   - np.einsum("nk,nk->n", up, up))     / n_held
+    down_sim[rows, labels] = (st["down_dot"][rows, labels] - np.einsum("nk,nk->n", down, down)) / n_held
+
+    dyad_sim = 0.5 * (up_sim + down_sim)
+    absent = st["absent"]
+    pcd_sim[absent, labels[absent]]  = -np.inf
+    dyad_sim[absent, labels[absent]] = -np.inf
+
+    return pcd_sim, dyad_sim
+
+
+def loo_model_similarities(labels, pcd, up, down,
+                           pcd_weight=PCD_WEIGHT, dyad_weight=DYAD_WEIGHT):
+    """
+    Model-to-model similarity inside every fold (hubness-style corrections):
+    (N, R, R), entry [i, r, s] = fused similarity of fold-i models r and s.
+    The diagonal is not meaningful; row / column of a raga missing from the
+    fold are NaN.
+    """
+    st = _fold_state(labels, pcd, up, down)
+    rows, counts, n_held = st["rows"], st["counts"], st["n_held"]
+
+    pcd_gram = np.einsum("nrk,nsk->nrs", st["model_w"], st["model_w"])
+
+    dyad_gram = 0
+    for sums, dots in ((st["sum_up"], st["up_dot"]), (st["sum_down"], st["down_dot"])):
+        means = sums / counts[:, None]
+        gram  = np.broadcast_to(means @ means.T, (len(rows),) + (len(counts),) * 2).copy()
+
+        # Own raga's fold model m' = (S_r - x) / (n_r - 1):
+        # m'.m_s = (n_r * m_r.m_s - x.m_s) / (n_r - 1)
+        own = (counts[labels][:, None] * gram[rows, labels] - dots / counts) / n_held[:, None]
+        gram[rows, labels, :] = own
+        gram[rows, :, labels] = own
+        dyad_gram = dyad_gram + 0.5 * gram
+
+    gram = pcd_weight * pcd_gram + dyad_weight * dyad_gram
+    absent = st["absent"]
+    gram[absent, labels[absent], :] = np.nan
+    gram[absent, :, labels[absent]] = np.nan
+
+    return gram
+
+
+def fuse(raga_order, pcd_sim, dyad_sim, per_raga_weights=None,
+         pcd_weight=PCD_WEIGHT, dyad_weight=DYAD_WEIGHT):
+    """r_pcd_w * pcd_sim + r_dyad_w * dyad_sim with PER_RAGA_WEIGHTS-style overrides."""
+    if per_raga_weights is None:
+        per_raga_weights = {}
+
+    pairs = [per_raga_weights.get(raga, (pcd_weight, dyad_weight)) for raga in raga_order]
+    r_pcd_w  = np.array([p for p, _ in pairs])
+    r_dyad_w = np.array([d for _, d in pairs])
+
+    scores = r_pcd_w * pcd_sim + r_dyad_w * dyad_sim
+    scores[np.isneginf(pcd_sim)] = -np.inf           # raga missing from the fold, even at weight 0
+    return scores
+
+
+def loo_scores(processed, per_raga_weights=None,
+               pcd_weight=PCD_WEIGHT, dyad_weight=DYAD_WEIGHT):
+    """
+    Score every held-out clip against its fold's models.
+    -> (raga_order, scores (N, R)); row i = clip i scored with clip i held out.
+    """
+    raga_order, labels, pcd, up, down = stack_processed(processed)
+    pcd_sim, dyad_sim = loo_similarities(labels, pcd, up, down)
+
+    return raga_order, fuse(raga_order, pcd_sim, dyad_sim,
+                            per_raga_weights, pcd_weight, dyad_weight)
+
+
+# =========================
+# EXTRA SCORING TERMS
+# =========================
+# 72-bin swara regions and raga swara sets, as validated in
+# sandbox_absent_swara_v2.py (bins of 16.7 cents from Sa).
+SWARA_BIN_RANGES = {
+    "Sa": (0, 2),   "R1": (5, 8),   "R2": (12, 14), "G2": (10, 12),
+    "G3": (17, 20), "M1": (17, 19), "M2": (27, 31), "Pa": (27, 31),
+    "D1": (39, 43), "D2": (49, 53), "N2": (58, 61), "N3": (69, 71),
+}
+
+RAGA_SWARAS = {
+    "Kalyani":          ["Sa", "R2", "G3", "M2", "Pa", "D2", "N3"],
+    "Abhogi":           ["Sa", "R2", "G2", "M2", "D2"],
+    "Shankarabharanam": ["Sa", "R2", "G3", "M1", "Pa", "D2", "N3"],
+    "Bhairavi":         ["Sa", "R1", "G2", "M1", "Pa", "D1", "N2"],
+    "Thodi":            ["Sa", "R1", "G2", "M1", "Pa", "D1", "N2"],
+    "Mohanam":          ["Sa", "R2", "G3", "Pa", "D2"],
+    "Saveri":           ["Sa", "R1", "M1", "Pa", "D1"],
+}
+
+
+def hubness_correction(gram):
+    """
+    (N, R) per-fold hubness offsets from loo_model_similarities(): each model's
+    average similarity to the other models, centred on the fold mean
+    (sandbox_hubness.py). Subtract a multiple of it from the scores. A raga
+    missing from a fold gets 0 and does not count towards the others.
+    """
+    off = gram.copy()
+    diag = np.arange(gram.shape[1])
+    off[:, diag, diag] = np.nan
+    n_other = np.sum(~np.isnan(off), axis=2)
+
+    with np.errstate(invalid="ignore"):
+        avg_sim = np.nansum(off, axis=2) / n_other
+        avg_sim[n_other == 0] = np.nan                 # raga missing from the fold
+        centred = avg_sim - np.nanmean(avg_sim, axis=1, keepdims=True)
+
+    return np.nan_to_num(centred, nan=0.0)
+
+
+def absent_swara_factor(pcd, raga_order, penalty, energy_thresh=0.01):
+    """
+    (N, R) multiplier 1 - penalty * (share of the raga's swaras whose PCD
+    energy is below energy_thresh). Ragas without a swara set get 1.
+    """
+    if pcd.shape[1] != 72:
+        raise ValueError("absent_swara term is defined on the 72-bin PCD only")
+
+    factor = np.ones((len(pcd), len(raga_order)))
+    for r, raga in enumerate(raga_order):
+        required = RAGA_SWARAS.get(raga)
+        if not required:
+            continue
+        energies = np.stack([pcd[:, lo:hi + 1].sum(axis=1)
+                             for lo, hi in (SWARA_BIN_RANGES[s] for s in required)], axis=1)
+        factor[:, r] = 1.0 - penalty * np.mean(energies < energy_thresh, axis=1)
+
+    return factor
+
+
+# =========================
+# LOO DECISIONS
+# =========================
+def loo_decisions(processed, per_raga_weights=None,
+                  pcd_weight=PCD_WEIGHT, dyad_weight=DYAD_WEIGHT):
+    """
+    Per-fold decisions with the canonical tiering:
+        [{"fname", "raga", "pred", "tier", "margin", "ranked"}, ...]
+    tier is "HIGH" | "MOD" | "UNK"; pred is "UNKNOWN" for "UNK".
+    """
+    raga_order, scores = loo_scores(processed, per_raga_weights, pcd_weight, dyad_weight)
+    return decide(raga_order, scores, processed)
+
+
+def decide(raga_order, scores, processed):
+    """Canonical tiering of an (N, R) LOO score matrix; processed gives fname/raga."""
+    folds = []
+    for held, row in zip(processed, scores):
+
+        ranked = sorted(((r, s) for r, s in zip(raga_order, row) if s != -np.inf),
+                        key=lambda x: x[1], reverse=True)
+        margin = ranked[0][1] - ranked[1][1] if len(ranked) >= 2 else 0.0
+
+        if   margin >= MARGIN_STRICT:    tier, pred = "HIGH", ranked[0][0]
+        elif margin >= MIN_MARGIN_FINAL: tier, pred = "MOD",  ranked[0][0]
+        else:                            tier, pred = "UNK",  "UNKNOWN"
+
+        folds.append({"fname": held["fname"], "raga": held["raga"], "pred": pred,
+                      "tier": tier, "margin": margin, "ranked": ranked})
+
+    return folds
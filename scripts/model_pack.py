@@ -0,0 +1,189 @@
+"""
+Single-file packed model artifact for an aggregation run.
+
+Replaces the 2R per-raga .npz files in pcd_stats/ + dyad_stats/ (one
+os.listdir + two pickle-enabled np.load calls per raga) with one file:
+
+    magic "SWRGPK01" | uint64 header length | JSON header | raw arrays
+
+The JSON header holds the raga order, the aggregation metadata and, per
+array, its dtype / shape / byte offset. Every array is stacked over ragas
+(row i = header["ragas"][i]) and starts on a 64-byte boundary, so the large
+dyad arrays are memory-mapped read-only instead of read, and nothing is
+ever unpickled.
+
+    python model_pack.py pack <aggregation_run_dir>   # pack a legacy run
+    python model_pack.py info <aggregation_run_dir>
+"""
+
+import os
+import sys
+import json
+import struct
+import argparse
+
+import numpy as np
+
+MODEL_PACK_NAME = "models.swpk"
+MAGIC           = b"SWRGPK01"
+ALIGN           = 64
+MMAP_MIN_BYTES  = 1 << 16   # arrays at least this large are memory-mapped
+
+# Per-raga fields, in file order. Dyad fields are (R, N_BINS**2).
+PACK_FIELDS = (
+    "mean_pcd", "std_pcd",
+    "mean_up", "mean_down", "std_up", "std_down",
+    "clip_count", "mean_gating_ratio", "mean_transitions",
+)
+
+
+def _pad(n):
+    return (-n) % ALIGN
+
+
+# =========================
+# WRITE
+# =========================
+def write_model_pack(path, raga_stats, metadata):
+    """
+    raga_stats: raga -> {field: array | scalar} for every field in PACK_FIELDS.
+    Ragas are stored in sorted order. Written to a temp name and renamed.
+    """
+    ragas  = sorted(raga_stats)
+    arrays = {
+        field: np.ascontiguousarray(np.stack([np.asarray(raga_stats[r][field]) for r in ragas]))
+        for field in PACK_FIELDS
+    }
+
+    # Offsets are relative to the start of the data section.
+    layout, offset = {}, 0
+    for field, arr in arrays.items():
+        layout[field] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += arr.nbytes + _pad(arr.nbytes)
+
+    header = json.dumps({
+        "format": 1,
+        "ragas": ragas,
+        "metadata": metadata,
+        "arrays": layout,
+    }).encode("utf-8")
+    header += b" " * _pad(len(MAGIC) + 8 + len(header))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for arr in arrays.values():
+            f.write(arr.tobytes())
+            f.write(b"\0" * _pad(arr.nbytes))
+    os.replace(tmp, path)
+
+    return path
+
+
+# =========================
+# READ
+# =========================
+def read_model_pack(path):
+    """
+    -> {"ragas": [...], "metadata": {...}, "arrays": {field: ndarray}}.
+    Large arrays are read-only np.memmap views; small ones are read into memory.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a Swarag model pack: {path}")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+        data_start = len(MAGIC) + 8 + header_len
+        arrays = {}
+
+        for field, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape))
+
+            if count * dtype.itemsize >= MMAP_MIN_BYTES:
+                arrays[field] = np.memmap(path, dtype=dtype, mode="r",
+                                          offset=data_start + spec["offset"], shape=shape)
+            else:
+                f.seek(data_start + spec["offset"])
+                arrays[field] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+
+    return {"ragas": header["ragas"], "metadata": header["metadata"], "arrays": arrays}
+
+
+def models_from_pack(pack):
+    """Same {raga: {"pcd", "mean_up", "mean_down"}} dict as load_aggregated_models()."""
+    a = pack["arrays"]
+    return {
+        raga: {
+            "pcd":       a["mean_pcd"][i],
+            "mean_up":   a["mean_up"][i],
+            "mean_down": a["mean_down"][i],
+        }
+        for i, raga in enumerate(pack["ragas"])
+    }
+
+
+# =========================
+# LEGACY RUNS
+# =========================
+def pack_legacy_run(run_dir):
+    """Build models.swpk for an existing run from its pcd_stats/ + dyad_stats/."""
+    pcd_folder  = os.path.join(run_dir, "pcd_stats")
+    dyad_folder = os.path.join(run_dir, "dyad_stats")
+
+    raga_stats = {}
+    for fname in sorted(os.listdir(pcd_folder)):
+        if not fname.endswith("_pcd_stats.npz"):
+            continue
+
+        raga = fname.replace("_pcd_stats.npz", "")
+        dyad_path = os.path.join(dyad_folder, f"{raga}_dyad_stats.npz")
+        if not os.path.exists(dyad_path):
+            continue
+
+        pcd_data  = np.load(os.path.join(pcd_folder, fname), allow_pickle=True)
+        dyad_data = np.load(dyad_path, allow_pickle=True)
+
+        raga_stats[raga] = {
+            "mean_pcd":          pcd_data["mean_pcd"],
+            "std_pcd":           pcd_data["std_pcd"],
+            "mean_up":           dyad_data["mean_up"],
+            "mean_down":         dyad_data["mean_down"],
+            "std_up":            dyad_data["std_up"],
+            "std_down":          dyad_data["std_down"],
+            "clip_count":        int(pcd_data["clip_count"]),
+            "mean_gating_ratio": float(pcd_data["mean_gating_ratio"]),
+            "mean_transitions":  float(dyad_data["mean_transitions"]),
+        }
+
+    metadata = {}
+    meta_path = os.path.join(run_dir, "aggregation_metadata.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+    return write_model_pack(os.path.join(run_dir, MODEL_PACK_NAME), raga_stats, metadata)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Packed model artifact for an aggregation run.")
+    ap.add_argument("cmd", choices=["pack", "info"])
+    ap.add_argument("run_dir")
+    args = ap.parse_args()
+
+    if args.cmd == "pack":
+        print("Wrote:", pack_legacy_run(args.run_dir))
+
+    pack = read_model_pack(os.path.join(args.run_dir, MODEL_PACK_NAME))
+    print(f"Ragas ({len(pack['ragas'])}): {', '.join(pack['ragas'])}")
+    for field, arr in pack["arrays"].items():
+        kind = "mmap" if isinstance(arr, np.memmap) else "mem"
+        print(f"  {field:18s} {str(arr.dtype):8s} {str(arr.shape):14s} {kind}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
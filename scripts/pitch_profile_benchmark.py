@@ -0,0 +1,274 @@
+"""
+Benchmark a pYIN extraction profile against the default one.
+
+Profiles are defined in feature_constants.PYIN_PROFILES, each stamped with
+its own feature version so its features never mix with v1.2 ones:
+
+  - fast  : vocal-range fmin/fmax, 1/6-semitone pitch states (one 72-bin PCD
+            bin), 50 thresholds;
+  - lowsr : 11025 Hz decode, hop 512 samples (46 ms frames, half the frame count).
+
+Two measurements:
+
+  1. Latency + f0 agreement on --timing-clips clips: decode (at the profile's
+     SR, incl. resampling; audio_cache window read, never the decoded-audio
+     cache) and pYIN timed separately per profile, plus voicing agreement,
+     median pitch difference and tonic shift on the frames both tracks share.
+  2. Canonical LOO (loo_engine.py) on the cached corpus, once per profile,
+     over the clips that pass the guardrails under BOTH profiles. Features
+     come from each profile's feature folder; clips missing from a cache are
+     extracted serially -- run `extract_pitch_parallel.py --profile <name>`
+     first for the full corpus, and `feature_cache.py migrate` if
+     features_v12/ still has legacy names.
+
+    python pitch_profile_benchmark.py [--profile fast|lowsr] [--timing-clips 5] [--no-extract]
+"""
+
+import os
+import csv
+import time
+import argparse
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import librosa
+
+from extract_pitch_batch_v12 import (
+    MAX_DURATION_SEC, DATASET_DIR, PROFILE_FEATURE_DIRS,
+    pyin_kwargs, profile_cache_params, gated_features, process_file,
+)
+from extract_pitch_parallel import collect_jobs
+from aggregate_all_v12 import clip_features
+from feature_cache import file_sha256, lookup
+from audio_cache import load_audio
+from feature_constants import PYIN_PROFILES, profile_frames, ms_to_frames
+from loo_engine import loo_decisions
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR      = r"D:\Swaragam"
+BENCH_DIR     = os.path.join(BASE_DIR, "pcd_results", "pitch_profiles")
+BASELINE      = "default"
+TIMING_CLIPS  = 5
+MIN_GATED_MS  = 1000 * 200 * 512 / 22050   # canonical LOO's 200-frame minimum, as a duration
+MIN_CLIPS     = 5
+
+
+def _frame_sec(profile):
+    prof = PYIN_PROFILES[profile]
+    return prof["hop_length"] / prof["sr"]
+
+
+# =========================
+# LATENCY + F0 AGREEMENT
+# =========================
+def _extract_timed(audio_path, profile):
+    """-> (f0, voiced_flag, decode_s, pyin_s, audio_sec) for one profile."""
+    kw = pyin_kwargs(profile)
+
+    t0 = time.time()
+    y, _ = load_audio(audio_path, sr=kw["sr"], duration=MAX_DURATION_SEC, cache_dir=None)
+    decode_s = time.time() - t0
+
+    t0 = time.time()
+    f0, voiced_flag, _ = librosa.pyin(y, **kw)
+    pyin_s = time.time() - t0
+
+    return f0, voiced_flag, decode_s, pyin_s, len(y) / kw["sr"]
+
+
+def time_profiles(jobs, profiles, n_clips=TIMING_CLIPS):
+    """Decode + pYIN seconds per profile, and how far the candidate f0 moves."""
+    base, cand = profiles
+
+    # Compile numba paths once per profile so the first clip carries no JIT time
+    for profile in profiles:
+        kw = pyin_kwargs(profile)
+        warm = 0.3 * np.sin(2 * np.pi * 220.0 * np.arange(kw["sr"]) / kw["sr"])
+        librosa.pyin(warm, **kw)
+
+    rows = []
+    for audio_path, raga in jobs[:n_clips]:
+        out = {profile: _extract_timed(audio_path, profile) for profile in profiles}
+        f0_b, vf_b = out[base][:2]
+        f0_c, vf_c = out[cand][:2]
+
+        # Candidate frames -> nearest baseline frame by time (identity for equal hop duration)
+        idx = np.rint(np.arange(len(f0_c)) * _frame_sec(cand) / _frame_sec(base)).astype(int)
+        keep = idx < len(f0_b)
+        f0_b, vf_b = f0_b[idx[keep]], vf_b[idx[keep]]
+        f0_c, vf_c = f0_c[keep], vf_c[keep]
+
+        both = vf_b & vf_c & ~np.isnan(f0_b) & ~np.isnan(f0_c)
+        cents = np.abs(1200 * np.log2(f0_c[both] / f0_b[both]))
+
+        gated_b = gated_features(out[base][0], out[base][1], profile_frames(base)["window_size"])
+        gated_c = gated_features(out[cand][0], out[cand][1], profile_frames(cand)["window_size"])
+        tonic_shift = (abs(1200 * np.log2(gated_c[0] / gated_b[0]))
+                       if gated_b is not None and gated_c is not None else float("nan"))
+
+        total_b = out[base][2] + out[base][3]
+        total_c = out[cand][2] + out[cand][3]
+        rows.append({
+            "file": os.path.basename(audio_path),
+            "raga": raga,
+            "audio_sec": round(out[base][4], 1),
+            f"{base}_decode_s": round(out[base][2], 2),
+            f"{base}_pyin_s": round(out[base][3], 2),
+            f"{cand}_decode_s": round(out[cand][2], 2),
+            f"{cand}_pyin_s": round(out[cand][3], 2),
+            "speedup": round(total_b / max(total_c, 1e-9), 2),
+            "voicing_agree": round(float(np.mean(vf_b == vf_c)), 4),
+            "median_cents_diff": round(float(np.median(cents)), 2) if len(cents) else 0.0,
+            "tonic_shift_cents": round(float(tonic_shift), 2),
+        })
+
+        r = rows[-1]
+        print(f"  {r['file'][:40]:<40} {total_b:6.1f}s -> {total_c:5.1f}s "
+              f"({r['speedup']:.1f}x) voicing={r['voicing_agree']:.3f} "
+              f"dcents={r['median_cents_diff']:.1f} tonic_shift={r['tonic_shift_cents']:.1f}c")
+
+    return rows
+
+
+# =========================
+# LOO PER PROFILE
+# =========================
+def cached_features(jobs, profiles, extract=True):
+    """audio_path -> {profile: feature .npz path} for clips cached under every profile."""
+    paths = {}
+
+    for n, (audio_path, raga) in enumerate(jobs, start=1):
+        sha = file_sha256(audio_path)
+        found = {}
+
+        for profile in profiles:
+            feature_dir = PROFILE_FEATURE_DIRS[profile]
+            params = profile_cache_params(profile)
+            path = lookup(feature_dir, audio_path, params, sha)
+
+            if path is None and extract:
+                print(f"  [{n}/{len(jobs)}] extracting {profile}: {os.path.basename(audio_path)}")
+                process_file(audio_path, raga, profile)
+                path = lookup(feature_dir, audio_path, params, sha)
+
+            if path is not None:
+                found[profile] = path
+
+        if len(found) == len(profiles):
+            paths[audio_path] = found
+
+    return paths
+
+
+def loo_per_profile(paths, profiles):
+    """Canonical LOO per profile on the clips valid under every profile."""
+    processed = {profile: [] for profile in profiles}
+
+    for audio_path, found in sorted(paths.items()):
+        clips = {}
+        for profile in profiles:
+            prof = PYIN_PROFILES[profile]
+            data = np.load(found[profile], allow_pickle=True)
+            feats = clip_features(data, prof["feature_version"])
+            min_frames = ms_to_frames(MIN_GATED_MS, prof["sr"], prof["hop_length"])
+            if feats is None or len(data["cents_gated"]) < min_frames:
+                break
+            raga, pcd, up, down, _, _ = feats
+            clips[profile] = {"fname": os.path.basename(audio_path), "raga": raga,
+                              "pcd": pcd, "up": up.flatten(), "down": down.flatten()}
+        else:
+            for profile in profiles:
+                processed[profile].append(clips[profile])
+
+    counts = Counter(c["raga"] for c in processed[profiles[0]])
+    results = {}
+    for profile in profiles:
+        kept = [c for c in processed[profile] if counts[c["raga"]] >= MIN_CLIPS]
+        results[profile] = loo_decisions(kept) if kept else []
+
+    return results
+
+
+def loo_row(profile, folds):
+    c = sum(f["pred"] == f["raga"] for f in folds)
+    u = sum(f["tier"] == "UNK" for f in folds)
+    w = len(folds) - c - u
+    return {"profile": profile,
+            "feature_version": PYIN_PROFILES[profile]["feature_version"],
+            "clips": len(folds), "correct": c, "wrong": w, "unknown": u,
+            "acc_decided": round(c / (c + w), 4) if c + w else 0.0}
+
+
+# =========================
+# MAIN
+# =========================
+def run_benchmark(profile="fast", timing_clips=TIMING_CLIPS, extract=True):
+
+    profiles = (BASELINE, profile)
+    jobs = collect_jobs(DATASET_DIR)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_dir = os.path.join(BENCH_DIR, f"benchmark_{profile}_{timestamp}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    print(f"Clips: {len(jobs)} | {BASELINE} vs {profile}\n")
+
+    print("Latency (decode + pYIN):")
+    timing = time_profiles(jobs, profiles, timing_clips)
+
+    print("\nLOO on cached corpus:")
+    folds = loo_per_profile(cached_features(jobs, profiles, extract), profiles)
+    loo_rows = [loo_row(p, folds[p]) for p in profiles]
+
+    same_pred = sum(a["pred"] == b["pred"] for a, b in zip(folds[BASELINE], folds[profile]))
+
+    for name, rows in (("timing.csv", timing), ("loo.csv", loo_rows)):
+        if rows:
+            with open(os.path.join(out_dir, name), "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+
+    lines = [f"Pitch profile benchmark -- {BASELINE} vs {profile} -- {timestamp}", ""]
+    if timing:
+        lines.append(f"Timing clips       : {len(timing)}")
+        for p in profiles:
+            dec = sum(r[f"{p}_decode_s"] for r in timing)
+            pyin = sum(r[f"{p}_pyin_s"] for r in timing)
+            lines.append(f"{p:<8} decode/pYIN: {dec:.1f}s / {pyin:.1f}s  (total {dec + pyin:.1f}s)")
+        total = {p: sum(r[f"{p}_decode_s"] + r[f"{p}_pyin_s"] for r in timing) for p in profiles}
+        lines += [
+            f"Speed-up           : {total[BASELINE] / max(total[profile], 1e-9):.2f}x",
+            f"Voicing agreement  : {np.mean([r['voicing_agree'] for r in timing]):.4f}",
+            f"Median |dcents|    : {np.mean([r['median_cents_diff'] for r in timing]):.2f}",
+            "",
+        ]
+    for r in loo_rows:
+        lines.append(f"LOO {r['profile']:<8} ({r['feature_version']}): {r['clips']} clips | "
+                     f"C={r['correct']} W={r['wrong']} U={r['unknown']} | acc_decided={r['acc_decided']:.4f}")
+    lines.append(f"Same LOO prediction: {same_pred} / {len(folds[BASELINE])}")
+
+    with open(os.path.join(out_dir, "summary.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+    print("\n" + "\n".join(lines))
+    print(f"\nSaved: {out_dir}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="pYIN extraction profile vs default: latency and LOO accuracy.")
+    ap.add_argument("--profile", default="fast",
+                    choices=sorted(p for p in PYIN_PROFILES if p != BASELINE))
+    ap.add_argument("--timing-clips", type=int, default=TIMING_CLIPS,
+                    help="clips to run both profiles on for timing")
+    ap.add_argument("--no-extract", action="store_true",
+                    help="LOO on already-cached clips only (no serial extraction)")
+    args = ap.parse_args()
+
+    run_benchmark(args.profile, args.timing_clips, extract=not args.no_extract)
+
+
+if __name__ == "__main__":
+    main()
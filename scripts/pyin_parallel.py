@@ -0,0 +1,275 @@
+"""
+Chunk-parallel pYIN for one long recording.
+
+librosa.pyin on a 6-minute clip runs on one core. Here the clip is split on
+the pYIN frame grid into CHUNK_SEC chunks, each extended by OVERLAP_SEC of
+context on both sides, and every chunk is pitch-tracked in a process pool.
+
+  - Frame observations are bit-identical to a single pass: the signal is
+    padded once exactly as pyin(center=True) pads it, and each chunk is run
+    with center=False on its slice, so chunk frame j covers the same samples
+    as global frame e0 + j.
+  - Only the Viterbi path is local to a chunk. Neighbouring chunks are
+    stitched inside their overlap at the frame nearest the nominal boundary
+    where both paths agree (same f0, same voicing) -- the seam joins two
+    paths that pass through the same state, so stable runs are not cut by
+    a jump. If no frame agrees, the nominal boundary is used and the seam
+    is reported.
+
+Validation mode runs both paths on real clips and reports frame-level
+agreement with the single-pass f0 (voicing, pitch within 1 / 50 cents,
+seams, tonic) before recognize_raga / extract_pitch_batch_v12.py switch over.
+
+    python pyin_parallel.py validate <audio or folder> [...] [--workers 4] [--limit 10]
+"""
+
+import os
+import csv
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import librosa
+
+from utils import estimate_tonic
+from audio_cache import load_audio
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR        = r"D:\Swaragam"
+VALIDATION_DIR  = os.path.join(BASE_DIR, "pcd_results", "pyin_validation")
+
+SR               = 22050
+MAX_DURATION_SEC = 360
+FMIN             = librosa.note_to_hz("C1")
+FMAX             = librosa.note_to_hz("C6")
+
+FRAME_LENGTH    = 2048                 # librosa.pyin defaults
+HOP_LENGTH      = FRAME_LENGTH // 4
+CHUNK_SEC       = 30
+OVERLAP_SEC     = 3                    # context on each side of a chunk
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+SUPPORTED_EXTS  = (".wav", ".mp3", ".flac")
+
+
+# =========================
+# CHUNKING
+# =========================
+def chunk_plan(n_frames, chunk_frames, overlap_frames):
+    """[(e0, c0, c1, e1), ...]: core frames [c0, c1), tracked frames [e0, e1)."""
+    plan = []
+    for c0 in range(0, n_frames, chunk_frames):
+        c1 = min(c0 + chunk_frames, n_frames)
+        plan.append((max(0, c0 - overlap_frames), c0, c1, min(n_frames, c1 + overlap_frames)))
+    return plan
+
+
+def _pyin_segment(segment, fmin, fmax, sr):
+    """Worker: pYIN over pre-padded audio, one frame per HOP_LENGTH, no re-centering."""
+    return librosa.pyin(segment, fmin=fmin, fmax=fmax, sr=sr,
+                        frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH, center=False)
+
+
+def _same_state(f0_a, vf_a, f0_b, vf_b):
+    """Frame-wise: both paths give the same voicing and the same f0 (NaN == NaN)."""
+    same_f0 = (f0_a == f0_b) | (np.isnan(f0_a) & np.isnan(f0_b))
+    return same_f0 & (vf_a == vf_b)
+
+
+def _stitch_frame(left, right, plan_left, plan_right):
+    """Seam frame between two neighbouring chunks -> (frame, agreed)."""
+    (e0_l, _, c1_l, e1_l), (e0_r, _, _, _) = plan_left, plan_right
+
+    lo, hi = e0_r, e1_l                              # frames tracked by both
+    same = _same_state(left[0][lo - e0_l:hi - e0_l], left[1][lo - e0_l:hi - e0_l],
+                       right[0][:hi - lo], right[1][:hi - lo])
+
+    agreed = np.flatnonzero(same) + lo
+    if len(agreed) == 0:
+        return c1_l, False
+
+    return int(agreed[np.argmin(np.abs(agreed - c1_l))]), True
+
+
+# =========================
+# CHUNKED PYIN
+# =========================
+def pyin_chunked(y, fmin=FMIN, fmax=FMAX, sr=SR, chunk_sec=CHUNK_SEC,
+                 overlap_sec=OVERLAP_SEC, workers=DEFAULT_WORKERS,
+                 executor=None, return_seams=False):
+    """
+    Drop-in for librosa.pyin(y, fmin=fmin, fmax=fmax, sr=sr):
+    -> (f0, voiced_flag, voiced_prob), same frame count and grid.
+
+    executor: an existing ProcessPoolExecutor to reuse (pool start-up and
+    numba JIT in fresh workers are paid once per pool, not per clip).
+    return_seams: also return [{"frame", "agreed"}, ...] per stitch.
+    """
+    n_frames       = 1 + len(y) // HOP_LENGTH
+    chunk_frames   = int(round(chunk_sec * sr / HOP_LENGTH))
+    overlap_frames = int(round(overlap_sec * sr / HOP_LENGTH))
+
+    if 2 * overlap_frames >= chunk_frames:
+        raise ValueError("overlap_sec must be less than half of chunk_sec")
+
+    plan = chunk_plan(n_frames, chunk_frames, overlap_frames)
+
+    if len(plan) == 1:
+        out = librosa.pyin(y, fmin=fmin, fmax=fmax, sr=sr,
+                           frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH)
+        return (*out, []) if return_seams else out
+
+    # Same padding pyin(center=True) applies, once for the whole clip
+    padded = np.pad(y, (FRAME_LENGTH // 2, FRAME_LENGTH // 2), mode="constant")
+    segments = [padded[e0 * HOP_LENGTH:(e1 - 1) * HOP_LENGTH + FRAME_LENGTH]
+                for e0, _, _, e1 in plan]
+
+    own_pool = executor is None
+    if own_pool:
+        executor = ProcessPoolExecutor(max_workers=max(1, workers))
+
+    try:
+        futures = [executor.submit(_pyin_segment, seg, fmin, fmax, sr) for seg in segments]
+        parts = [f.result() for f in futures]
+    finally:
+        if own_pool:
+            executor.shutdown()
+
+    # ---- Stitch: seam between chunk k and k+1 at an agreeing overlap frame ----
+    seams = [_stitch_frame(parts[k], parts[k + 1], plan[k], plan[k + 1])
+             for k in range(len(plan) - 1)]
+
+    bounds = [0] + [frame for frame, _ in seams] + [n_frames]
+    outputs = []
+    for i in range(3):          # f0, voiced_flag, voiced_prob
+        outputs.append(np.concatenate([
+            parts[k][i][bounds[k] - plan[k][0]:bounds[k + 1] - plan[k][0]]
+            for k in range(len(plan))
+        ]))
+
+    if return_seams:
+        return (*outputs, [{"frame": frame, "agreed": agreed} for frame, agreed in seams])
+    return tuple(outputs)
+
+
+# =========================
+# VALIDATION
+# =========================
+def agreement(f0_ref, vf_ref, f0_new, vf_new):
+    """Frame-level agreement of a chunked f0 track with the single-pass one."""
+    both = vf_ref & vf_new & ~np.isnan(f0_ref) & ~np.isnan(f0_new)
+    cents = np.abs(1200 * np.log2(f0_new[both] / f0_ref[both]))
+
+    return {
+        "frames": len(f0_ref),
+        "voicing_agree": round(float(np.mean(vf_ref == vf_new)), 6),
+        "identical": round(float(np.mean(_same_state(f0_ref, vf_ref, f0_new, vf_new))), 6),
+        "pitch_within_1c": round(float(np.mean(cents < 1)), 6) if len(cents) else 1.0,
+        "pitch_within_50c": round(float(np.mean(cents < 50)), 6) if len(cents) else 1.0,
+        "max_cents_diff": round(float(cents.max()), 2) if len(cents) else 0.0,
+    }
+
+
+def _audio_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for fname in sorted(files):
+                    if fname.lower().endswith(SUPPORTED_EXTS):
+                        yield os.path.join(root, fname)
+        else:
+            yield path
+
+
+def validate(paths, workers=DEFAULT_WORKERS, chunk_sec=CHUNK_SEC,
+             overlap_sec=OVERLAP_SEC, limit=None):
+
+    files = list(_audio_files(paths))[:limit]
+    os.makedirs(VALIDATION_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_path  = os.path.join(VALIDATION_DIR, f"pyin_validation_{timestamp}.csv")
+
+    print(f"Clips: {len(files)} | chunk {chunk_sec}s + {overlap_sec}s overlap | workers: {workers}\n")
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+
+        # One throwaway clip-sized job per worker so the timings below exclude JIT start-up
+        warm = np.zeros(SR * 2)
+        list(pool.map(_pyin_segment, [warm] * max(1, workers), [FMIN] * max(1, workers),
+                      [FMAX] * max(1, workers), [SR] * max(1, workers)))
+
+        for audio_path in files:
+            y, _ = load_audio(audio_path, sr=SR, duration=MAX_DURATION_SEC)
+
+            t0 = time.time()
+            f0_ref, vf_ref, _ = librosa.pyin(y, fmin=FMIN, fmax=FMAX, sr=SR)
+            single_s = time.time() - t0
+
+            t0 = time.time()
+            f0_new, vf_new, _, seams = pyin_chunked(y, chunk_sec=chunk_sec, overlap_sec=overlap_sec,
+                                                    executor=pool, return_seams=True)
+            chunked_s = time.time() - t0
+
+            row = {"file": os.path.basename(audio_path),
+                   **agreement(f0_ref, vf_ref, f0_new, vf_new),
+                   "seams": len(seams),
+                   "seams_unagreed": sum(not s["agreed"] for s in seams),
+                   "single_s": round(single_s, 2), "chunked_s": round(chunked_s, 2)}
+
+            valid_ref, valid_new = f0_ref[~np.isnan(f0_ref)], f0_new[~np.isnan(f0_new)]
+            if len(valid_ref) >= 200 and len(valid_new) >= 200:
+                row["tonic_same"] = bool(estimate_tonic(valid_ref) == estimate_tonic(valid_new))
+            else:
+                row["tonic_same"] = ""
+
+            rows.append(row)
+            print(f"  {row['file'][:40]:<40} identical={row['identical']:.4f} "
+                  f"voicing={row['voicing_agree']:.4f} <1c={row['pitch_within_1c']:.4f} "
+                  f"seams={row['seams']} (unagreed {row['seams_unagreed']}) tonic_same={row['tonic_same']} "
+                  f"| {single_s:.1f}s -> {chunked_s:.1f}s")
+
+    if not rows:
+        print("No audio files found.")
+        return rows
+
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    frames = sum(r["frames"] for r in rows)
+    identical = sum(r["identical"] * r["frames"] for r in rows) / frames
+    speedup = sum(r["single_s"] for r in rows) / max(sum(r["chunked_s"] for r in rows), 1e-9)
+
+    print(f"\nFrames identical : {identical:.4%} of {frames}")
+    print(f"Unagreed seams   : {sum(r['seams_unagreed'] for r in rows)} / {sum(r['seams'] for r in rows)}")
+    print(f"Tonic unchanged  : {sum(r['tonic_same'] is True for r in rows)} / {len(rows)}")
+    print(f"Speed-up         : {speedup:.2f}x")
+    print(f"Saved: {csv_path}")
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Chunk-parallel pYIN and its validation against single-pass pYIN.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_val = sub.add_parser("validate", help="compare chunked vs single-pass f0 on real clips")
+    p_val.add_argument("paths", nargs="+", help="audio files or folders")
+    p_val.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    p_val.add_argument("--chunk-sec", type=float, default=CHUNK_SEC)
+    p_val.add_argument("--overlap-sec", type=float, default=OVERLAP_SEC)
+    p_val.add_argument("--limit", type=int, default=None)
+
+    args = ap.parse_args()
+    validate(args.paths, args.workers, args.chunk_sec, args.overlap_sec, args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Long-lived local recognition service.
+
+Starts once -- imports librosa/numba, loads + compiles the model bundle and
+warms pYIN's numba JIT on a short synthetic tone -- then serves
+recognize_raga() over localhost HTTP, so ingestion jobs stop paying the
+multi-second startup per clip. Re-submitted recordings are answered from
+result_cache.py (in-process LRU + on-disk store, keyed by audio hash and
+model bundle hash) without decode or pYIN. The decoded-audio cache
+(audio_cache.py, ~30 MB per clip) is off here unless --decode-cache:
+repeats are already answered by the result cache.
+
+    POST /recognize  {"audio_path": "..."}  -> frozen JSON schema
+                                               {final, ranking, margin, confidence_tier, ...}
+    GET  /stats                             -> request count + latency p50/p95/max + result-cache hits
+    GET  /health                            -> {"status": "ok", ...}
+
+    python recognition_server.py serve [--port 8765] [--agg-folder ...] [--no-feature-cache] [--no-result-cache] [--decode-cache]
+    python recognition_server.py submit <audio_path> [--port 8765]
+
+Binds 127.0.0.1 only. The service reads audio paths from the local disk.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+import librosa
+
+import recognize_raga_v12 as rr
+from recognize_raga_v12 import (
+    SR, FMIN, FMAX, recognize_raga, load_compiled_models,
+)
+from result_cache import ResultCache, RESULT_DIR
+from audio_cache import DECODE_DIR
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR        = r"D:\Swaragam"
+AGG_FOLDER      = r"D:\Swaragam\pcd_results\aggregation\v1.2\run_20260331_232228"  # v1.3.1: 7 ragas, 70 clips
+FEATURE_DIR     = os.path.join(BASE_DIR, "pcd_results", "features_v12")
+HOST            = "127.0.0.1"
+DEFAULT_PORT    = 8765
+LATENCY_WINDOW  = 1000   # stats cover the most recent N requests
+WARMUP_SECONDS  = 1.0
+
+
+# =========================
+# WARM STATE
+# =========================
+def warm_up():
+    """Compile pYIN's numba paths once, on a short A3 tone, before serving."""
+    t = np.arange(int(SR * WARMUP_SECONDS)) / SR
+    y = 0.3 * np.sin(2 * np.pi * 220.0 * t)
+
+    t0 = time.time()
+    librosa.pyin(y, fmin=FMIN, fmax=FMAX, sr=SR)
+    return time.time() - t0
+
+
+class LatencyStats:
+    """Thread-safe rolling window of request latencies (seconds)."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock      = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.requests   = 0
+        self.unranked   = 0   # empty ranking: unreadable / unvoiced clip
+        self.started    = time.time()
+
+    def record(self, seconds, ranked=True):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.requests += 1
+            if not ranked:
+                self.unranked += 1
+
+    def summary(self):
+        with self._lock:
+            lat = np.array(self._latencies)
+            requests, unranked = self.requests, self.unranked
+
+        out = {
+            "requests": requests,
+            "unranked": unranked,
+            "uptime_s": round(time.time() - self.started, 1),
+            "window": len(lat),
+        }
+        if len(lat):
+            out.update({
+                "p50_ms": round(float(np.percentile(lat, 50)) * 1000, 1),
+                "p95_ms": round(float(np.percentile(lat, 95)) * 1000, 1),
+                "max_ms": round(float(lat.max()) * 1000, 1),
+                "mean_ms": round(float(lat.mean()) * 1000, 1),
+            })
+        return out
+
+
+# =========================
+# HTTP HANDLER
+# =========================
+class RecognitionHandler(BaseHTTPRequestHandler):
+    # Set by serve(): shared, read-only after startup
+    bundle      = None
+    agg_folder  = None
+    feature_dir = None
+    results     = None   # ResultCache, or None to always recognise
+    stats       = None
+    info        = {}
+
+    def _send_json(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            summary = self.stats.summary()
+            if self.results is not None:
+                summary["result_cache"] = self.results.summary()
+            self._send_json(200, summary)
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok", **self.info})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/recognize":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+
+        try:
+            length  = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._send_json(400, {"error": f"expected JSON body with audio_path ({e})"})
+            return
+
+        audio_path = request.get("audio_path") if isinstance(request, dict) else None
+        if not isinstance(audio_path, str) or not audio_path:
+            self._send_json(400, {"error": "expected JSON object with a string audio_path"})
+            return
+
+        t0 = time.time()
+        if self.results is not None:
+            result = self.results.recognize(audio_path, self.agg_folder, self.feature_dir)
+        else:
+            result = recognize_raga(audio_path, self.agg_folder,
+                                    models=self.bundle, feature_dir=self.feature_dir)
+        elapsed = time.time() - t0
+
+        # recognize_raga never raises; an empty ranking is a failed/unvoiced clip
+        self.stats.record(elapsed, ranked=bool(result["ranking"]))
+        self._send_json(200, result)
+
+    def log_message(self, fmt, *args):
+        sys.stderr.write(f"[recognition_server] {self.address_string()} {fmt % args}\n")
+
+
+def serve(port=DEFAULT_PORT, agg_folder=AGG_FOLDER, feature_dir=FEATURE_DIR, result_dir=RESULT_DIR,
+          result_cache=True, decode_cache=False):
+
+    rr.DECODE_CACHE_DIR = DECODE_DIR if decode_cache else None   # before any request thread
+
+    t0 = time.time()
+    bundle = load_compiled_models(agg_folder)
+    if bundle is None:
+        print(f"No models found in: {agg_folder}")
+        return 1
+    load_s = time.time() - t0
+
+    jit_s = warm_up()
+
+    RecognitionHandler.bundle      = bundle
+    RecognitionHandler.agg_folder  = agg_folder
+    RecognitionHandler.feature_dir = feature_dir
+    RecognitionHandler.results     = ResultCache(bundle, result_dir) if result_cache else None
+    RecognitionHandler.stats       = LatencyStats()
+    RecognitionHandler.info        = {
+        "agg_folder": agg_folder,
+        "ragas": list(bundle["raga_order"]),
+        "feature_cache": feature_dir,
+        "result_cache": result_dir if result_cache else None,
+        "decode_cache": rr.DECODE_CACHE_DIR,
+    }
+
+    server = ThreadingHTTPServer((HOST, port), RecognitionHandler)
+
+    print(f"Models     : {len(bundle['raga_order'])} ragas from {agg_folder} ({load_s:.2f}s)")
+    print(f"JIT warmup : {jit_s:.1f}s")
+    print(f"Serving on : http://{HOST}:{port}  (POST /recognize, GET /stats, GET /health)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(RecognitionHandler.stats.summary(), indent=2))
+
+    return 0
+
+
+# =========================
+# CLIENT
+# =========================
+def submit(audio_path, port=DEFAULT_PORT, timeout=None):
+    """POST one clip to a running server and return its result dict."""
+    req = urllib.request.Request(
+        f"http://{HOST}:{port}/recognize",
+        data=json.dumps({"audio_path": os.path.abspath(audio_path)}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local warm recognition service.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_serve = sub.add_parser("serve", help="start the service")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_serve.add_argument("--agg-folder", default=AGG_FOLDER)
+    p_serve.add_argument("--no-feature-cache", action="store_true",
+                         help="always run live pYIN instead of serving cached f0")
+    p_serve.add_argument("--no-result-cache", action="store_true",
+                         help="recognise every request, even for already-seen audio")
+    p_serve.add_argument("--decode-cache", action="store_true",
+                         help="keep decoded audio on disk (audio_cache.py, size-bounded)")
+
+    p_sub = sub.add_parser("submit", help="recognize one clip via a running service")
+    p_sub.add_argument("audio_path")
+    p_sub.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    args = ap.parse_args()
+
+    if args.cmd == "serve":
+        return serve(args.port, args.agg_folder,
+                     None if args.no_feature_cache else FEATURE_DIR,
+                     result_cache=not args.no_result_cache, decode_cache=args.decode_cache)
+
+    print(json.dumps(submit(args.audio_path, args.port), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
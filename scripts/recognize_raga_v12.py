@@ -1,9 +1,17 @@
 import os
 import traceback
+from types import MappingProxyType
 import numpy as np
 import librosa
 
 from utils import estimate_tonic   # C1: single canonical tonic source
+from utils import run_length_encode
+from utils import stable_regions, directional_dyad_counts   # shared dyad kernels
+from feature_cache import extraction_params, lookup, file_sha256
+from audio_cache import load_audio, DECODE_DIR   # windowed decode + decoded-audio cache
+from stage_diagnostics import NULL_RECORDER
+from feature_constants import PYIN_PROFILES, profile_frames
+from model_pack import MODEL_PACK_NAME, read_model_pack, models_from_pack
 
 # =========================
 # CONFIG
@@ -14,6 +22,16 @@ MAX_DURATION_SEC = 360   # 6-minute cap per file
 PCD_WEIGHT       = 0.8
 DYAD_WEIGHT      = 0.2
 GENERICNESS_WEIGHT = 0.0   # BUG-004 fix: confirmed inert, removed
+FMIN             = librosa.note_to_hz("C1")
+FMAX             = librosa.note_to_hz("C6")
+
+# Same key params as extract_pitch_batch_v12.py: a cache hit is the f0 that
+# pYIN would return here for these exact audio bytes (ADR-017).
+CACHE_PARAMS     = extraction_params(SR, FMIN, FMAX, MAX_DURATION_SEC)
+
+# Decoded-audio cache for live decodes (audio_cache.py, size-bounded);
+# None = decode every time. recognition_server sets None unless --decode-cache.
+DECODE_CACHE_DIR = DECODE_DIR
 
 # Per-raga weight overrides: empty — Bhairavi 0.5/0.5 override retired in v1.3.2.
 # LOO audit (2026-06-24) showed override caused 9 Bhairavi wrongs (0% decided)
@@ -24,7 +42,7 @@ PER_RAGA_WEIGHTS = {}
 N_BINS           = 72   # Phase 4: was 36 (finer microtonal resolution)
 
 # Shared constants — must match aggregate_all_v12.py exactly
-MIN_STABLE_FRAMES = 5
+MIN_STABLE_FRAMES = profile_frames("default")["min_stable_frames"]  # MIN_STABLE_MS at SR / hop 512 = 5
 ALPHA             = 0.01  # Phase 2 fix: was 0.5
 EPS               = 1e-8
 
@@ -40,12 +58,25 @@ MIN_MARGIN_FINAL  = 0.001  # BUG-006 fix: was 0.01
 PCD_WEIGHT_ESC  = 0.3
 DYAD_WEIGHT_ESC = 0.7
 
+# Progressive (early-exit) recognition -- recognize_raga_progressive()
+PROGRESSIVE_CHUNK_SEC     = 30   # audio decoded + pitch-tracked per step
+PROGRESSIVE_STABLE_CHUNKS = 2    # consecutive chunks with same Top-1 and margin >= MARGIN_STRICT
+PYIN_HOP_LENGTH           = PYIN_PROFILES["default"]["hop_length"]  # 512, librosa.pyin default
+
 
 # =========================
 # MODEL LOADING
 # =========================
 
 def load_aggregated_models(aggregation_folder):
+    """
+    {raga: {"pcd", "mean_up", "mean_down"}}. Reads the run's packed
+    models.swpk when present (one file, no pickle, dyads memory-mapped);
+    runs aggregated before the pack existed fall back to the per-raga .npz.
+    """
+    pack_path = os.path.join(aggregation_folder, MODEL_PACK_NAME)
+    if os.path.exists(pack_path):
+        return models_from_pack(read_model_pack(pack_path))
 
     models = {}
 
@@ -79,6 +110,98 @@ def load_aggregated_models(aggregation_folder):
     return models
 
 
+# =========================
+# COMPILED MODEL BUNDLE
+# =========================
+
+def _frozen(a):
+    a = np.ascontiguousarray(a, dtype=np.float64)
+    a.flags.writeable = False
+    return a
+
+
+def compile_models(models):
+    """
+    Everything recognize_raga needs that depends only on the model set,
+    computed once per load instead of once per clip:
+
+        raga_order  : tuple of raga names (row order of every matrix)
+        pcd_weights : (N_BINS,)          IDF x variance weight vector
+        pcd_matrix  : (R, N_BINS)        weighted + renormalised model PCDs
+        up_matrix   : (R, N_BINS**2)     stacked mean_up
+        down_matrix : (R, N_BINS**2)     stacked mean_down
+
+    Returned as a read-only mapping over read-only arrays, so one bundle can
+    be shared by every request (and thread) safely.
+    """
+    raga_order  = tuple(models)
+    pcd_weights = compute_pcd_weights(models)
+
+    pcd_matrix = np.empty((len(raga_order), N_BINS))
+    for i, raga in enumerate(raga_order):
+        model_w = models[raga]["pcd"] * pcd_weights
+        pcd_matrix[i] = model_w / (np.sum(model_w) + EPS)
+
+    return MappingProxyType({
+        "raga_order":  raga_order,
+        "pcd_weights": _frozen(pcd_weights),
+        "pcd_matrix":  _frozen(pcd_matrix),
+        "up_matrix":   _frozen(np.stack([models[r]["mean_up"]   for r in raga_order])),
+        "down_matrix": _frozen(np.stack([models[r]["mean_down"] for r in raga_order])),
+    })
+
+
+def is_compiled(models):
+    return isinstance(models, MappingProxyType)
+
+
+def load_compiled_models(aggregation_folder):
+    """load_aggregated_models + compile_models; None if the folder has no models."""
+    models = load_aggregated_models(aggregation_folder)
+    return compile_models(models) if models else None
+
+
+# =========================
+# PITCH (CACHE-FIRST)
+# =========================
+
+def load_f0(audio_path, feature_dir=None, recorder=NULL_RECORDER):
+    """
+    Raw pYIN f0 for a clip -> (f0, source), source "cache" | "live".
+
+    With feature_dir, the content-addressed features_v12 entry for these
+    audio bytes + CACHE_PARAMS is served instead of re-running pYIN; any
+    miss (new clip, edited audio, other params) falls back to live extraction.
+    recorder: stage_diagnostics.StageRecorder for f0_cache / decode / pyin.
+    The file is hashed once, for both the feature and decoded-audio caches.
+    """
+    audio_sha = None
+
+    if feature_dir is not None:
+        with recorder.stage("f0_cache"):
+            audio_sha = file_sha256(audio_path)
+            cached = lookup(feature_dir, audio_path, CACHE_PARAMS, audio_sha=audio_sha)
+            f0 = np.load(cached, allow_pickle=True)["f0"] if cached is not None else None
+        if f0 is not None:
+            return f0, "cache"
+
+    with recorder.stage("decode"):
+        if DECODE_CACHE_DIR is not None and audio_sha is None:
+            audio_sha = file_sha256(audio_path)
+        y, sr = load_audio(audio_path, sr=SR, duration=MAX_DURATION_SEC, cache_dir=DECODE_CACHE_DIR,
+                           audio_sha=audio_sha, max_duration_sec=MAX_DURATION_SEC)
+
+    with recorder.stage("pyin"):
+        f0, voiced_flag, _ = librosa.pyin(
+            y,
+            fmin=FMIN,
+            fmax=FMAX,
+            sr=SR,
+        )
+
+    return f0, "live"
+
+
 # =========================
 # GENERICNESS PENALTY
 # =========================
@@ -112,33 +235,10 @@ def compute_directional_dyads(cents):
         return flat, flat
 
     # --- Stable-region detection (identical to aggregation) ---
-    stable_bins = []
-    current     = pitch_bins[0]
-    count       = 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
 
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count   = 1
-
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
-
-    mat_up   = np.zeros((N_BINS, N_BINS))
-    mat_down = np.zeros((N_BINS, N_BINS))
-
-    for i in range(len(stable_bins) - 1):
-        frm = stable_bins[i]
-        to  = stable_bins[i + 1]
-
-        if to > frm:
-            mat_up[frm, to]   += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
+    # --- Directional transition counts (identical to aggregation) ---
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, N_BINS)
 
     # --- Laplace smoothing + normalisation (identical to aggregation) ---
     mat_up   += ALPHA
@@ -218,18 +318,438 @@ def _score_models(pcd, test_up, test_down, models, pcd_w, dyad_w,
     return scores
 
 
+# =========================
+# MATRIX-FORM SCORING
+# =========================
+
+def fusion_weights(raga_order, pcd_w, dyad_w):
+    """(R,) PCD and dyad fusion weights, applying PER_RAGA_WEIGHTS overrides."""
+    pairs = [PER_RAGA_WEIGHTS.get(raga, (pcd_w, dyad_w)) for raga in raga_order]
+    return np.array([p for p, _ in pairs]), np.array([d for _, d in pairs])
+
+
+def score_matrix(pcd, test_up, test_down, bundle, pcd_w, dyad_w):
+    """
+    _score_models() with pcd_weights for every raga at once, against a
+    compile_models() bundle.
+
+    Single clip : pcd (N_BINS,),   test_up/test_down (N_BINS**2,)   -> (R,)
+    Batch       : pcd (B, N_BINS), test_up/test_down (B, N_BINS**2) -> (B, R)
+
+    Columns follow bundle["raga_order"]. One matrix product per feature
+    replaces the per-raga np.dot loop; PER_RAGA_WEIGHTS still applies.
+    """
+    r_pcd_w, r_dyad_w = fusion_weights(bundle["raga_order"], pcd_w, dyad_w)
+
+    pcd_w_arr = pcd * bundle["pcd_weights"]
+    pcd_w_arr = pcd_w_arr / (np.sum(pcd_w_arr, axis=-1, keepdims=True) + EPS)
+
+    pcd_sim  = pcd_w_arr @ bundle["pcd_matrix"].T
+    up_sim   = test_up   @ bundle["up_matrix"].T
+    down_sim = test_down @ bundle["down_matrix"].T
+
+    dyad_sim = 0.5 * (up_sim + down_sim)
+
+    return r_pcd_w * pcd_sim + r_dyad_w * dyad_sim
+
+
+# =========================
+# TIERED DECISION
+# =========================
+
+def tiered_result(bundle, pcd, test_up, test_down, f0_source):
+    """B1 tiering of one clip's features against a compiled bundle -> frozen schema dict."""
+
+    # ================================================================
+    # B1: TIERED CONFIDENCE LOGIC
+    # Step 1 -- IDF x Variance weighted scoring (Phase 3 BUG-008 fix)
+    # Weights + weighted model PCDs come precompiled in the bundle
+    # ================================================================
+    scores = dict(zip(bundle["raga_order"],
+                      score_matrix(pcd, test_up, test_down, bundle,
+                                   PCD_WEIGHT, DYAD_WEIGHT)))
+
+    ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+    margin = (ranked[0][1] - ranked[1][1]) if len(ranked) >= 2 else 0.0
+
+    # ================================================================
+    # Step 2 — HIGH CONFIDENCE path: margin exceeds strict threshold
+    # ================================================================
+    if margin >= MARGIN_STRICT:
+        return {
+            "final": ranked[0][0],
+            "ranking": ranked,
+            "margin": round(margin, 6),
+            "confidence_tier": "HIGH",
+            "f0_source": f0_source
+        }
+
+    # ================================================================
+    # ================================================================
+    # Step 3 -- BUG-007 fix: escalation DISABLED (crushed margins 5x)
+    # Use first-pass scores with MIN_MARGIN_FINAL threshold instead
+    # ================================================================
+    if margin >= MIN_MARGIN_FINAL:
+        return {
+            "final": ranked[0][0],
+            "ranking": ranked,
+            "margin": round(margin, 6),
+            "confidence_tier": "MODERATE",
+            "f0_source": f0_source
+        }
+
+    # ================================================================
+    # Step 4 -- Margin too small -> UNKNOWN
+    # ================================================================
+    return {
+        "final": "UNKNOWN / LOW CONFIDENCE",
+        "ranking": ranked,
+        "margin": round(margin, 6),
+        "confidence_tier": "UNKNOWN",
+        "f0_source": f0_source
+    }
+
+
 # =========================
 # CORE RECOGNITION ENGINE
 # =========================
+#
+# Layered entry points -- each skips the stages its caller already has and
+# returns the same frozen schema:
+#
+#   recognize_raga(audio_path)          decode + pYIN (or feature cache)
+#   recognize_from_array(y, sr)         pYIN
+#   recognize_from_f0(f0)               tonic + cents
+#   recognize_from_cents(cents)         PCD + dyads
+#   recognize_from_features(pcd, ...)   scoring + tiering only
+
+def _unknown(f0_source=None):
+    result = {
+        "final": "UNKNOWN / LOW CONFIDENCE",
+        "ranking": [],
+        "margin": 0.0,
+        "confidence_tier": "UNKNOWN"
+    }
+    if f0_source is not None:
+        result["f0_source"] = f0_source
+    return result
+
+
+def _bundle(aggregation_folder, models):
+    """Compiled bundle from models / aggregation_folder, or None if there are no models."""
+    if models is None:
+        models = load_aggregated_models(aggregation_folder)
+
+    if not models:
+        return None
+
+    return models if is_compiled(models) else compile_models(models)
+
+
+def _features_result(bundle, pcd, test_up, test_down, f0_source):
+    return tiered_result(bundle, np.asarray(pcd, dtype=float),
+                         np.ravel(test_up), np.ravel(test_down), f0_source)
+
+
+def _cents_result(bundle, cents, f0_source, recorder=NULL_RECORDER):
+    # ---- PCD ----
+    with recorder.stage("histogram"):
+        cents = np.asarray(cents, dtype=float) % 1200
+        hist, _ = np.histogram(cents, bins=N_BINS, range=(0, 1200))
+
+    if np.sum(hist) == 0:
+        return _unknown(f0_source)
+
+    pcd = hist / np.sum(hist)
+
+    # ---- Directional Dyads ----
+    with recorder.stage("dyads"):
+        test_up, test_down = compute_directional_dyads(cents)
+
+    with recorder.stage("scoring"):
+        return tiered_result(bundle, pcd, test_up, test_down, f0_source)
+
+
+def _f0_result(bundle, f0, f0_source, recorder=NULL_RECORDER):
+    f0 = np.asarray(f0, dtype=float)
+    valid = f0[~np.isnan(f0)]
+
+    if len(valid) < 200:
+        return _unknown(f0_source)
+
+    # ---- C1: canonical tonic from utils.py ----
+    with recorder.stage("tonic"):
+        sa_hz = estimate_tonic(valid)
+
+    return _cents_result(bundle, 1200 * np.log2(valid / sa_hz), f0_source, recorder)
+
+
+def _array_f0(y, sr):
+    """pYIN on an in-memory waveform, resampled to SR and capped like load_f0."""
+    y = np.asarray(y, dtype=np.float32)
+    if y.ndim > 1:
+        y = librosa.to_mono(y)
+    if sr != SR:
+        y = librosa.resample(y, orig_sr=sr, target_sr=SR)
+
+    f0, _, _ = librosa.pyin(y[:int(MAX_DURATION_SEC * SR)], fmin=FMIN, fmax=FMAX, sr=SR)
+    return f0
+
+
+def _guarded(name, stage):
+    """Run one recognition stage with the frozen-schema error fallback."""
+    try:
+        return stage()
+    except Exception as e:
+        print(f"[{name}] ERROR: {e}")
+        traceback.print_exc()
+        return _unknown()
 
-def recognize_raga(audio_path, aggregation_folder, models=None):
+
+def recognize_raga(audio_path, aggregation_folder, models=None, feature_dir=None, recorder=None):
     """
     Frozen JSON interface:
         { "final": str, "ranking": list, "margin": float, "confidence_tier": str }
 
     confidence_tier is one of: "HIGH" | "ESCALATED" | "UNKNOWN"
     The first three fields are unchanged from v1.2 frozen schema.
+
+    models (optional): raw load_aggregated_models() dict or, preferably, a
+    compile_models() bundle -- raw dicts are compiled on every call.
+    feature_dir (optional): features_v12 cache to serve f0 from (see load_f0).
+    Once pitch is obtained the result also carries "f0_source": "cache" | "live".
+    recorder (optional): stage_diagnostics.StageRecorder -- the result then
+    also carries "diagnostics" (wall ms + peak MB per stage).
+    """
+    rec = NULL_RECORDER if recorder is None else recorder
+
+    def stage():
+        with rec.stage("models"):
+            bundle = _bundle(aggregation_folder, models)
+        if bundle is None:
+            return _unknown()
+
+        # ---- Pitch: feature cache if given, else audio load + pYIN ----
+        f0, f0_source = load_f0(audio_path, feature_dir, rec)
+        return _f0_result(bundle, f0, f0_source, rec)
+
+    result = _guarded("recognize_raga", stage)
+    if recorder is not None:
+        result["diagnostics"] = recorder.report()
+    return result
+
+
+def recognize_from_array(y, sr, aggregation_folder=None, models=None):
+    """
+    recognize_raga() for a waveform already in memory (mono or (channels, n),
+    any sample rate -- resampled to SR, capped at MAX_DURATION_SEC).
+    f0_source "live".
+    """
+    def stage():
+        bundle = _bundle(aggregation_folder, models)
+        if bundle is None:
+            return _unknown()
+        return _f0_result(bundle, _array_f0(y, sr), "live")
+
+    return _guarded("recognize_from_array", stage)
+
+
+def recognize_from_f0(f0, aggregation_folder=None, models=None, f0_source="supplied"):
+    """
+    recognize_raga() from a raw pYIN f0 track (Hz, NaN = unvoiced), e.g. the
+    "f0" array of a features_v12 .npz. Tonic is estimated as usual.
+    """
+    def stage():
+        bundle = _bundle(aggregation_folder, models)
+        if bundle is None:
+            return _unknown()
+        return _f0_result(bundle, f0, f0_source)
+
+    return _guarded("recognize_from_f0", stage)
+
+
+def recognize_from_cents(cents, aggregation_folder=None, models=None, f0_source="supplied"):
+    """
+    recognize_raga() from tonic-normalised cents (folded to 0-1200 here),
+    e.g. "cents_gated" from a features_v12 .npz as the LOO scripts use it.
+    """
+    def stage():
+        bundle = _bundle(aggregation_folder, models)
+        if bundle is None:
+            return _unknown()
+        return _cents_result(bundle, cents, f0_source)
+
+    return _guarded("recognize_from_cents", stage)
+
+
+def recognize_from_features(pcd, test_up, test_down, aggregation_folder=None, models=None,
+                            f0_source="supplied"):
+    """
+    recognize_raga() from precomputed features: an N_BINS PCD and the
+    smoothed up / down dyad matrices (N_BINS x N_BINS or flattened), as
+    compute_directional_dyads() / aggregate_all_v12.clip_features() build them.
+    """
+    def stage():
+        bundle = _bundle(aggregation_folder, models)
+        if bundle is None:
+            return _unknown()
+        return _features_result(bundle, pcd, test_up, test_down, f0_source)
+
+    return _guarded("recognize_from_features", stage)
+
+
+# =========================
+# PROGRESSIVE (EARLY-EXIT) RECOGNITION
+# =========================
+
+def _new_progress():
     """
+    Running PCD / dyad state over the voiced frames seen so far, for one tonic.
+
+    Dyads are kept as raw counts over the closed stable regions; the last run
+    of identical bins stays open ("tail") because the next chunk may extend
+    it. Finalising adds the tail's transition if it is already long enough,
+    which gives exactly compute_directional_dyads() over all frames so far.
+    """
+    return {
+        "hist":        np.zeros(N_BINS),
+        "up":          np.zeros((N_BINS, N_BINS)),
+        "down":        np.zeros((N_BINS, N_BINS)),
+        "tail":        np.zeros(0, dtype=np.intp),
+        "last_stable": None,
+        "frames":      0,
+    }
+
+
+def _progress_add(progress, cents):
+    """Fold a block of cents (already tonic-relative, % 1200) into the state."""
+    hist, _ = np.histogram(cents, bins=N_BINS, range=(0, 1200))
+    progress["hist"] += hist
+
+    bins       = np.linspace(0, 1200, N_BINS + 1)
+    pitch_bins = np.digitize(cents, bins) - 1
+    pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
+    progress["frames"] += len(pitch_bins)
+
+    seq = np.concatenate((progress["tail"], pitch_bins))
+    if len(seq) == 0:
+        return
+
+    values, starts, lengths = run_length_encode(seq)
+
+    # Every run but the last is closed -- a new frame cannot extend it
+    stable = values[:-1][lengths[:-1] >= MIN_STABLE_FRAMES]
+    if progress["last_stable"] is not None:
+        stable = np.concatenate(([progress["last_stable"]], stable))
+
+    mat_up, mat_down, _ = directional_dyad_counts(stable, N_BINS)
+    progress["up"]   += mat_up
+    progress["down"] += mat_down
+
+    if len(stable):
+        progress["last_stable"] = stable[-1]
+    progress["tail"] = seq[starts[-1]:]
+
+
+def _progress_features(progress):
+    """-> (pcd, test_up, test_down) as recognize_raga computes them on the same frames."""
+    pcd = progress["hist"] / np.sum(progress["hist"])
+
+    if progress["frames"] < MIN_STABLE_FRAMES:
+        flat = np.zeros(N_BINS * N_BINS)
+        return pcd, flat, flat
+
+    mat_up, mat_down = progress["up"].copy(), progress["down"].copy()
+
+    tail = progress["tail"]
+    if len(tail) >= MIN_STABLE_FRAMES and progress["last_stable"] is not None:
+        closing = np.array([progress["last_stable"], tail[0]])
+        up_t, down_t, _ = directional_dyad_counts(closing, N_BINS)
+        mat_up   += up_t
+        mat_down += down_t
+
+    # --- Laplace smoothing + normalisation (identical to aggregation) ---
+    mat_up   += ALPHA
+    mat_down += ALPHA
+
+    mat_up   /= (np.sum(mat_up)   + EPS)
+    mat_down /= (np.sum(mat_down) + EPS)
+
+    return pcd, mat_up.flatten(), mat_down.flatten()
+
+
+def _f0_chunks(audio_path, chunk_sec, feature_dir=None):
+    """
+    Yield (f0_chunk, seconds_consumed, f0_source) one chunk at a time.
+
+    A feature-cache hit is sliced into chunk-sized frame blocks (no decode,
+    no pYIN -- useful for replaying early exit over a corpus). Otherwise only
+    the next chunk is decoded (audio_cache window read, or a slice of a
+    cached decode) and pitch-tracked. The file is hashed once, not per chunk.
+    """
+    use_sha = feature_dir is not None or DECODE_CACHE_DIR is not None
+    audio_sha = file_sha256(audio_path) if use_sha else None
+
+    if feature_dir is not None:
+        cached = lookup(feature_dir, audio_path, CACHE_PARAMS, audio_sha=audio_sha)
+        if cached is not None:
+            f0 = np.load(cached, allow_pickle=True)["f0"]
+            step = int(round(chunk_sec * SR / PYIN_HOP_LENGTH))
+            for start in range(0, len(f0), step):
+                block = f0[start:start + step]
+                yield block, min((start + len(block)) * PYIN_HOP_LENGTH / SR,
+                                 MAX_DURATION_SEC), "cache"
+            return
+
+    offset = 0.0
+    while offset < MAX_DURATION_SEC:
+        duration = min(chunk_sec, MAX_DURATION_SEC - offset)
+        y, _ = load_audio(audio_path, sr=SR, offset=offset, duration=duration, cache_dir=DECODE_CACHE_DIR,
+                          audio_sha=audio_sha, max_duration_sec=MAX_DURATION_SEC)
+
+        if len(y) < 2048:   # end of file (or less than one pYIN frame left)
+            return
+
+        f0, _, _ = librosa.pyin(y, fmin=FMIN, fmax=FMAX, sr=SR)
+        offset += len(y) / SR
+        yield f0, offset, "live"
+
+        if len(y) < int(duration * SR):
+            return
+
+
+def _with_progress(result, consumed=0.0, chunks=0, early_exit=False):
+    """Add the progressive-mode fields; every recognize_raga_progressive() return goes through here."""
+    result.update({"audio_consumed_sec": round(consumed, 2), "chunks": chunks, "early_exit": early_exit})
+    return result
+
+
+def recognize_raga_progressive(audio_path, aggregation_folder, models=None,
+                               feature_dir=None,
+                               chunk_sec=PROGRESSIVE_CHUNK_SEC,
+                               stable_chunks=PROGRESSIVE_STABLE_CHUNKS):
+    """
+    recognize_raga() that stops pitch tracking once the decision is stable.
+
+    Audio is decoded and pitch-tracked chunk_sec at a time (at most
+    MAX_DURATION_SEC in total). After every chunk the tonic is re-estimated
+    on all voiced frames so far; if it is unchanged the chunk is folded into
+    the running PCD / dyad counts, otherwise the counts are rebuilt from the
+    stored f0 (cheap next to pYIN). The clip is then scored and tiered as in
+    recognize_raga(). Recognition stops early when the same Top-1 with
+    margin >= MARGIN_STRICT has held for stable_chunks consecutive chunks.
+
+    Same frozen schema as recognize_raga(), plus:
+        "audio_consumed_sec": seconds of audio decoded / pitch-tracked
+        "chunks":             chunks processed
+        "early_exit":         True if the stability rule stopped recognition
+
+    Each chunk is pitch-tracked on its own, so pYIN's Viterbi path can differ
+    from a whole-clip pass in the frames next to a chunk boundary.
+    """
+
+    consumed, chunk, f0_source = 0.0, 0, None
 
     try:
 
@@ -237,110 +757,60 @@ def recognize_raga(audio_path, aggregation_folder, models=None):
             models = load_aggregated_models(aggregation_folder)
 
         if not models:
-            return {
-                "final": "UNKNOWN / LOW CONFIDENCE",
-                "ranking": [],
-                "margin": 0.0,
-                "confidence_tier": "UNKNOWN"
-            }
+            return _with_progress(_unknown())
 
-        # ---- Audio load & pitch extraction ----
-        y, sr = librosa.load(audio_path, sr=SR, duration=MAX_DURATION_SEC)
+        bundle = models if is_compiled(models) else compile_models(models)
 
-        f0, voiced_flag, _ = librosa.pyin(
-            y,
-            fmin=librosa.note_to_hz("C1"),
-            fmax=librosa.note_to_hz("C6"),
-            sr=SR,
-        )
+        voiced   = []      # valid f0 per chunk, for tonic re-estimation / rebuilds
+        progress = None
+        sa_hz    = None
+        result   = None
+        streak   = 0
 
-        valid = f0[~np.isnan(f0)]
+        for chunk, (f0, consumed, f0_source) in enumerate(
+                _f0_chunks(audio_path, chunk_sec, feature_dir), start=1):
 
-        if len(valid) < 200:
-            return {
-                "final": "UNKNOWN / LOW CONFIDENCE",
-                "ranking": [],
-                "margin": 0.0,
-                "confidence_tier": "UNKNOWN"
-            }
+            valid = f0[~np.isnan(f0)]
+            voiced.append(valid)
+            all_valid = np.concatenate(voiced)
 
-        # ---- C1: canonical tonic from utils.py ----
-        sa_hz = estimate_tonic(valid)
+            if len(all_valid) < 200:
+                continue
 
-        cents = 1200 * np.log2(valid / sa_hz)
-        cents = cents % 1200
+            # ---- C1 tonic on everything so far; rebuild counts if it moved ----
+            new_sa = estimate_tonic(all_valid)
 
-        # ---- PCD ----
-        hist, _ = np.histogram(cents, bins=N_BINS, range=(0, 1200))
+            if new_sa != sa_hz:
+                sa_hz, progress, block = new_sa, _new_progress(), all_valid
+            else:
+                block = valid
 
-        if np.sum(hist) == 0:
-            return {
-                "final": "UNKNOWN / LOW CONFIDENCE",
-                "ranking": [],
-                "margin": 0.0,
-                "confidence_tier": "UNKNOWN"
-            }
+            _progress_add(progress, (1200 * np.log2(block / sa_hz)) % 1200)
+
+            if np.sum(progress["hist"]) == 0:
+                continue
 
-        pcd = hist / np.sum(hist)
+            pcd, test_up, test_down = _progress_features(progress)
+            new_result = tiered_result(bundle, pcd, test_up, test_down, f0_source)
 
-        # ---- Directional Dyads ----
-        test_up, test_down = compute_directional_dyads(cents)
+            if (new_result["confidence_tier"] == "HIGH" and result is not None
+                    and result["final"] == new_result["final"]):
+                streak += 1
+            else:
+                streak = 1 if new_result["confidence_tier"] == "HIGH" else 0
 
-        # ================================================================
-        # B1: TIERED CONFIDENCE LOGIC
-        # Step 1 -- IDF x Variance weighted scoring (Phase 3 BUG-008 fix)
-        # ================================================================
-        pcd_weights = compute_pcd_weights(models)
-
-        scores = _score_models(pcd, test_up, test_down, models,
-                               PCD_WEIGHT, DYAD_WEIGHT,
-                               pcd_weights=pcd_weights)
-
-        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-
-        margin = (ranked[0][1] - ranked[1][1]) if len(ranked) >= 2 else 0.0
-
-        # ================================================================
-        # Step 2 — HIGH CONFIDENCE path: margin exceeds strict threshold
-        # ================================================================
-        if margin >= MARGIN_STRICT:
-            return {
-                "final": ranked[0][0],
-                "ranking": ranked,
-                "margin": round(margin, 6),
-                "confidence_tier": "HIGH"
-            }
+            result = _with_progress(new_result, consumed, chunk)
 
-        # ================================================================
-        # ================================================================
-        # Step 3 -- BUG-007 fix: escalation DISABLED (crushed margins 5x)
-        # Use first-pass scores with MIN_MARGIN_FINAL threshold instead
-        # ================================================================
-        if margin >= MIN_MARGIN_FINAL:
-            return {
-                "final": ranked[0][0],
-                "ranking": ranked,
-                "margin": round(margin, 6),
-                "confidence_tier": "MODERATE"
-            }
+            if streak >= stable_chunks:
+                result["early_exit"] = True
+                break
 
-        # ================================================================
-        # Step 4 -- Margin too small -> UNKNOWN
-        # ================================================================
-        return {
-            "final": "UNKNOWN / LOW CONFIDENCE",
-            "ranking": ranked,
-            "margin": round(margin, 6),
-            "confidence_tier": "UNKNOWN"
-        }
+        if result is None:
+            return _with_progress(_unknown(f0_source), consumed, chunk)
+        return result
 
     except Exception as e:
-        print(f"[recognize_raga] ERROR: {e}")
+        print(f"[recognize_raga_progressive] ERROR: {e}")
         traceback.print_exc()
-        return {
-            "final": "UNKNOWN / LOW CONFIDENCE",
-            "ranking": [],
-            "margin": 0.0,
-            "confidence_tier": "UNKNOWN"
-        }
-
+        # No f0_source: an error result is never cached as a recognition
+        return _with_progress(_unknown(), consumed, chunk)
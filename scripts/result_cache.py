@@ -0,0 +1,257 @@
+"""
+Two-level memo of recognize_raga() results for re-submitted recordings.
+
+Ingestion sees the same audio many times (re-crawls, playlist duplicates,
+re-runs after a crash). A ResultCache answers those from memory (LRU) or
+from disk without decoding or pitch-tracking again:
+
+    key = feature_cache.cache_key(audio_sha256, {"model_sha256": ...})
+        = {audio_sha256[:24]}_{12 hex chars per model}
+
+model_sha256 hashes the compiled bundle's arrays + raga order together with
+every constant that shapes a result (weights, margins, N_BINS, ALPHA,
+MIN_STABLE_FRAMES, pYIN / cache params, RESULT_CACHE_VERSION). Loading a
+different aggregation run or changing a constant changes the key, so stale
+results are never served; `gc` deletes them from disk.
+
+The audio hash itself is memoised per (path, size, mtime), so a repeat
+request for an unchanged file costs one os.stat + a dict lookup.
+
+Only results where pitch was obtained (they carry "f0_source") are stored;
+load / decode errors are not, so they are retried next time. Served results
+carry an extra "result_cache": "memory" | "disk".
+
+    python result_cache.py stats [--cache-dir ...]
+    python result_cache.py gc --agg-folder <run> [--dry-run]
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import recognize_raga_v12 as rr
+from feature_cache import file_sha256, cache_key
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR             = r"D:\Swaragam"
+RESULT_DIR           = os.path.join(BASE_DIR, "pcd_results", "result_cache")
+MAX_MEMORY_ENTRIES   = 4096
+RESULT_CACHE_VERSION = 1   # bump when recognition code changes results without a constant changing
+
+_BUNDLE_ARRAYS = ("pcd_weights", "pcd_matrix", "up_matrix", "down_matrix")
+
+
+# =========================
+# KEYS
+# =========================
+def scoring_constants():
+    """Every recognize_raga_v12 constant a result depends on (read live)."""
+    return {
+        "result_cache_version": RESULT_CACHE_VERSION,
+        "cache_params": rr.CACHE_PARAMS,
+        "n_bins": rr.N_BINS,
+        "min_stable_frames": rr.MIN_STABLE_FRAMES,
+        "alpha": rr.ALPHA,
+        "eps": rr.EPS,
+        "pcd_weight": rr.PCD_WEIGHT,
+        "dyad_weight": rr.DYAD_WEIGHT,
+        "per_raga_weights": {r: list(w) for r, w in sorted(rr.PER_RAGA_WEIGHTS.items())},
+        "margin_strict": rr.MARGIN_STRICT,
+        "min_margin_final": rr.MIN_MARGIN_FINAL,
+    }
+
+
+def model_digest(bundle):
+    """SHA-256 of a compiled bundle + scoring_constants()."""
+    h = hashlib.sha256()
+    h.update(json.dumps({"raga_order": list(bundle["raga_order"]),
+                         "constants": scoring_constants()}, sort_keys=True).encode("utf-8"))
+    for name in _BUNDLE_ARRAYS:
+        h.update(np.ascontiguousarray(bundle[name]).tobytes())
+    return h.hexdigest()
+
+
+def _to_json(result):
+    return json.dumps({**result, "ranking": [[r, float(s)] for r, s in result["ranking"]]})
+
+
+def _from_json(text):
+    result = json.loads(text)
+    result["ranking"] = [(r, s) for r, s in result["ranking"]]
+    return result
+
+
+# =========================
+# CACHE
+# =========================
+class ResultCache:
+    """
+    recognize_raga() results for one compiled bundle: in-process LRU in
+    front of one JSON file per entry under cache_dir (None = memory only).
+    Thread-safe; one instance can serve every request of a server.
+    """
+
+    def __init__(self, bundle, cache_dir=RESULT_DIR, max_entries=MAX_MEMORY_ENTRIES):
+        self.bundle      = bundle
+        self.cache_dir   = cache_dir
+        self.max_entries = max_entries
+        self.model_sha   = model_digest(bundle)
+        self._params     = {"model_sha256": self.model_sha}
+        self._lock       = threading.Lock()
+        self._memory     = OrderedDict()
+        self._audio_sha  = {}
+        self.hits        = {"memory": 0, "disk": 0, "miss": 0}
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def audio_sha(self, audio_path):
+        """Content hash, recomputed only when the file's size or mtime changes."""
+        st = os.stat(audio_path)
+        stat_key = (os.path.abspath(audio_path), st.st_size, st.st_mtime_ns)
+
+        with self._lock:
+            sha = self._audio_sha.get(stat_key)
+        if sha is None:
+            sha = file_sha256(audio_path)
+            with self._lock:
+                self._audio_sha[stat_key] = sha
+        return sha
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key, result):
+        # Caller holds the lock
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, audio_sha):
+        """Cached result for these audio bytes under this bundle, or None."""
+        key = cache_key(audio_sha, self._params)
+
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return {**result, "ranking": list(result["ranking"]), "result_cache": "memory"}
+
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            with open(self._path(key), encoding="utf-8") as f:
+                result = _from_json(f.read())
+            with self._lock:
+                self._remember(key, result)
+                self.hits["disk"] += 1
+            return {**result, "ranking": list(result["ranking"]), "result_cache": "disk"}
+
+        with self._lock:
+            self.hits["miss"] += 1
+        return None
+
+    def put(self, audio_sha, result):
+        if "f0_source" not in result:
+            return   # load / decode failure: retry next time
+
+        key = cache_key(audio_sha, self._params)
+        result = {k: v for k, v in result.items() if k not in ("result_cache", "diagnostics")}
+
+        if self.cache_dir is not None:
+            tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(_to_json(result))
+            os.replace(tmp, self._path(key))
+
+        with self._lock:
+            self._remember(key, _from_json(_to_json(result)))
+
+    def recognize(self, audio_path, aggregation_folder, feature_dir=None):
+        """recognize_raga() through the cache."""
+        try:
+            sha = self.audio_sha(audio_path)
+        except OSError:
+            sha = None   # unreadable path: let recognize_raga report it
+
+        if sha is not None:
+            cached = self.get(sha)
+            if cached is not None:
+                return cached
+
+        result = rr.recognize_raga(audio_path, aggregation_folder,
+                                   models=self.bundle, feature_dir=feature_dir)
+        if sha is not None:
+            self.put(sha, result)
+        return result
+
+    def summary(self):
+        with self._lock:
+            return {"model_sha256": self.model_sha[:12], "memory_entries": len(self._memory),
+                    **{f"hits_{k}": v for k, v in self.hits.items()}}
+
+
+# =========================
+# CLI
+# =========================
+def _entries(cache_dir):
+    if not os.path.isdir(cache_dir):
+        return []
+    return sorted(f for f in os.listdir(cache_dir) if f.endswith(".json"))
+
+
+def stats(cache_dir=RESULT_DIR):
+    files = _entries(cache_dir)
+    models = {os.path.splitext(f)[0].rsplit("_", 1)[-1] for f in files}
+    print(f"Result cache: {cache_dir}")
+    print(f"Entries: {len(files)} | model digests: {len(models)}")
+
+
+def gc(agg_folder, cache_dir=RESULT_DIR, dry_run=False):
+    """Delete entries whose key was not made with this run's bundle + current constants."""
+    bundle = rr.load_compiled_models(agg_folder)
+    if bundle is None:
+        print(f"No models found in: {agg_folder}")
+        return 1
+
+    keep = cache_key("0" * 64, {"model_sha256": model_digest(bundle)}).rsplit("_", 1)[-1]
+    files = _entries(cache_dir)
+    stale = [f for f in files if os.path.splitext(f)[0].rsplit("_", 1)[-1] != keep]
+
+    if not dry_run:
+        for f in stale:
+            os.remove(os.path.join(cache_dir, f))
+
+    print(f"{'Would delete' if dry_run else 'Deleted'}: {len(stale)} | kept: {len(files) - len(stale)}")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="On-disk recognize_raga() result cache.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_stats = sub.add_parser("stats", help="entry count")
+    p_stats.add_argument("--cache-dir", default=RESULT_DIR)
+
+    p_gc = sub.add_parser("gc", help="evict entries from other model bundles / constants")
+    p_gc.add_argument("--agg-folder", required=True)
+    p_gc.add_argument("--cache-dir", default=RESULT_DIR)
+    p_gc.add_argument("--dry-run", action="store_true")
+
+    args = ap.parse_args()
+    if args.cmd == "stats":
+        stats(args.cache_dir)
+        return 0
+    return gc(args.agg_folder, args.cache_dir, args.dry_run)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,6 +17,7 @@ If test clip has no Pa/Ni -> penalize Kalyani score, not Abhogi score.
 import os
 import numpy as np
 from collections import defaultdict
+from utils import stable_regions, directional_dyad_counts
 
 FEAT_DIR = r"D:\Swaragam\pcd_results\features_v12"
 N_BINS = 72
@@ -98,30 +99,9 @@ def extract_features(data):
     pitch_bins = np.digitize(cents, bins_arr) - 1
     pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
 
-    stable_bins = []
-    if len(pitch_bins) >= MIN_STABLE:
-        current = pitch_bins[0]
-        count = 1
-        for b in pitch_bins[1:]:
-            if b == current:
-                count += 1
-            else:
-                if count >= MIN_STABLE:
-                    stable_bins.append(current)
-                current = b
-                count = 1
-        if count >= MIN_STABLE:
-            stable_bins.append(current)
-
-    up = np.zeros((N_BINS, N_BINS))
-    down = np.zeros((N_BINS, N_BINS))
-    for i in range(len(stable_bins) - 1):
-        frm = stable_bins[i]
-        to = stable_bins[i + 1]
-        if to > frm:
-            up[frm, to] += 1
-        elif to < frm:
-            down[frm, to] += 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE)
+
+    up, down, _ = directional_dyad_counts(stable_bins, N_BINS)
 
     up_flat = (up + ALPHA).flatten()
     up_flat /= (np.sum(up_flat) + EPS)
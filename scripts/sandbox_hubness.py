@@ -14,6 +14,10 @@ Compares:
 NO production files modified.
 """
 import os, numpy as np
+from utils import stable_regions, directional_dyad_counts
+from loo_engine import (
+    stack_processed, loo_similarities, loo_model_similarities, fuse, hubness_correction, decide,
+)
 
 # ============================================================
 # CONFIG
@@ -24,8 +28,6 @@ ALPHA = 0.01
 EPS = 1e-8
 PCD_W = 0.6
 DYAD_W = 0.4
-MARGIN_STRICT = 0.003
-MIN_MARGIN_FINAL = 0.001
 
 FEAT_DIR = r"D:\Swaragam\pcd_results\features_v12"
 
@@ -62,28 +64,9 @@ def compute_features(cents, n_bins):
     pitch_bins = np.digitize(cents, bin_edges) - 1
     pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < n_bins)]
 
-    stable_bins = []
-    current = pitch_bins[0]
-    count = 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count = 1
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
-
-    mat_up = np.zeros((n_bins, n_bins))
-    mat_down = np.zeros((n_bins, n_bins))
-    for i in range(len(stable_bins) - 1):
-        frm, to = stable_bins[i], stable_bins[i + 1]
-        if to > frm:
-            mat_up[frm, to] += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, n_bins)
     mat_up += ALPHA
     mat_down += ALPHA
     mat_up /= (np.sum(mat_up) + EPS)
@@ -154,6 +137,17 @@ def loo_eval(raw_clips, n_bins, use_hubness, label):
             "pcd": pcd, "up": up, "down": down,
         })
 
+    # All folds at once (loo_engine): same canonical models / weights as a
+    # per-fold rebuild, fused at PCD_W / DYAD_W
+    raga_order, labels, pcd, up, down = stack_processed(processed)
+    pcd_sim, dyad_sim = loo_similarities(labels, pcd, up, down)
+    scores = fuse(raga_order, pcd_sim, dyad_sim, None, PCD_W, DYAD_W)
+
+    # Centred hubness: score - avg_sim[raga] + global_mean, per fold
+    if use_hubness:
+        scores = scores - hubness_correction(
+            loo_model_similarities(labels, pcd, up, down, PCD_W, DYAD_W))
+
     raga_stats = {}
     total_c = 0
     total_w = 0
@@ -161,57 +155,8 @@ def loo_eval(raw_clips, n_bins, use_hubness, label):
     thodi_sink = 0
     wrongs = []
 
-    for i in range(len(processed)):
-        held_out = processed[i]
-        training = processed[:i] + processed[i + 1:]
-
-        # Build models from training only
-        raga_data = {}
-        for c in training:
-            raga_data.setdefault(c["raga"], []).append(c)
-
-        models = {}
-        for raga, rclips in raga_data.items():
-            models[raga] = {
-                "pcd": np.mean([c["pcd"] for c in rclips], axis=0),
-                "up": np.mean([c["up"] for c in rclips], axis=0),
-                "down": np.mean([c["down"] for c in rclips], axis=0),
-            }
-
-        # IDF x variance weights from training models
-        weights = compute_idf_var_weights(models, n_bins)
-
-        # Score held-out clip
-        pcd_w = held_out["pcd"] * weights
-        pcd_w = pcd_w / (np.sum(pcd_w) + EPS)
-
-        scores = {}
-        for raga, m in models.items():
-            model_w = m["pcd"] * weights
-            model_w = model_w / (np.sum(model_w) + EPS)
-            pcd_sim = np.dot(pcd_w, model_w)
-            dyad_sim = 0.5 * (np.dot(held_out["up"], m["up"]) +
-                              np.dot(held_out["down"], m["down"]))
-            scores[raga] = PCD_W * pcd_sim + DYAD_W * dyad_sim
-
-        # Apply hubness correction if enabled
-        if use_hubness:
-            avg_sim, global_mean = compute_hubness(models, weights)
-            for raga in scores:
-                scores[raga] = scores[raga] - avg_sim[raga] + global_mean
-
-        # Margin gating
-        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        margin = ranked[0][1] - ranked[1][1] if len(ranked) >= 2 else 0
-        pred = ranked[0][0]
-
-        if margin >= MARGIN_STRICT:
-            tier = "HIGH"
-        elif margin >= MIN_MARGIN_FINAL:
-            tier = "MOD"
-        else:
-            tier = "UNK"
-            pred = "UNKNOWN"
+    for held_out, fold in zip(processed, decide(raga_order, scores, processed)):
+        pred, tier, margin = fold["pred"], fold["tier"], fold["margin"]
 
         true_raga = held_out["raga"]
         s = raga_stats.setdefault(true_raga, {"t": 0, "c": 0, "w": 0, "u": 0})
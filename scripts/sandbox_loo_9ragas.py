@@ -3,6 +3,7 @@ LOO cross-validation on 9 ragas / 81 clips with 72-bin IDF x Variance.
 Compares: old (6 ragas/53 clips) vs new (9 ragas/81 clips).
 """
 import os, numpy as np
+from utils import stable_regions, directional_dyad_counts
 
 N_BINS = 72
 MIN_STABLE_FRAMES = 5
@@ -41,28 +42,9 @@ def compute_features(cents, n_bins):
     pitch_bins = np.digitize(cents, bin_edges) - 1
     pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < n_bins)]
 
-    stable_bins = []
-    current = pitch_bins[0]
-    count = 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count = 1
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
-
-    mat_up = np.zeros((n_bins, n_bins))
-    mat_down = np.zeros((n_bins, n_bins))
-    for i in range(len(stable_bins) - 1):
-        frm, to = stable_bins[i], stable_bins[i + 1]
-        if to > frm:
-            mat_up[frm, to] += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, n_bins)
     mat_up += ALPHA
     mat_down += ALPHA
     mat_up /= (np.sum(mat_up) + EPS)
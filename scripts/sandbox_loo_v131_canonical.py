@@ -9,6 +9,8 @@ Run this to get ground-truth numbers for datasets.md and architecture.md.
 """
 import os
 import numpy as np
+from utils import stable_regions, directional_dyad_counts
+from loo_engine import loo_decisions   # exact O(N) LOO: per-raga sums downdated per fold
 
 # ── Config (must match recognize_raga_v12.py exactly) ──────────────────────
 N_BINS           = 72
@@ -53,28 +55,9 @@ def compute_features(cents):
     pitch_bins = np.digitize(cents, bin_edges) - 1
     pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
 
-    stable_bins = []
-    current = pitch_bins[0]
-    count   = 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count   = 1
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
-
-    mat_up   = np.zeros((N_BINS, N_BINS))
-    mat_down = np.zeros((N_BINS, N_BINS))
-    for i in range(len(stable_bins) - 1):
-        frm, to = stable_bins[i], stable_bins[i + 1]
-        if to > frm:
-            mat_up[frm, to]   += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, N_BINS)
 
     mat_up   += ALPHA;  mat_up   /= (np.sum(mat_up)   + EPS)
     mat_down += ALPHA;  mat_down /= (np.sum(mat_down) + EPS)
@@ -82,17 +65,6 @@ def compute_features(cents):
     return pcd, mat_up.flatten(), mat_down.flatten()
 
 
-# ── IDF x Variance weights ──────────────────────────────────────────────────
-def idf_var_weights(models):
-    all_pcds  = np.array([m["pcd"] for m in models.values()])
-    threshold = 1.0 / N_BINS
-    doc_freq  = np.sum(all_pcds > threshold, axis=0)
-    idf       = np.log(len(models) / (doc_freq + 1)) + 1
-    bin_std   = np.std(all_pcds, axis=0)
-    w         = idf / (bin_std + EPS)
-    return w / (np.sum(w) + EPS) * N_BINS
-
-
 # ── LOO ─────────────────────────────────────────────────────────────────────
 def run_loo(clips):
     # Pre-compute features
@@ -106,48 +78,10 @@ def run_loo(clips):
     total_c = total_w = total_u = 0
     wrongs  = []
 
-    for i, held in enumerate(processed):
-        train = processed[:i] + processed[i+1:]
-
-        # Build per-raga models from training set
-        raga_data = {}
-        for c in train:
-            raga_data.setdefault(c["raga"], []).append(c)
-
-        models = {
-            raga: {
-                "pcd":  np.mean([c["pcd"]  for c in rclips], axis=0),
-                "up":   np.mean([c["up"]   for c in rclips], axis=0),
-                "down": np.mean([c["down"] for c in rclips], axis=0),
-            }
-            for raga, rclips in raga_data.items()
-        }
-
-        weights = idf_var_weights(models)
-
-        # Score held-out clip
-        pcd_w = held["pcd"] * weights
-        pcd_w = pcd_w / (np.sum(pcd_w) + EPS)
-
-        scores = {}
-        for raga, m in models.items():
-            r_pcd_w, r_dyad_w = PER_RAGA_WEIGHTS.get(raga, (PCD_WEIGHT, DYAD_WEIGHT))
-            model_w = m["pcd"] * weights
-            model_w = model_w / (np.sum(model_w) + EPS)
-            pcd_sim  = np.dot(pcd_w, model_w)
-            dyad_sim = 0.5 * (np.dot(held["up"],   m["up"]) +
-                               np.dot(held["down"], m["down"]))
-            scores[raga] = r_pcd_w * pcd_sim + r_dyad_w * dyad_sim
-
-        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        margin = ranked[0][1] - ranked[1][1] if len(ranked) >= 2 else 0.0
-
-        if margin >= MARGIN_STRICT:
-            tier, pred = "HIGH", ranked[0][0]
-        elif margin >= MIN_MARGIN_FINAL:
-            tier, pred = "MOD",  ranked[0][0]
-        else:
-            tier, pred = "UNK",  "UNKNOWN"
+    # Every fold: own raga's model downdated, IDF x variance recomputed,
+    # all folds scored in one batch (loo_engine.py)
+    for fold in loo_decisions(processed, PER_RAGA_WEIGHTS, PCD_WEIGHT, DYAD_WEIGHT):
+        held, tier, pred, margin = fold, fold["tier"], fold["pred"], fold["margin"]
 
         true_raga = held["raga"]
         s = raga_stats.setdefault(true_raga, {"t": 0, "c": 0, "w": 0, "u": 0})
@@ -4,7 +4,8 @@ FAST VERSION: Uses cached features for seed dataset, only extracts 4 test files.
 """
 import sys, os, numpy as np, librosa
 sys.path.insert(0, ".")
-from utils import estimate_tonic
+from utils import estimate_tonic, stable_regions, directional_dyad_counts
+from audio_cache import load_audio
 
 SR = 22050
 MAX_DURATION_SEC = 360
@@ -44,27 +45,8 @@ def compute_directional_dyads(cents):
     pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
     if len(pitch_bins) < MIN_STABLE_FRAMES:
         return np.zeros(N_BINS * N_BINS), np.zeros(N_BINS * N_BINS)
-    stable_bins = []
-    current = pitch_bins[0]
-    count = 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count = 1
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
-    mat_up = np.zeros((N_BINS, N_BINS))
-    mat_down = np.zeros((N_BINS, N_BINS))
-    for i in range(len(stable_bins) - 1):
-        frm, to = stable_bins[i], stable_bins[i + 1]
-        if to > frm:
-            mat_up[frm, to] += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, N_BINS)
     mat_up += ALPHA
     mat_down += ALPHA
     mat_up /= (np.sum(mat_up) + EPS)
@@ -73,7 +55,7 @@ def compute_directional_dyads(cents):
 
 
 def features_from_audio(audio_path):
-    y, sr = librosa.load(audio_path, sr=SR, duration=MAX_DURATION_SEC)
+    y, sr = load_audio(audio_path, sr=SR, duration=MAX_DURATION_SEC)
     f0, _, _ = librosa.pyin(y, fmin=librosa.note_to_hz("C1"),
                             fmax=librosa.note_to_hz("C6"), sr=SR)
     valid = f0[~np.isnan(f0)]
@@ -9,7 +9,8 @@ and compares against the current 0.6/0.4 results.
 """
 import sys, os, numpy as np, librosa
 sys.path.insert(0, ".")
-from utils import estimate_tonic
+from utils import estimate_tonic, stable_regions, directional_dyad_counts
+from audio_cache import load_audio
 
 # ============================================================
 # CONFIG — matches recognize_raga_v12.py exactly, except weights
@@ -59,28 +60,8 @@ def compute_directional_dyads(cents):
     if len(pitch_bins) < MIN_STABLE_FRAMES:
         flat = np.zeros(N_BINS * N_BINS)
         return flat, flat
-    stable_bins = []
-    current = pitch_bins[0]
-    count = 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count = 1
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
-    mat_up = np.zeros((N_BINS, N_BINS))
-    mat_down = np.zeros((N_BINS, N_BINS))
-    for i in range(len(stable_bins) - 1):
-        frm = stable_bins[i]
-        to = stable_bins[i + 1]
-        if to > frm:
-            mat_up[frm, to] += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, N_BINS)
     mat_up += ALPHA
     mat_down += ALPHA
     mat_up /= (np.sum(mat_up) + EPS)
@@ -90,7 +71,7 @@ def compute_directional_dyads(cents):
 
 def extract_features(audio_path):
     """Extract PCD and dyads from audio file."""
-    y, sr = librosa.load(audio_path, sr=SR, duration=MAX_DURATION_SEC)
+    y, sr = load_audio(audio_path, sr=SR, duration=MAX_DURATION_SEC)
     f0, _, _ = librosa.pyin(y, fmin=librosa.note_to_hz("C1"),
                             fmax=librosa.note_to_hz("C6"), sr=SR)
     valid = f0[~np.isnan(f0)]
@@ -11,7 +11,8 @@ NO production files are modified. All aggregation is done in-memory.
 """
 import sys, os, numpy as np, librosa
 sys.path.insert(0, ".")
-from utils import estimate_tonic
+from utils import estimate_tonic, stable_regions, directional_dyad_counts
+from audio_cache import load_audio
 
 # ============================================================
 # CONFIG
@@ -55,28 +56,9 @@ def aggregate_in_memory(feat_dir, alpha):
         pitch_bins = np.digitize(cents, bins) - 1
         pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
 
-        stable_bins = []
-        current = pitch_bins[0]
-        count = 1
-        for b in pitch_bins[1:]:
-            if b == current:
-                count += 1
-            else:
-                if count >= MIN_STABLE_FRAMES:
-                    stable_bins.append(current)
-                current = b
-                count = 1
-        if count >= MIN_STABLE_FRAMES:
-            stable_bins.append(current)
-
-        mat_up = np.zeros((N_BINS, N_BINS))
-        mat_down = np.zeros((N_BINS, N_BINS))
-        for i in range(len(stable_bins) - 1):
-            frm, to = stable_bins[i], stable_bins[i + 1]
-            if to > frm:
-                mat_up[frm, to] += 1
-            elif to < frm:
-                mat_down[frm, to] += 1
+        stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+
+        mat_up, mat_down, _ = directional_dyad_counts(stable_bins, N_BINS)
 
         mat_up += alpha
         mat_down += alpha
@@ -106,28 +88,9 @@ def compute_dyads_for_test(cents, alpha):
     if len(pitch_bins) < MIN_STABLE_FRAMES:
         return np.zeros(N_BINS * N_BINS), np.zeros(N_BINS * N_BINS)
 
-    stable_bins = []
-    current = pitch_bins[0]
-    count = 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count = 1
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
-
-    mat_up = np.zeros((N_BINS, N_BINS))
-    mat_down = np.zeros((N_BINS, N_BINS))
-    for i in range(len(stable_bins) - 1):
-        frm, to = stable_bins[i], stable_bins[i + 1]
-        if to > frm:
-            mat_up[frm, to] += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, N_BINS)
 
     mat_up += alpha
     mat_down += alpha
@@ -250,7 +213,7 @@ weight_combos = [
 
 for fname, expected in test_files:
     fpath = os.path.join(TEST_DIR, fname)
-    y, sr = librosa.load(fpath, sr=SR, duration=MAX_DURATION_SEC)
+    y, sr = load_audio(fpath, sr=SR, duration=MAX_DURATION_SEC)
     f0, _, _ = librosa.pyin(y, fmin=librosa.note_to_hz("C1"),
                             fmax=librosa.note_to_hz("C6"), sr=SR)
     valid = f0[~np.isnan(f0)]
@@ -8,6 +8,7 @@ NO production files modified.
 """
 import os, sys, numpy as np
 sys.path.insert(0, ".")
+from utils import stable_regions, directional_dyad_counts
 
 # ============================================================
 # CONFIG
@@ -47,28 +48,9 @@ def load_all_features():
         pitch_bins = np.digitize(cents, bins) - 1
         pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
 
-        stable_bins = []
-        current = pitch_bins[0]
-        count = 1
-        for b in pitch_bins[1:]:
-            if b == current:
-                count += 1
-            else:
-                if count >= MIN_STABLE_FRAMES:
-                    stable_bins.append(current)
-                current = b
-                count = 1
-        if count >= MIN_STABLE_FRAMES:
-            stable_bins.append(current)
-
-        mat_up = np.zeros((N_BINS, N_BINS))
-        mat_down = np.zeros((N_BINS, N_BINS))
-        for i in range(len(stable_bins) - 1):
-            frm, to = stable_bins[i], stable_bins[i + 1]
-            if to > frm:
-                mat_up[frm, to] += 1
-            elif to < frm:
-                mat_down[frm, to] += 1
+        stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+
+        mat_up, mat_down, _ = directional_dyad_counts(stable_bins, N_BINS)
         mat_up += ALPHA
         mat_down += ALPHA
         mat_up /= (np.sum(mat_up) + EPS)
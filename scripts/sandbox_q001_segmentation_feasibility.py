@@ -30,6 +30,8 @@ import librosa
 
 # Import production constants -- do not redefine (ADR-015).
 from recognize_raga_v12 import SR, N_BINS, MAX_DURATION_SEC, MIN_STABLE_FRAMES
+from utils import stable_regions
+from audio_cache import load_audio
 
 # ============================================================================
 # PRE-REGISTRATION  --  fill these in BEFORE running. The script refuses to run
@@ -69,7 +71,7 @@ def _check_preregistration():
 
 def audio_to_swara_string(audio_path):
     """Production extraction -> stable held bins -> collapsed swara-index string."""
-    y, _ = librosa.load(audio_path, sr=SR, duration=MAX_DURATION_SEC)
+    y, _ = load_audio(audio_path, sr=SR, duration=MAX_DURATION_SEC)
     f0, _, _ = librosa.pyin(
         y, sr=SR,
         fmin=librosa.note_to_hz("C1"), fmax=librosa.note_to_hz("C6"),
@@ -91,17 +93,7 @@ def audio_to_swara_string(audio_path):
         return []
 
     # Stable-region detection -- identical logic to compute_directional_dyads().
-    stable = []
-    current, count = pitch_bins[0], 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable.append(current)
-            current, count = b, 1
-    if count >= MIN_STABLE_FRAMES:
-        stable.append(current)
+    stable, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
 
     # Bin -> swara index, then collapse consecutive duplicates.
     swaras = [int(b) // BINS_PER_SWARA for b in stable]
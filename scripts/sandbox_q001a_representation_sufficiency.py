@@ -24,16 +24,14 @@ to dominate: production caches it in .npz; this sandbox re-runs it live.
 """
 
 import os
-import re
 import csv
-import glob
 import time
 import argparse
 import numpy as np
 import librosa
 
 from recognize_raga_v12 import SR, N_BINS, MAX_DURATION_SEC, MIN_STABLE_FRAMES
-from utils import estimate_tonic
+from utils import estimate_tonic, stable_regions
 
 TARGET_RAGA     = "Abhogi"
 REFERENCE_RAGAS = ["Kalyani", "Shankarabharanam"]
@@ -52,9 +50,11 @@ AUDIO_EXTS = (".wav", ".mp3", ".flac")
 
 # Production feature cache (extract_pitch_batch_v12.py). f0 is the raw pyin
 # output; reusing it skips the ONLY expensive step. Set via --feature-dir.
-from feature_constants import FEATURE_VERSION   # single source of truth (ADR-015)
+from feature_cache import extraction_params, lookup
+from audio_cache import load_audio
 FEATURE_DIR = None                       # None -> always live pyin
-_TS_RE = re.compile(r"\d{8}_\d{6}")      # {base}_{YYYYMMDD}_{HHMMSS}.npz
+CACHE_PARAMS = extraction_params(SR, librosa.note_to_hz("C1"),
+                                 librosa.note_to_hz("C6"), MAX_DURATION_SEC)
 
 # --- diagnostics accumulators (do not affect metrics) ---
 _PYIN_SECONDS = []              # per-clip pyin wall time
@@ -63,22 +63,10 @@ _SOURCES      = []              # "cache" | "live" per clip
 
 
 def _find_cached_npz(audio_path):
-    """Newest version-matching .npz for this clip, or None. Mirrors producer naming."""
+    """Content-addressed cache entry for this clip, or None (feature_cache.py, O(1))."""
     if not FEATURE_DIR:
         return None
-    base = os.path.splitext(os.path.basename(audio_path))[0]
-    hits = []
-    for cand in glob.glob(os.path.join(FEATURE_DIR, f"{base}_*.npz")):
-        tail = os.path.basename(cand)[len(base) + 1:-4]     # strip "{base}_" and ".npz"
-        if not _TS_RE.fullmatch(tail):
-            continue                                        # different clip sharing a prefix
-        try:
-            fv = str(np.load(cand, allow_pickle=True)["feature_version"])
-        except Exception:
-            continue
-        if fv == FEATURE_VERSION:
-            hits.append((tail, cand))                       # tail sorts lexically by timestamp
-    return max(hits)[1] if hits else None
+    return lookup(FEATURE_DIR, audio_path, CACHE_PARAMS)
 
 
 def get_f0(audio_path):
@@ -87,7 +75,7 @@ def get_f0(audio_path):
     if npz is not None:
         _SOURCES.append("cache")
         return np.load(npz, allow_pickle=True)["f0"], "cache"
-    y, _ = librosa.load(audio_path, sr=SR, duration=MAX_DURATION_SEC)
+    y, _ = load_audio(audio_path, sr=SR, duration=MAX_DURATION_SEC)
     _t = time.time()
     f0, _, _ = librosa.pyin(y, sr=SR,
                             fmin=librosa.note_to_hz("C1"),
@@ -109,18 +97,8 @@ def stable_bins_from_f0(f0):
     pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < N_BINS)]
     if len(pitch_bins) < MIN_STABLE_FRAMES:
         return None, 0.0
-    stable, retained = [], 0
-    current, count = pitch_bins[0], 1
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable.append(current); retained += count
-            current, count = b, 1
-    if count >= MIN_STABLE_FRAMES:
-        stable.append(current); retained += count
-    return stable, retained / len(pitch_bins)
+    stable, run_lengths = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
+    return stable, int(run_lengths.sum()) / len(pitch_bins)
 
 
 def stable_bins_from_audio(audio_path):
@@ -130,7 +108,7 @@ def stable_bins_from_audio(audio_path):
 
 
 def clip_metrics(stable_bins, scale):
-    if not stable_bins:
+    if stable_bins is None or len(stable_bins) == 0:
         return None
     swaras = [int(b) // BINS_PER_SWARA for b in stable_bins]
     prec_raw = sum(1 for s in swaras if s in scale) / len(swaras)
@@ -336,7 +314,7 @@ def run_validation(root):
                 print(f"  {raga}/{fn}: no cache -- skipped")
                 continue
             f0_cache = np.load(npz, allow_pickle=True)["f0"]
-            y, _ = librosa.load(path, sr=SR, duration=MAX_DURATION_SEC)
+            y, _ = load_audio(path, sr=SR, duration=MAX_DURATION_SEC)
             f0_live, _, _ = librosa.pyin(y, sr=SR,
                                          fmin=librosa.note_to_hz("C1"),
                                          fmax=librosa.note_to_hz("C6"))
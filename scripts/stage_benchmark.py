@@ -0,0 +1,282 @@
+"""
+Stage-level throughput benchmarks with stored baselines.
+
+Every hot stage is timed on fixed, deterministic inputs -- a seeded
+synthetic 6-minute f0 track (MAX_DURATION_SEC at SR / hop 512, ragged
+note lengths, vibrato, unvoiced gaps), its tonic-normalised cents, and a
+seeded 7-raga model set written as a real models.swpk -- so numbers move
+only when code (or the machine) does:
+
+    estimate_tonic            utils.estimate_tonic on the 6-min f0
+    stability_gate            extract_pitch_batch_v12.apply_pitch_stability_gate
+    histogram                 72-bin PCD from 6-min cents
+    directional_dyads         recognize_raga_v12.compute_directional_dyads
+    score_models              recognize_raga_v12._score_models (per-raga dict path)
+    score_matrix              recognize_raga_v12.score_matrix (compiled path)
+    model_load                load_compiled_models on the models.swpk run
+    decode                    audio_cache.load_audio, 10 s 44.1 kHz WAV, no cache
+    recognize_e2e             recognize_from_array on 10 s synthetic audio (pYIN + all stages)
+
+Timing is timeit autorange + `--repeat` repeats, reported as median / min
+ms per call; pYIN's numba JIT is warmed before timing.
+
+    python stage_benchmark.py run                   # print + save results_<ts>.json
+    python stage_benchmark.py baseline              # run + store as the baseline
+    python stage_benchmark.py compare [--tolerance 0.25] [--current results.json]
+
+compare exits 1 if any stage's median is slower than baseline x (1 + tolerance).
+"""
+
+import os
+import sys
+import json
+import timeit
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import librosa
+import soundfile as sf
+
+from utils import estimate_tonic
+from extract_pitch_batch_v12 import apply_pitch_stability_gate
+from recognize_raga_v12 import (
+    SR, N_BINS, MAX_DURATION_SEC, PCD_WEIGHT, DYAD_WEIGHT, PYIN_HOP_LENGTH,
+    compute_directional_dyads, compute_pcd_weights, _score_models, score_matrix,
+    load_aggregated_models, load_compiled_models, recognize_from_array,
+)
+from audio_cache import load_audio
+from model_pack import MODEL_PACK_NAME, write_model_pack
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR       = r"D:\Swaragam"
+BENCH_DIR      = os.path.join(BASE_DIR, "pcd_results", "benchmarks")
+BASELINE_PATH  = os.path.join(BENCH_DIR, "stage_baseline.json")
+
+SEED           = 20260401
+N_RAGAS        = 7
+TONIC_HZ       = 146.83   # D3
+SCALE_CENTS    = (0, 200, 400, 500, 700, 900, 1100)
+AUDIO_SEC      = 10
+AUDIO_SR       = 44100
+REPEAT         = 5
+TOLERANCE      = 0.25
+
+
+# =========================
+# DETERMINISTIC INPUTS
+# =========================
+def synthetic_f0(n_frames, seed=SEED):
+    """Held scale notes over 2 octaves with vibrato; ~25% unvoiced frames (NaN)."""
+    rng = np.random.default_rng(seed)
+    f0 = np.full(n_frames, np.nan)
+
+    i = 0
+    while i < n_frames:
+        hold = int(rng.integers(8, 60))
+        if rng.random() < 0.25:
+            i += hold
+            continue
+        cents = SCALE_CENTS[rng.integers(len(SCALE_CENTS))] + 1200 * int(rng.integers(-1, 2))
+        seg = cents + 15 * np.sin(np.arange(hold) * 2 * np.pi / 12 + rng.random() * 6.28)
+        f0[i:i + hold] = TONIC_HZ * 2 ** (seg[:n_frames - i] / 1200)
+        i += hold
+
+    return f0
+
+
+def synthetic_audio(seconds=AUDIO_SEC, sr=SR, seed=SEED):
+    """Sine rendering of synthetic_f0 at hop 512 (voiced parts only)."""
+    n_frames = int(seconds * sr / PYIN_HOP_LENGTH)
+    f0 = np.nan_to_num(np.repeat(synthetic_f0(n_frames, seed), PYIN_HOP_LENGTH))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    return (0.3 * np.sin(phase) * (f0 > 0)).astype(np.float32)
+
+
+def synthetic_run(run_dir, seed=SEED):
+    """Seeded N_RAGAS model set written as an aggregation run with models.swpk."""
+    rng = np.random.default_rng(seed)
+    raga_stats = {}
+
+    for r in range(N_RAGAS):
+        up   = rng.dirichlet(np.full(N_BINS * N_BINS, 0.05))
+        down = rng.dirichlet(np.full(N_BINS * N_BINS, 0.05))
+        raga_stats[f"raga_{r}"] = {
+            "mean_pcd": rng.dirichlet(np.full(N_BINS, 0.5)),
+            "std_pcd": rng.random(N_BINS) * 0.01,
+            "mean_up": up, "mean_down": down,
+            "std_up": up * 0.1, "std_down": down * 0.1,
+            "clip_count": 10, "mean_gating_ratio": 0.8, "mean_transitions": 500.0,
+        }
+
+    write_model_pack(os.path.join(run_dir, MODEL_PACK_NAME), raga_stats, {"synthetic": True, "seed": seed})
+    return run_dir
+
+
+def build_inputs(tmp_dir):
+    n_frames = 1 + int(MAX_DURATION_SEC * SR) // PYIN_HOP_LENGTH
+    f0 = synthetic_f0(n_frames)
+    valid = f0[~np.isnan(f0)]
+    sa_hz = estimate_tonic(valid)
+    cents = (1200 * np.log2(valid / sa_hz)) % 1200
+
+    run_dir = synthetic_run(tmp_dir)
+    models = load_aggregated_models(run_dir)
+    bundle = load_compiled_models(run_dir)
+
+    hist, _ = np.histogram(cents, bins=N_BINS, range=(0, 1200))
+    pcd = hist / np.sum(hist)
+    up, down = compute_directional_dyads(cents)
+
+    wav_path = os.path.join(tmp_dir, "bench.wav")
+    sf.write(wav_path, synthetic_audio(sr=AUDIO_SR), AUDIO_SR)
+
+    return {
+        "f0": f0, "voiced": ~np.isnan(f0), "sa_hz": sa_hz, "cents": cents,
+        "run_dir": run_dir, "models": models, "bundle": bundle,
+        "pcd_weights": compute_pcd_weights(models),
+        "pcd": pcd, "up": up, "down": down,
+        "wav_path": wav_path, "audio": synthetic_audio(),
+    }
+
+
+# =========================
+# BENCHMARKS
+# =========================
+def benchmarks(x):
+    """name -> zero-argument callable, in report order."""
+    return {
+        "estimate_tonic":    lambda: estimate_tonic(x["f0"]),
+        "stability_gate":    lambda: apply_pitch_stability_gate(x["f0"], x["sa_hz"], x["voiced"]),
+        "histogram":         lambda: np.histogram(x["cents"], bins=N_BINS, range=(0, 1200)),
+        "directional_dyads": lambda: compute_directional_dyads(x["cents"]),
+        "score_models":      lambda: _score_models(x["pcd"], x["up"], x["down"], x["models"],
+                                                   PCD_WEIGHT, DYAD_WEIGHT, x["pcd_weights"]),
+        "score_matrix":      lambda: score_matrix(x["pcd"], x["up"], x["down"], x["bundle"],
+                                                  PCD_WEIGHT, DYAD_WEIGHT),
+        "model_load":        lambda: load_compiled_models(x["run_dir"]),
+        "decode":            lambda: load_audio(x["wav_path"], sr=SR, cache_dir=None),
+        "recognize_e2e":     lambda: recognize_from_array(x["audio"], SR, models=x["bundle"]),
+    }
+
+
+def time_call(fn, repeat=REPEAT):
+    """timeit autorange (>= 0.2 s per repeat) -> {median_ms, min_ms, number, repeat}."""
+    fn()   # warm caches / numba JIT
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_call = np.array(timer.repeat(repeat=repeat, number=number)) / number * 1000
+    return {"median_ms": round(float(np.median(per_call)), 4),
+            "min_ms": round(float(per_call.min()), 4),
+            "number": number, "repeat": repeat}
+
+
+def run_suite(repeat=REPEAT, only=None):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inputs = build_inputs(tmp_dir)
+        results = {}
+        for name, fn in benchmarks(inputs).items():
+            if only and name not in only:
+                continue
+            results[name] = time_call(fn, repeat)
+            r = results[name]
+            print(f"  {name:<18} median {r['median_ms']:>10.3f} ms | min {r['min_ms']:>10.3f} ms "
+                  f"| {r['number']} x {r['repeat']}")
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "seed": SEED,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "librosa": librosa.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+# =========================
+# COMPARE
+# =========================
+def compare(baseline, current, tolerance=TOLERANCE):
+    """Print stage-by-stage median ratios -> list of regressed stage names."""
+    base, cur = baseline["results"], current["results"]
+    regressions = []
+
+    print(f"{'Stage':<18} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for name in base:
+        if name not in cur:
+            print(f"{name:<18} {base[name]['median_ms']:>12.3f} {'--':>12}   (not run)")
+            continue
+        ratio = cur[name]["median_ms"] / max(base[name]["median_ms"], 1e-9)
+        flag = "  SLOWER" if ratio > 1 + tolerance else ("  faster" if ratio < 1 - tolerance else "")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+        print(f"{name:<18} {base[name]['median_ms']:>12.3f} {cur[name]['median_ms']:>12.3f} "
+              f"{ratio:>6.2f}x{flag}")
+    for name in cur:
+        if name not in base:
+            print(f"{name:<18} {'--':>12} {cur[name]['median_ms']:>12.3f}   (new, no baseline)")
+
+    if baseline.get("environment") != current.get("environment"):
+        print("\nNote: baseline was recorded in a different environment:")
+        print(f"  baseline: {baseline.get('environment')}")
+        print(f"  current : {current.get('environment')}")
+
+    print(f"\nRegressions (> {tolerance:.0%} slower): {', '.join(regressions) or 'none'}")
+    return regressions
+
+
+def _save(report, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved: {path}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stage-level benchmarks with stored baselines.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    for name, help_text in (("run", "run the suite and save results"),
+                            ("baseline", "run the suite and store it as the baseline"),
+                            ("compare", "compare against the baseline")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--repeat", type=int, default=REPEAT)
+        p.add_argument("--only", nargs="+", help="benchmark names to run")
+        p.add_argument("--baseline", default=BASELINE_PATH)
+    sub.choices["run"].add_argument("--out", help="results JSON (default: BENCH_DIR/results_<ts>.json)")
+    sub.choices["compare"].add_argument("--current", help="existing results JSON instead of a fresh run")
+    sub.choices["compare"].add_argument("--tolerance", type=float, default=TOLERANCE,
+                                        help="allowed median slowdown, as a fraction")
+
+    args = ap.parse_args()
+
+    if args.cmd == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if args.current:
+            with open(args.current, encoding="utf-8") as f:
+                current = json.load(f)
+        else:
+            current = run_suite(args.repeat, args.only)
+        return 1 if compare(baseline, current, args.tolerance) else 0
+
+    report = run_suite(args.repeat, args.only)
+    if args.cmd == "baseline":
+        _save(report, args.baseline)
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        _save(report, args.out or os.path.join(BENCH_DIR, f"results_{timestamp}.json"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Opt-in per-stage timing + memory for recognize_raga() and process_file().
+
+Pass a StageRecorder and every stage (decode, pyin, tonic, histogram, dyads,
+scoring, ...) records its wall time and its peak traced allocation above
+the level it started at (tracemalloc -- numpy buffers included, numba
+internals not). recognize_raga() then adds
+
+    "diagnostics": {"stages": {stage: {"wall_ms", "peak_mb"}}, "total_ms"}
+
+to its result; without a recorder nothing is measured and the frozen
+schema is untouched. tracemalloc is process-global: run diagnostics one
+clip per process (batch_engine workers) rather than in threaded servers,
+and expect it to slow allocation-heavy stages somewhat.
+
+stage_report() reduces many diagnostics dicts to p50 / p95 / max per stage.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+
+# =========================
+# RECORDER
+# =========================
+class StageRecorder:
+    """Flat (non-nested) stages; a repeated stage name accumulates time, keeps max peak."""
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stages = {}
+        self._owns_tracing = memory and not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if self.memory:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - t0
+            peak = (tracemalloc.get_traced_memory()[1] - base) / 2**20 if self.memory else 0.0
+
+            entry = self.stages.setdefault(name, {"wall_ms": 0.0, "peak_mb": 0.0})
+            entry["wall_ms"] += wall * 1000
+            entry["peak_mb"] = max(entry["peak_mb"], peak)
+
+    def report(self):
+        """JSON-ready diagnostics dict; stops tracemalloc if this recorder started it."""
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+        stages = {name: {"wall_ms": round(e["wall_ms"], 3), "peak_mb": round(e["peak_mb"], 3)}
+                  for name, e in self.stages.items()}
+        return {"stages": stages, "total_ms": round(sum(e["wall_ms"] for e in stages.values()), 3)}
+
+
+class _NullRecorder:
+    """Default when diagnostics are off: stages cost one nullcontext."""
+
+    def stage(self, name):
+        return nullcontext()
+
+
+NULL_RECORDER = _NullRecorder()
+
+
+# =========================
+# BATCH REPORT
+# =========================
+STAGE_REPORT_FIELDS = ["stage", "clips", "p50_ms", "p95_ms", "max_ms", "total_s",
+                       "peak_mb_p50", "peak_mb_max"]
+
+
+def stage_report(diagnostics):
+    """
+    [diagnostics dict, ...] -> one row per stage (first-seen order, then
+    "total"). Percentiles are over the clips that ran the stage.
+    """
+    walls, peaks = {}, {}
+    for d in diagnostics:
+        for name, e in d["stages"].items():
+            walls.setdefault(name, []).append(e["wall_ms"])
+            peaks.setdefault(name, []).append(e["peak_mb"])
+        walls.setdefault("total", []).append(d["total_ms"])
+        peaks.setdefault("total", []).append(max((e["peak_mb"] for e in d["stages"].values()), default=0.0))
+
+    if "total" in walls:
+        walls["total"] = walls.pop("total")
+        peaks["total"] = peaks.pop("total")
+
+    rows = []
+    for name, w in walls.items():
+        w, p = np.array(w), np.array(peaks[name])
+        rows.append({
+            "stage": name,
+            "clips": len(w),
+            "p50_ms": round(float(np.percentile(w, 50)), 2),
+            "p95_ms": round(float(np.percentile(w, 95)), 2),
+            "max_ms": round(float(w.max()), 2),
+            "total_s": round(float(w.sum()) / 1000, 2),
+            "peak_mb_p50": round(float(np.percentile(p, 50)), 2),
+            "peak_mb_max": round(float(p.max()), 2),
+        })
+    return rows
+
+
+def format_stage_report(rows):
+    """Fixed-width text table for summaries / console."""
+    lines = [f"{'Stage':<12} {'clips':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'peak MB':>8}"]
+    for r in rows:
+        lines.append(f"{r['stage']:<12} {r['clips']:>5} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+                     f"{r['max_ms']:>9.1f} {r['peak_mb_max']:>8.1f}")
+    return lines
@@ -0,0 +1,265 @@
+"""
+Parameter-sweep feature engine: PCD / dyads for any (N_BINS, MIN_STABLE_FRAMES,
+ALPHA) and fusion weights from one cached representation per clip.
+
+The phase sandboxes (sandbox_phase4_bins.py, sandbox_phase2_alpha.py,
+diag_alpha.py, ...) recompute features from cents_gated for every setting.
+Here each clip is reduced once to
+
+  - a fine cents histogram (FINE_BINS = 3600, 1/3-cent bins). Any N_BINS that
+    divides 3600 (12, 24, 36, 72, 120, 144, ...) is an exact re-bin of it;
+  - raw, unsmoothed up/down transition counts per (n_bins, min_stable),
+    computed on first use, one file per pair next to the histogram.
+
+The per-clip cache is content-addressed like feature_cache entries,
+{feature_file_sha256[:24]}_{params_sha256[:12]}.npz with params = FINE_BINS +
+FEATURE_VERSION (plus {stem}_b{n_bins}_m{min_stable}.npz for counts), so a
+re-extracted clip or a different feature folder / profile never reuses
+another representation. Files are written once, to a temp name and renamed;
+a clip failing the guardrails gets a cache file marking it rejected.
+Clips are enumerated through feature_cache.feature_files (the index).
+
+Laplace smoothing is applied in closed form at scoring time,
+
+    up = (C + ALPHA) / (sum(C) + ALPHA * n_bins**2 + EPS)
+
+so an ALPHA value costs one elementwise op over the (N x n_bins**2) count
+matrix. Fusion weights only re-mix the LOO similarity matrices from
+loo_engine.py. Each grid point is scored with the canonical exact LOO.
+
+    python sweep_engine.py --bins 36 72 --alpha 0.5 0.01 0.001 --weights 0.8:0.2 0.6:0.4
+"""
+
+import os
+import csv
+import argparse
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from feature_constants import FEATURE_VERSION
+from feature_cache import file_sha256, cache_key, feature_files
+from utils import stable_regions, directional_dyad_counts
+from loo_engine import loo_similarities, fuse, decide
+from recognize_raga_v12 import (
+    N_BINS, MIN_STABLE_FRAMES, ALPHA, EPS, PCD_WEIGHT, DYAD_WEIGHT,
+)
+
+# =========================
+# CONFIG
+# =========================
+BASE_DIR   = r"D:\Swaragam"
+FEAT_DIR   = os.path.join(BASE_DIR, "pcd_results", "features_v12")
+CACHE_DIR  = os.path.join(BASE_DIR, "pcd_results", "sweep_cache")
+SWEEP_DIR  = os.path.join(BASE_DIR, "pcd_results", "sweeps")
+
+FINE_BINS  = 3600        # 1/3-cent bins: exact re-bin for every divisor of 3600
+MIN_FRAMES = 200         # same clip guardrails as the canonical LOO
+MIN_CLIPS  = 5
+
+
+# =========================
+# PER-CLIP CACHE
+# =========================
+def _cache_path(cache_dir, feature_path):
+    """Sweep cache file for these exact feature-file bytes."""
+    params = {"fine_bins": FINE_BINS, "feature_version": FEATURE_VERSION}
+    return os.path.join(cache_dir, f"{cache_key(file_sha256(feature_path), params)}.npz")
+
+
+def _counts_path(hist_cache, n_bins, min_stable):
+    """Transition-count file for one (n_bins, min_stable), beside the histogram."""
+    return f"{os.path.splitext(hist_cache)[0]}_b{n_bins}_m{min_stable}.npz"
+
+
+def _save_npz(path, **arrays):
+    """np.savez to a temp name + os.replace: readers never see a partial file."""
+    tmp = path + f".tmp{os.getpid()}"     # file handle: np.savez would append .npz to a name
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def _transition_counts(cents, n_bins, min_stable):
+    bins       = np.linspace(0, 1200, n_bins + 1)
+    pitch_bins = np.digitize(cents, bins) - 1
+    pitch_bins = pitch_bins[(pitch_bins >= 0) & (pitch_bins < n_bins)]
+
+    stable_bins, _ = stable_regions(pitch_bins, min_stable)
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, n_bins)
+
+    return mat_up.flatten().astype(np.int32), mat_down.flatten().astype(np.int32)
+
+
+def load_corpus(feat_dir=FEAT_DIR, cache_dir=CACHE_DIR):
+    """
+    Clips passing the canonical guardrails (FEATURE_VERSION, gating >= 0.05,
+    >= MIN_FRAMES gated frames) and MIN_CLIPS per raga, sorted by file name:
+
+        [{"fname", "path", "raga", "cache"}, ...]
+
+    The fine histogram is built on first sight of a clip's feature bytes;
+    later loads hash the feature file and read only the small cache file
+    (rejected clips included).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    clips = []
+
+    for path in feature_files(feat_dir, FEATURE_VERSION):
+        cache = _cache_path(cache_dir, path)
+
+        if not os.path.exists(cache):
+            d = np.load(path, allow_pickle=True)
+            cents = d["cents_gated"]
+
+            if float(d["gating_ratio"]) < 0.05:
+                rejected = "gating_ratio < 0.05"
+            elif len(cents) < MIN_FRAMES:
+                rejected = f"< {MIN_FRAMES} gated frames"
+            else:
+                rejected = ""
+
+            fine_hist, _ = np.histogram(cents, bins=FINE_BINS, range=(0, 1200))
+            _save_npz(cache, raga=str(d["raga"]), rejected=rejected, fine_hist=fine_hist.astype(np.int32))
+
+        with np.load(cache) as cached:
+            if "rejected" in cached.files and str(cached["rejected"]):
+                continue
+            raga = str(cached["raga"])
+
+        clips.append({"fname": os.path.basename(path), "path": path, "raga": raga, "cache": cache})
+
+    counts = Counter(c["raga"] for c in clips)
+    return [c for c in clips if counts[c["raga"]] >= MIN_CLIPS]
+
+
+def pcd_matrix(clips, n_bins):
+    """(N, n_bins) PCDs re-binned from the cached fine histograms."""
+    if FINE_BINS % n_bins:
+        raise ValueError(f"n_bins={n_bins} does not divide FINE_BINS={FINE_BINS}")
+
+    fine = np.stack([np.load(c["cache"])["fine_hist"] for c in clips]).astype(np.float64)
+    hist = fine.reshape(len(clips), n_bins, FINE_BINS // n_bins).sum(axis=2)
+
+    return hist / (np.sum(hist, axis=1, keepdims=True) + EPS)
+
+
+def count_matrices(clips, n_bins, min_stable):
+    """(N, n_bins**2) raw up/down transition counts, cached per clip on first use."""
+    ups, downs = [], []
+
+    for c in clips:
+        counts_path = _counts_path(c["cache"], n_bins, min_stable)
+
+        if os.path.exists(counts_path):
+            with np.load(counts_path) as cached:
+                up, down = cached["up"], cached["down"]
+        else:
+            cents = np.load(c["path"], allow_pickle=True)["cents_gated"]
+            up, down = _transition_counts(cents, n_bins, min_stable)
+            _save_npz(counts_path, up=up, down=down)
+
+        ups.append(up)
+        downs.append(down)
+
+    return np.stack(ups).astype(np.float64), np.stack(downs).astype(np.float64)
+
+
+def smooth(counts, alpha):
+    """Closed-form Laplace smoothing + normalisation of stacked raw counts."""
+    n_cells = counts.shape[1]
+    return (counts + alpha) / (np.sum(counts, axis=1, keepdims=True) + alpha * n_cells + EPS)
+
+
+# =========================
+# SWEEP
+# =========================
+def sweep(clips, bin_grid, min_stable_grid, alpha_grid, weight_grid):
+    """
+    Canonical LOO for every grid point. Re-binning / counting happens once per
+    (n_bins, min_stable); each ALPHA is one smoothing op plus the LOO matrix
+    products; each fusion weight pair only re-mixes the similarity matrices.
+    """
+    raga_order = list(dict.fromkeys(c["raga"] for c in clips))
+    index  = {raga: r for r, raga in enumerate(raga_order)}
+    labels = np.array([index[c["raga"]] for c in clips])
+
+    rows = []
+    for n_bins in bin_grid:
+        pcd = pcd_matrix(clips, n_bins)
+
+        for min_stable in min_stable_grid:
+            up_counts, down_counts = count_matrices(clips, n_bins, min_stable)
+
+            for alpha in alpha_grid:
+                pcd_sim, dyad_sim = loo_similarities(
+                    labels, pcd, smooth(up_counts, alpha), smooth(down_counts, alpha))
+
+                for pcd_w, dyad_w in weight_grid:
+                    scores = fuse(raga_order, pcd_sim, dyad_sim, None, pcd_w, dyad_w)
+                    folds = decide(raga_order, scores, clips)
+
+                    c = sum(f["pred"] == f["raga"] for f in folds)
+                    u = sum(f["tier"] == "UNK" for f in folds)
+                    w = len(folds) - c - u
+
+                    rows.append({
+                        "n_bins": n_bins, "min_stable": min_stable, "alpha": alpha,
+                        "pcd_w": pcd_w, "dyad_w": dyad_w,
+                        "correct": c, "wrong": w, "unknown": u,
+                        "acc_decided": round(c / (c + w), 4) if c + w else 0.0,
+                    })
+
+    return rows
+
+
+def write_results(rows):
+    os.makedirs(SWEEP_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_path = os.path.join(SWEEP_DIR, f"sweep_{timestamp}.csv")
+
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    production = (N_BINS, MIN_STABLE_FRAMES, ALPHA, PCD_WEIGHT, DYAD_WEIGHT)
+
+    print("  {:>5} {:>6} {:>7} {:>9} {:>7} {:>6} {:>6} {:>8}".format(
+        "bins", "stable", "alpha", "weights", "correct", "wrong", "unk", "acc_dec"))
+    print("  " + "-" * 64)
+    for r in rows:
+        tag = "  <- production" if (r["n_bins"], r["min_stable"], r["alpha"],
+                                    r["pcd_w"], r["dyad_w"]) == production else ""
+        print("  {:>5} {:>6} {:>7g} {:>9} {:>7} {:>6} {:>6} {:>7.1f}%{}".format(
+            r["n_bins"], r["min_stable"], r["alpha"], f"{r['pcd_w']}/{r['dyad_w']}",
+            r["correct"], r["wrong"], r["unknown"], r["acc_decided"] * 100, tag))
+
+    print(f"\nSaved: {csv_path}")
+    return csv_path
+
+
+def _weight_pair(text):
+    pcd_w, dyad_w = text.split(":")
+    return float(pcd_w), float(dyad_w)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="LOO sweep over bins / MIN_STABLE / ALPHA / fusion weights.")
+    ap.add_argument("--bins", type=int, nargs="+", default=[N_BINS])
+    ap.add_argument("--min-stable", type=int, nargs="+", default=[MIN_STABLE_FRAMES])
+    ap.add_argument("--alpha", type=float, nargs="+", default=[ALPHA])
+    ap.add_argument("--weights", type=_weight_pair, nargs="+",
+                    default=[(PCD_WEIGHT, DYAD_WEIGHT)], help="pcd:dyad pairs, e.g. 0.8:0.2")
+    args = ap.parse_args()
+
+    clips = load_corpus()
+    print(f"Clips: {len(clips)} | ragas: {len(set(c['raga'] for c in clips))} "
+          f"| grid: {len(args.bins) * len(args.min_stable) * len(args.alpha) * len(args.weights)} points\n")
+
+    write_results(sweep(clips, args.bins, args.min_stable, args.alpha, args.weights))
+
+
+if __name__ == "__main__":
+    main()
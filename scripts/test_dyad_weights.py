@@ -13,7 +13,7 @@
 import os
 import numpy as np
 import librosa
-from utils import estimate_tonic
+from utils import estimate_tonic, stable_regions, directional_dyad_counts
 
 # =========================
 # CONFIG
@@ -82,31 +82,9 @@ def compute_directional_dyads(cents):
         flat = np.zeros(N_BINS * N_BINS)
         return flat, flat
 
-    stable_bins = []
-    current     = pitch_bins[0]
-    count       = 1
+    stable_bins, _ = stable_regions(pitch_bins, MIN_STABLE_FRAMES)
 
-    for b in pitch_bins[1:]:
-        if b == current:
-            count += 1
-        else:
-            if count >= MIN_STABLE_FRAMES:
-                stable_bins.append(current)
-            current = b
-            count   = 1
-    if count >= MIN_STABLE_FRAMES:
-        stable_bins.append(current)
-
-    mat_up   = np.zeros((N_BINS, N_BINS))
-    mat_down = np.zeros((N_BINS, N_BINS))
-
-    for i in range(len(stable_bins) - 1):
-        frm = stable_bins[i]
-        to  = stable_bins[i + 1]
-        if to > frm:
-            mat_up[frm, to]   += 1
-        elif to < frm:
-            mat_down[frm, to] += 1
+    mat_up, mat_down, _ = directional_dyad_counts(stable_bins, N_BINS)
 
     mat_up   += ALPHA
     mat_down += ALPHA
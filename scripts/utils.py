@@ -1,4 +1,55 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+EPS = 1e-8
+
+
+TONIC_MIN_HZ       = 80
+TONIC_MAX_HZ       = 400
+TONIC_WINDOW_CENTS = 50
+_TONIC_EDGE_CENTS  = 1e-6   # >> float error of log2(f) - log2(c) vs log2(f / c)
+
+
+def _tonic_candidates(peaks_hz):
+    """Each peak at x0.5, x1.0, x2.0, kept if inside the vocal Sa range (80-400 Hz)."""
+    candidates = []
+
+    for hz in peaks_hz:
+        for mult in (0.5, 1.0, 2.0):
+            cand = hz * mult
+            if TONIC_MIN_HZ <= cand <= TONIC_MAX_HZ:
+                candidates.append(cand)
+
+    return candidates
+
+
+def _sorted_log_cents(pitch_values):
+    """One log2 pass: (sorted Hz, their absolute cents) -- a lossless cumulative histogram."""
+    f_sorted = np.sort(pitch_values)
+    return f_sorted, 1200 * np.log2(f_sorted)
+
+
+def _tonic_scores(f_sorted, cents_sorted, candidates):
+    """
+    Frames within 50 cents of each candidate, by binary search on the sorted
+    cents instead of one log2 over every frame per candidate. Frames within
+    _TONIC_EDGE_CENTS of a window edge are re-tested with the per-candidate
+    formula, so counts match the original scoring exactly.
+    """
+    centre = 1200 * np.log2(np.asarray(candidates, dtype=float))
+
+    in_lo   = np.searchsorted(cents_sorted, centre - TONIC_WINDOW_CENTS + _TONIC_EDGE_CENTS, "right")
+    in_hi   = np.searchsorted(cents_sorted, centre + TONIC_WINDOW_CENTS - _TONIC_EDGE_CENTS, "left")
+    edge_lo = np.searchsorted(cents_sorted, centre - TONIC_WINDOW_CENTS - _TONIC_EDGE_CENTS, "left")
+    edge_hi = np.searchsorted(cents_sorted, centre + TONIC_WINDOW_CENTS + _TONIC_EDGE_CENTS, "right")
+
+    scores = np.maximum(in_hi - in_lo, 0)
+
+    for i in np.flatnonzero((edge_lo < in_lo) | (in_hi < edge_hi)):
+        edge = np.concatenate((f_sorted[edge_lo[i]:in_lo[i]], f_sorted[in_hi[i]:edge_hi[i]]))
+        scores[i] += np.sum(np.abs(1200 * np.log2(edge / candidates[i])) < TONIC_WINDOW_CENTS)
+
+    return scores
 
 
 def _choose_best_tonic(peaks_hz, pitch_values):
@@ -8,22 +59,16 @@ def _choose_best_tonic(peaks_hz, pitch_values):
     the vocal Sa range (80-400 Hz), then scores each candidate by how
     many pitch frames fall within 50 cents of it.
     """
-    candidates = []
+    candidates = _tonic_candidates(peaks_hz)
+    scores = _tonic_scores(*_sorted_log_cents(pitch_values), candidates)
 
-    for hz in peaks_hz:
-        for mult in (0.5, 1.0, 2.0):
-            cand = hz * mult
-            if 80 <= cand <= 400:
-                candidates.append(cand)
+    return candidates[np.argmax(scores)]
 
-    scores = []
-    for cand in candidates:
-        cents = 1200 * np.log2(pitch_values / cand)
-        cents = cents[(cents > -1200) & (cents < 1200)]
-        score = np.sum(np.abs(cents) < 50)
-        scores.append(score)
 
-    return candidates[np.argmax(scores)]
+def _tonic_peaks(f0):
+    hist, bin_edges = np.histogram(f0, bins=200)
+    top_idx  = np.argsort(hist)[-5:]
+    return [(bin_edges[i] + bin_edges[i + 1]) / 2 for i in top_idx]
 
 
 def estimate_tonic(f0):
@@ -42,8 +87,144 @@ def estimate_tonic(f0):
     if len(f0) < 200:
         raise ValueError("Not enough voiced frames for tonic estimation")
 
-    hist, bin_edges = np.histogram(f0, bins=200)
-    top_idx  = np.argsort(hist)[-5:]
-    peaks_hz = [(bin_edges[i] + bin_edges[i + 1]) / 2 for i in top_idx]
+    return _choose_best_tonic(_tonic_peaks(f0), f0)
+
+
+def tonic_hypotheses(f0, k=5, grid_cents=None):
+    """
+    Top-k tonic hypotheses -> [(sa_hz, score), ...], best first; score is the
+    number of voiced frames within 50 cents. Ties keep candidate order, so
+    tonic_hypotheses(f0, 1)[0][0] == estimate_tonic(f0).
+
+    grid_cents=None scores the canonical peak x octave candidates; a number
+    scores a dense grid over 80-400 Hz at that step instead (same single
+    log2 pass, one binary search per grid point).
+    """
+    f0 = f0[~np.isnan(f0)]
+
+    if len(f0) < 200:
+        raise ValueError("Not enough voiced frames for tonic estimation")
+
+    if grid_cents is None:
+        candidates = _tonic_candidates(_tonic_peaks(f0))
+    else:
+        span = 1200 * np.log2(TONIC_MAX_HZ / TONIC_MIN_HZ)
+        candidates = list(TONIC_MIN_HZ * 2 ** (np.arange(0, span + 1e-9, grid_cents) / 1200))
+
+    scores = _tonic_scores(*_sorted_log_cents(f0), candidates)
+    order = np.argsort(-scores, kind="stable")[:k]
+
+    return [(float(candidates[i]), int(scores[i])) for i in order]
+
+
+def run_length_encode(x):
+    """
+    Vectorised run-length encoding of a 1-D sequence.
+
+    Returns (values, starts, lengths), one entry per maximal run of equal
+    consecutive elements. Empty input returns three empty arrays.
+    """
+    x = np.asarray(x)
+    n = len(x)
+
+    if n == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return x[:0], empty, empty
+
+    starts  = np.concatenate(([0], np.flatnonzero(x[1:] != x[:-1]) + 1))
+    lengths = np.diff(np.append(starts, n))
+
+    return x[starts], starts, lengths
+
+
+def stable_regions(pitch_bins, min_frames):
+    """
+    Canonical stable-region detector -- shared by extraction, aggregation,
+    inference and every sandbox that builds dyads.
+
+    A stable region is a run of >= min_frames consecutive identical bins.
+    Returns (stable_bins, run_lengths): the bin of each stable region, in
+    order, and how many frames it held. Bit-identical to the per-frame
+    count/current loop it replaces.
+    """
+    values, _, lengths = run_length_encode(pitch_bins)
+    keep = lengths >= min_frames
+
+    return values[keep], lengths[keep]
+
+
+def directional_dyad_counts(stable_bins, n_bins):
+    """
+    Raw directional transition counts between consecutive stable regions.
+
+    Builds both (n_bins x n_bins) matrices in a single np.bincount pass:
+    ascending moves land in mat_up, descending moves in mat_down, and
+    repeats of the same bin are ignored. Returns (mat_up, mat_down,
+    transitions) -- counts only, Laplace smoothing is left to the caller.
+    """
+    stable_bins = np.asarray(stable_bins, dtype=np.intp)
+    n_cells     = n_bins * n_bins
+
+    frm = stable_bins[:-1]
+    to  = stable_bins[1:]
+
+    moved    = to != frm
+    frm, to  = frm[moved], to[moved]
+
+    # up cells occupy [0, n_cells), down cells [n_cells, 2 * n_cells)
+    flat   = frm * n_bins + to + (to < frm) * n_cells
+    counts = np.bincount(flat, minlength=2 * n_cells).astype(np.float64)
+
+    mat_up   = counts[:n_cells].reshape(n_bins, n_bins)
+    mat_down = counts[n_cells:].reshape(n_bins, n_bins)
+
+    return mat_up, mat_down, len(flat)
+
+
+def pitch_stability_gate(f0, sa_hz, voiced_flag, window_size, drift_threshold,
+                         voiced_ratio_threshold):
+    """
+    Canonical pitch stability gate -- shared by every extraction script.
+
+    A window of window_size frames passes when its voiced ratio is at least
+    voiced_ratio_threshold and the mean cents of its two halves differ by
+    less than drift_threshold; every frame of a passing window is kept.
+    As before, windows start at 0 .. len(f0) - window_size - 1.
+
+    Vectorised over all windows: voiced counts come from an integer prefix
+    sum, half-window means from sliding_window_view (same summation order
+    as np.mean, so decisions are bit-identical), and the mask is dilated
+    with a difference array. Returns (cents_gated, gating_ratio).
+    """
+    cents = np.zeros_like(f0)
+    valid_idx = np.where(~np.isnan(f0))[0]
+
+    cents[valid_idx] = 1200 * np.log2(f0[valid_idx] / sa_hz)
+    cents = np.mod(cents, 1200)
+
+    n_frames  = len(f0)
+    n_windows = n_frames - window_size
+    gated_mask = np.zeros(n_frames, dtype=bool)
+
+    if n_windows > 0:
+        half = window_size // 2
+
+        voiced_csum  = np.concatenate(([0], np.cumsum(voiced_flag, dtype=np.int64)))
+        voiced_count = voiced_csum[window_size:window_size + n_windows] - voiced_csum[:n_windows]
+        voiced_ratio = voiced_count / window_size
+
+        c1 = sliding_window_view(cents, half).mean(axis=1)[:n_windows]
+        c2 = sliding_window_view(cents, window_size - half).mean(axis=1)[half:half + n_windows]
+
+        passed = (voiced_ratio >= voiced_ratio_threshold) & (np.abs(c2 - c1) < drift_threshold)
+
+        # Each passing window covers [start, start + window_size)
+        starts = np.flatnonzero(passed)
+        cover  = (np.bincount(starts, minlength=n_frames + 1)
+                  - np.bincount(starts + window_size, minlength=n_frames + 1))
+        gated_mask = np.cumsum(cover[:n_frames]) > 0
+
+    gated_cents = cents[gated_mask]
+    gating_ratio = np.sum(gated_mask) / (np.sum(voiced_flag) + EPS)
 
-    return _choose_best_tonic(peaks_hz, f0)
+    return gated_cents, gating_ratio